@@ -0,0 +1,92 @@
+# DAMM
+# Copyright (c) 2013 504ENSICS Labs
+#
+# This file is part of DAMM.
+#
+# DAMM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# DAMM is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DAMM.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+#
+# Time reads from a raw image through FileAddressSpace with the file read
+# with seek and read, as it was before, and memory mapped: small random
+# reads like those of page table walks and structure members, and the
+# SCAN_BLOCKSIZE windows a scanner zreads.
+#
+# usage: python benchmarks/file_reads.py [image size in MB, default 256] [small reads, default 1000000]
+#
+
+import sys
+import os
+import time
+import random
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import volatility.conf as conf
+import volatility.registry as registry
+import volatility.constants as constants
+import volatility.addrspace as addrspace
+import volatility.plugins.addrspaces.standard as standard
+
+
+def main(argv):
+    size = (int(argv[1]) if len(argv) > 1 else 256) << 20
+    count = int(argv[2]) if len(argv) > 2 else 1000000
+    rand = random.Random(1)
+    registry.PluginImporter()
+
+    image = tempfile.NamedTemporaryFile(suffix='.raw')
+    for x in xrange(size >> 20):
+        image.write(os.urandom(1 << 20))
+    image.flush()
+
+    config = conf.ConfObject()
+    registry.register_global_options(config, addrspace.BaseAddressSpace)
+    config.PROFILE = 'WinXPSP2x86'
+    config.LOCATION = 'file://' + image.name
+
+    small = [(rand.randrange(size), rand.choice((4, 8, 16, 0x1000))) for x in xrange(count)]
+    windows = [(offset, constants.SCAN_BLOCKSIZE + 20) for offset in xrange(0, size, constants.SCAN_BLOCKSIZE)]
+
+    print "%d MB image, %d small reads, %d scan windows" % (size >> 20, count, len(windows))
+    print "%-14s %16s %16s" % ("reads", "small reads (s)", "scan windows (s)")
+
+    results = {}
+    for name in ("seek and read", "mmap"):
+        space = standard.FileAddressSpace(None, config)
+        if name != "mmap":
+            space.fmap.close()
+            space.fmap = None
+
+        start = time.time()
+        data = [space.read(addr, length) for addr, length in small]
+        small_time = time.time() - start
+
+        start = time.time()
+        for offset, length in windows:
+            space.zread(offset, length)
+        window_time = time.time() - start
+
+        results[name] = (small_time, window_time, data)
+        print "%-14s %16.2f %16.2f" % (name, small_time, window_time)
+
+    if results["mmap"][2] != results["seek and read"][2]:
+        print "Mismatch"
+        return 1
+    print "speedup: %.1fx small reads, %.1fx scan windows" % (results["seek and read"][0] / results["mmap"][0], results["seek and read"][1] / results["mmap"][1])
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,272 @@
+# DAMM
+# Copyright (c) 2013 504ENSICS Labs
+#
+# This file is part of DAMM.
+#
+# DAMM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# DAMM is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DAMM.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+#
+# Time reading a synthetic XP hibernation file: decoding its Xpress blocks
+# with the old dict based decoder against the bytearray one, then reading
+# every page through WindowsHiberFileSpace32 by decompressing blocks as they
+# are needed, by decompressing the whole file into a --hibernation-cache
+# directory (with 1 and with N processes), and from that cache on a later run.
+#
+# usage: python benchmarks/hibernation.py [MB of pages, default 16] [processes, default 4]
+#
+
+import sys
+import os
+import time
+import struct
+import random
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import volatility.conf as conf
+import volatility.registry as registry
+import volatility.addrspace as addrspace
+import volatility.scan as scan
+import volatility.win32.xpress as xpress
+import volatility.plugins.addrspaces.standard as standard
+import volatility.plugins.addrspaces.hibernate as hibernate
+
+
+def xpress_encode(data):
+    '''
+    @data: bytes to compress
+
+    @return: data Xpress compressed, with a greedy match on the last place
+        each 3 bytes were seen
+    '''
+    data = str(data)
+    tokens = []
+    last = {}
+    i = 0
+    while i < len(data):
+        start = last.get(data[i:i + 3])
+        last[data[i:i + 3]] = i
+        length = 0
+        if start is not None and i - start <= 0x2000:
+            while i + length < len(data) and length < 0x1000 and data[start + length] == data[i + length]:
+                length += 1
+        if length >= 3:
+            tokens.append((i - start, length))
+            i += length
+        else:
+            tokens.append(data[i])
+            i += 1
+
+    out = bytearray()
+    nibble = None
+    for x in xrange(0, len(tokens), 32):
+        group = tokens[x:x + 32]
+        indicator = 0
+        for bit, token in enumerate(group):
+            if not isinstance(token, str):
+                indicator |= 1 << (31 - bit)
+        out += struct.pack('<L', indicator)
+        for token in group:
+            if isinstance(token, str):
+                out += token
+                continue
+            offset, length = token[0] - 1, token[1] - 3
+            out += struct.pack('<H', (offset << 3) | min(length, 7))
+            if length < 7:
+                continue
+            length -= 7
+            if nibble is None:
+                nibble = len(out)
+                out.append(min(length, 15))
+            else:
+                out[nibble] |= min(length, 15) << 4
+                nibble = None
+            if length >= 15:
+                length -= 15
+                if length < 255:
+                    out.append(length)
+                else:
+                    out.append(255)
+                    out += struct.pack('<H', length + 15 + 7)
+    return str(out)
+
+
+def dict_decode(inputBuffer):
+    '''
+    The Xpress decoder as it was, building a dict of output bytes that is
+    sorted and joined at the end
+    '''
+    outputBuffer = {}
+    outputIndex = inputIndex = indicatorBit = nibbleIndex = 0
+    recombine = lambda: "".join(outputBuffer[k] for k in sorted(outputBuffer.keys()))
+    while inputIndex < len(inputBuffer):
+        if indicatorBit == 0:
+            try:
+                indicator = struct.unpack("<L", inputBuffer[inputIndex:inputIndex + 4])[0]
+            except struct.error:
+                return recombine()
+            inputIndex += 4
+            indicatorBit = 32
+        indicatorBit = indicatorBit - 1
+        if not (indicator & (1 << indicatorBit)):
+            try:
+                outputBuffer[outputIndex] = inputBuffer[inputIndex]
+            except IndexError:
+                return recombine()
+            inputIndex += 1
+            outputIndex += 1
+        else:
+            try:
+                length = struct.unpack("<H", inputBuffer[inputIndex:inputIndex + 2])[0]
+            except struct.error:
+                return recombine()
+            inputIndex += 2
+            offset = length / 8
+            length = length % 8
+            if length == 7:
+                if nibbleIndex == 0:
+                    nibbleIndex = inputIndex
+                    length = ord(inputBuffer[inputIndex]) % 16
+                    inputIndex += 1
+                else:
+                    length = ord(inputBuffer[nibbleIndex]) / 16
+                    nibbleIndex = 0
+                if length == 15:
+                    length = ord(inputBuffer[inputIndex])
+                    inputIndex += 1
+                    if length == 255:
+                        try:
+                            length = struct.unpack("<H", inputBuffer[inputIndex:inputIndex + 2])[0]
+                        except struct.error:
+                            return recombine()
+                        inputIndex = inputIndex + 2
+                        length = length - (15 + 7)
+                    length = length + 15
+                length = length + 7
+            length = length + 3
+            while length != 0:
+                try:
+                    outputBuffer[outputIndex] = outputBuffer[outputIndex - offset - 1]
+                except KeyError:
+                    return recombine()
+                outputIndex += 1
+                length -= 1
+    return recombine()
+
+
+def make_page(rand):
+    '''
+    @rand: a random.Random
+
+    @return: a page of repetitive data with some random bytes in it
+    '''
+    fill = rand.choice(["\x00" * 16, "MZ\x90\x00\x03\x00\x00\x00", "Ntf\xa0kernel32.dll", "\xff\xff\x00\x00"])
+    page = bytearray((fill * (0x1000 // len(fill) + 1))[:0x1000])
+    for x in xrange(rand.randrange(0, 400)):
+        page[rand.randrange(0x1000)] = rand.randrange(256)
+    return page
+
+
+def make_hiberfil(pages, rand):
+    '''
+    @pages: number of pages of memory
+    @rand: a random.Random
+
+    @return: (hibernation file, list of compressed blocks) for an XP
+        hibernation file holding the pages in two ranges
+    '''
+    ranges = [(0x10, 0x10 + pages // 2), (0x1000, 0x1000 + pages - pages // 2)]
+    image = bytearray(4 * 0x1000)
+    image[0:4] = "hibr"
+    struct.pack_into("<I", image, 88, 3)
+    struct.pack_into("<I", image, 3 * 0x1000 + 12, len(ranges))
+    for x, (start, end) in enumerate(ranges):
+        struct.pack_into("<II", image, 3 * 0x1000 + 20 + x * 16, start, end)
+
+    order = [page for start, end in ranges for page in xrange(start, end)]
+    blocks = []
+    for x in xrange(0, len(order), 16):
+        block = xpress_encode(bytearray().join(make_page(rand) for page in order[x:x + 16]))
+        block += "\x00" * (-len(block) % 8)
+        size = (len(block) - 1) << 10
+        header = bytearray("\x81\x81xpress" + "\x00" * 24)
+        header[9:12] = chr((size >> 8) & 0xff) + chr((size >> 16) & 0xff) + chr(size >> 24)
+        image += header + block
+        blocks.append(block)
+    image += "\x00" * 0x2000
+    return image, blocks
+
+
+def main(argv):
+    pages = (int(argv[1]) if len(argv) > 1 else 16) << 8
+    jobs = int(argv[2]) if len(argv) > 2 else 4
+    rand = random.Random(1)
+    registry.PluginImporter()
+
+    image, blocks = make_hiberfil(pages, rand)
+    hiberfil = tempfile.NamedTemporaryFile(suffix='.sys')
+    hiberfil.write(image)
+    hiberfil.flush()
+    cache = tempfile.mkdtemp()
+
+    print "%d MB of pages in %d Xpress blocks" % (pages >> 8, len(blocks))
+
+    start = time.time()
+    expected = [dict_decode(block) for block in blocks]
+    dict_time = time.time() - start
+    start = time.time()
+    found = [xpress.xpress_decode(block) for block in blocks]
+    bytearray_time = time.time() - start
+    if found != expected:
+        print "Mismatch"
+        return 1
+    print "decode: dict %.2fs, bytearray %.2fs, %.1fx" % (dict_time, bytearray_time, dict_time / bytearray_time)
+
+    def read_all(directory, processes):
+        config = conf.ConfObject()
+        registry.register_global_options(config, addrspace.BaseAddressSpace)
+        config.PROFILE = 'WinXPSP2x86'
+        config.LOCATION = 'file://' + hiberfil.name
+        config.HIBERNATION_CACHE = directory
+        scan.config.SCAN_JOBS = processes
+        start = time.time()
+        space = hibernate.WindowsHiberFileSpace32(standard.FileAddressSpace(None, config), config)
+        data = [space.zread(offset, size) for offset, size in space.get_available_addresses()]
+        return time.time() - start, data
+
+    print "%-28s %10s" % ("read every page", "time (s)")
+    try:
+        results = []
+        for name, directory, processes in (("blocks as needed", None, 1),
+                                           ("decompress whole file, 1", cache, 1),
+                                           ("decompress whole file, %d" % jobs, cache, jobs),
+                                           ("reuse decompressed file", cache, 1)):
+            if name.startswith("decompress"):
+                shutil.rmtree(cache)
+                os.mkdir(cache)
+            elapsed, data = read_all(directory, processes)
+            results.append(data)
+            print "%-28s %10.2f" % (name, elapsed)
+        if any(data != results[0] for data in results):
+            print "Mismatch"
+            return 1
+    finally:
+        shutil.rmtree(cache)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
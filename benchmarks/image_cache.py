@@ -0,0 +1,116 @@
+# DAMM
+# Copyright (c) 2013 504ENSICS Labs
+#
+# This file is part of DAMM.
+#
+# DAMM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# DAMM is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DAMM.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+#
+# Time a physical scan's zreads of a fragmented LiME image read through its
+# address space, against the flat raw copy the image cache converts it to,
+# and time the one-off conversion itself.
+#
+# usage: python benchmarks/image_cache.py [number of segments, default 2000]
+#
+
+import sys
+import os
+import time
+import random
+import struct
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import volatility.conf as conf
+import volatility.registry as registry
+import volatility.constants as constants
+import volatility.addrspace as addrspace
+import volatility.utils as utils
+from libdamm import image_cache
+
+
+def make_lime(fname, count, rand):
+    '''
+    @param: fname: LiME file to write
+    @param: count: number of segments, of 1 to 16 pages separated by holes
+    @param: rand: a random.Random
+
+    @return: end of the last segment
+    '''
+    phys = 0
+    with open(fname, 'wb') as f:
+        for x in xrange(count):
+            length = rand.randrange(1, 17) * 0x1000
+            f.write(struct.pack('<IIQQQ', 0x4c694d45, 1, phys, phys + length - 1, 0))
+            f.write(os.urandom(length))
+            phys += length + rand.randrange(1, 5) * 0x1000
+    return phys
+
+
+def scan(config, fname, end):
+    '''
+    @param: config: the Volatility config
+    @param: fname: image to load
+    @param: end: end of the physical address space
+
+    @return: (name of the address space, seconds, zread data of each scan
+        window)
+    '''
+    config.LOCATION = 'file://' + fname
+    space = utils.load_as(config, astype = 'physical')
+    start = time.time()
+    data = [space.zread(offset, constants.SCAN_BLOCKSIZE + 20) for offset in xrange(0, end, constants.SCAN_BLOCKSIZE)]
+    return space.__class__.__name__, time.time() - start, data
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 2000
+    rand = random.Random(1)
+    registry.PluginImporter()
+
+    config = conf.ConfObject()
+    registry.register_global_options(config, addrspace.BaseAddressSpace)
+    config.PROFILE = 'WinXPSP2x86'
+
+    tmp = tempfile.mkdtemp()
+    try:
+        lime = os.path.join(tmp, 'image.lime')
+        end = make_lime(lime, count, rand)
+        print "%d segments, %d MB of physical address space" % (count, end >> 20)
+
+        start = time.time()
+        config.LOCATION = 'file://' + lime
+        index = image_cache.ImageCache(os.path.join(tmp, 'cache')).convert(lime, config)
+        print "converted once in %.2fs" % (time.time() - start)
+
+        print "%-18s %10s" % ("address space", "scan (s)")
+        results = []
+        for fname in (lime, index['raw']):
+            name, seconds, data = scan(config, fname, end)
+            results.append((seconds, data))
+            print "%-18s %10.2f" % (name, seconds)
+    finally:
+        shutil.rmtree(tmp)
+
+    if results[0][1] != results[1][1]:
+        print "Mismatch"
+        return 1
+    print "speedup: %.1fx" % (results[0][0] / results[1][0])
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,145 @@
+# DAMM
+# Copyright (c) 2013 504ENSICS Labs
+#
+# This file is part of DAMM.
+#
+# DAMM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# DAMM is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DAMM.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+#
+# Compare the name mangling checks process_warnings used to run for every
+# process and known process pair (matching_lcs(), number -> letter swaps and
+# a transpositions dict built per call) with the precompiled NameMatcher, on
+# synthetic process names: known names, mangled known names and others.
+#
+# usage: python benchmarks/name_mangling.py [number of names, default 100000]
+#
+
+import sys
+import os
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import libdamm.warnings as warnings
+
+
+OTHER_NAMES = ["notepad.exe", "firefox.exe", "VBoxService.exe", "wuauclt.exe",
+               "spoolsv.exe", "alg.exe", "cmd.exe", "conhost.exe", "taskhost.exe",
+               "SearchIndexer.exe", "dllhost.exe", "wmiprvse.exe", "System"]
+
+SWAPS = {'l' : '1', 'e' : '3', 'o' : '0', 's' : '5'}
+
+
+def mangle(name, rand):
+    '''
+    @name: a process name
+    @rand: a random.Random
+
+    @return: the name with a random mangling applied
+    '''
+    base, dot, ext = name.partition('.')
+    i = rand.randrange(len(base))
+    how = rand.randrange(5)
+    if how == 0:
+        base = base[:i] + rand.choice(base) + base[i:]
+    elif how == 1 and i < len(base) - 1:
+        base = base[:i] + base[i + 1] + base[i] + base[i + 2:]
+    elif how == 2:
+        base = "".join([SWAPS.get(c, c) if rand.random() < 0.5 else c for c in base])
+    elif how == 3:
+        base = base[:i] + base[i + 1:]
+    else:
+        base = base.upper()
+    return base + dot + ext
+
+
+def make_names(count, known, rand):
+    '''
+    @count: number of names
+    @known: list of known process names
+    @rand: a random.Random
+
+    @return: list of process names
+    '''
+    names = []
+    for x in xrange(count):
+        pick = rand.random()
+        if pick < 0.4:
+            names.append(rand.choice(known))
+        elif pick < 0.7:
+            names.append(mangle(rand.choice(known), rand))
+        else:
+            names.append(rand.choice(OTHER_NAMES))
+    return names
+
+
+def lcs_checks(names, known):
+    findings = []
+    for name in names:
+        transposed = {}
+        for elem in known:
+            for t in warnings.transpositions(elem.split('.')[0]):
+                transposed[t] = elem
+        for proc_name in known:
+            if (name.lower() != proc_name) and (warnings.matching_lcs(proc_name, name)):
+                findings.append((name, proc_name))
+            elif (name.lower() != proc_name) and (name.replace('1', 'l').replace('3', 'e').replace('0', 'o').replace('5', 's').lower() == proc_name):
+                findings.append((name, proc_name))
+        if transposed.get(name.split('.')[0]):
+            findings.append((name, transposed.get(name.split('.')[0])))
+    return findings
+
+
+def matcher_checks(names, known):
+    findings = []
+    matcher = warnings.get_name_matcher(known)
+    for name in names:
+        for proc_name in matcher.similar(name):
+            findings.append((name, proc_name))
+        proc_name = matcher.transposed(name)
+        if proc_name:
+            findings.append((name, proc_name))
+    return findings
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 100000
+    rand = random.Random(1)
+
+    print "%d process names" % count
+    print "%-12s %8s %10s %12s %8s %9s" % ("profile", "known", "lcs (s)", "matcher (s)", "speedup", "findings")
+
+    for profile in ("WinXPSP2x86", "Win7SP1x86"):
+        known = warnings.get_known_processes(profile, "C:\\WINDOWS").keys()
+        names = make_names(count, known, rand)
+
+        start = time.time()
+        expected = lcs_checks(names, known)
+        lcs_time = time.time() - start
+
+        start = time.time()
+        found = matcher_checks(names, known)
+        matcher_time = time.time() - start
+
+        if found != expected:
+            print "Mismatch for %s" % profile
+            return 1
+
+        print "%-12s %8d %10.2f %12.2f %7.2fx %9d" % (profile, len(known), lcs_time, matcher_time, lcs_time / matcher_time, len(found))
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
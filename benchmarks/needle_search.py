@@ -0,0 +1,119 @@
+# DAMM
+# Copyright (c) 2013 504ENSICS Labs
+#
+# This file is part of DAMM.
+#
+# DAMM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# DAMM is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DAMM.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+#
+# Compare the per-needle iterfind() loop MultiPoolScanner used to run over
+# each scan block with the single pass MultiNeedleFinder, on a synthetic
+# buffer sprinkled with the pool tags DAMM's plugins scan for. The buffer is
+# scanned a block at a time, as the scanners do.
+#
+# usage: python benchmarks/needle_search.py [size in MB, default 1024]
+#
+
+import sys
+import os
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import volatility.constants as constants
+import volatility.utils as utils
+import volatility.poolscan as poolscan
+
+
+# processes, modules, mutants, connections, callbacks and mftentries
+NEEDLES = ["Pro\xe3", "Thr\xe5", "Wind", "MmLd", "Mut\xe1", "UdpA", "TcpL",
+           "TcpE", "IoFs", "IoSh", "Cbrb", "DbCb", "CMcb", "Pnp9", "PnpD",
+           "PnpC", "FILE", "BAAD"]
+
+# Distinct synthetic blocks, cycled through to make up the buffer
+BLOCKS = 4
+
+
+def make_block(size, needles):
+    '''
+    @size: block size in bytes
+    @needles: the needles to sprinkle through the block
+
+    @return: a block of random bytes, zero pages, text and needles
+    '''
+    block = bytearray(os.urandom(size))
+    page = 0x1000
+    for offset in xrange(0, size, page * 4):
+        block[offset:offset + page] = "\x00" * page
+    text = "Process Thread TcpIp PnP Manager FILE Callback Mutant " * 64
+    for offset in xrange(page, size - len(text), page * 16):
+        block[offset:offset + len(text)] = text
+    for x in xrange(size / 1024):
+        offset = random.randrange(size - 4)
+        block[offset:offset + 4] = random.choice(needles)
+    return str(block)
+
+
+def loop_search(data, needles):
+    hits = []
+    for needle in needles:
+        for addr in utils.iterfind(data, needle):
+            hits.append((needle, addr))
+    return hits
+
+
+def finder_search(data, finder):
+    return list(finder.finditer(data))
+
+
+def main(argv):
+    size = int(argv[1]) if len(argv) > 1 else 1024
+    random.seed(1)
+    blocks = [make_block(constants.SCAN_BLOCKSIZE, NEEDLES) for x in xrange(BLOCKS)]
+    count = size * 1024 * 1024 / constants.SCAN_BLOCKSIZE
+
+    print "%d MB in %d blocks of %d bytes" % (size, count, constants.SCAN_BLOCKSIZE)
+    print "%-8s %-8s %10s %10s %8s %8s" % ("needles", "engine", "loop (s)", "finder (s)", "speedup", "hits")
+
+    for n in (1, 4, 8, 12, 14, len(NEEDLES)):
+        needles = NEEDLES[:n]
+        finder = poolscan.MultiNeedleFinder(needles)
+
+        loop_time = finder_time = 0.0
+        hits = 0
+        for i in xrange(count):
+            data = blocks[i % BLOCKS]
+
+            start = time.time()
+            expected = loop_search(data, needles)
+            loop_time += time.time() - start
+
+            start = time.time()
+            found = finder_search(data, finder)
+            finder_time += time.time() - start
+
+            expected.sort(key = lambda hit: hit[1])
+            if found != expected:
+                print "Mismatch with %d needles in block %d" % (n, i)
+                return 1
+            hits += len(found)
+
+        engine = "regex" if finder.regex is not None else "loop"
+        print "%-8d %-8s %10.2f %10.2f %7.2fx %8d" % (n, engine, loop_time, finder_time, loop_time / finder_time, hits)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,152 @@
+# DAMM
+# Copyright (c) 2013 504ENSICS Labs
+#
+# This file is part of DAMM.
+#
+# DAMM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# DAMM is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DAMM.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+#
+# Time listing the available pages of an AMD64 address space over a raw
+# image of synthetic page tables: the old walk (one 8 byte read per entry),
+# the bulk walk get_available_pages() does now (one read per table page),
+# and get_available_addresses() for a second address space with the same
+# DTB, which reuses the cached run list.
+#
+# usage: python benchmarks/page_enumeration.py [image size in MB, default 16]
+#
+
+import sys
+import os
+import time
+import struct
+import random
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import volatility.conf as conf
+import volatility.registry as registry
+import volatility.addrspace as addrspace
+import volatility.plugins.addrspaces.standard as standard
+import volatility.plugins.addrspaces.amd64 as amd64
+
+
+DTB = 0x5000
+
+
+def make_image(pages, rand):
+    '''
+    @pages: number of pages in the image
+    @rand: a random.Random
+
+    @return: a raw image where every page is a sparse page table of present,
+        in transition and large page entries
+    '''
+    buf = bytearray(pages * 0x1000)
+    for x in xrange(len(buf) // 8):
+        pick = rand.random()
+        if pick < 0.03:
+            struct.pack_into('<Q', buf, x * 8, (rand.randrange(pages) << 12) | 1 | (0x80 if pick < 0.002 else 0))
+        elif pick < 0.04:
+            struct.pack_into('<Q', buf, x * 8, (rand.randrange(pages) << 12) | (1 << 11))
+    return buf
+
+
+def entry_walk(space):
+    '''
+    @space: an AMD64PagedMemory
+
+    @return: list of (address, size) for the available pages, reading the
+        tables an entry at a time
+    '''
+    pages = []
+    for pml4e in range(0, 0x200):
+        vaddr = pml4e << 39
+        pml4e_value = space.get_pml4e(vaddr)
+        if not space.entry_present(pml4e_value):
+            continue
+        for pdpte in range(0, 0x200):
+            vaddr = (pml4e << 39) | (pdpte << 30)
+            pdpte_value = space.get_pdpi(vaddr, pml4e_value)
+            if not space.entry_present(pdpte_value):
+                continue
+            if space.page_size_flag(pdpte_value):
+                pages.append((vaddr, 0x40000000))
+                continue
+            pgd_curr = space.pdba_base(pdpte_value)
+            for j in range(0, 0x200):
+                soffset = vaddr + (j * 0x200 * 0x200 * 8)
+                entry = space.read_long_long_phys(pgd_curr)
+                pgd_curr = pgd_curr + 8
+                if space.entry_present(entry) and space.page_size_flag(entry):
+                    pages.append((soffset, 0x200000))
+                elif space.entry_present(entry):
+                    pte_curr = entry & 0xFFFFFFFFFF000
+                    for k in range(0, 0x200):
+                        pte_entry = space.read_long_long_phys(pte_curr)
+                        pte_curr = pte_curr + 8
+                        if space.entry_present(pte_entry):
+                            pages.append((soffset + k * 0x1000, 0x1000))
+    return pages
+
+
+def main(argv):
+    size = int(argv[1]) if len(argv) > 1 else 16
+    rand = random.Random(1)
+    registry.PluginImporter()
+
+    image = tempfile.NamedTemporaryFile(suffix='.raw')
+    image.write(make_image(size * 0x100, rand))
+    image.flush()
+
+    config = conf.ConfObject()
+    registry.register_global_options(config, addrspace.BaseAddressSpace)
+    config.PROFILE = 'Win7SP1x64'
+    config.LOCATION = 'file://' + image.name
+
+    def new_space(caching):
+        space = amd64.AMD64PagedMemory(standard.FileAddressSpace(None, config), config, dtb = DTB, skip_as_check = True)
+        if not caching:
+            space.caching = False
+            space.table_cache = None
+        return space
+
+    start = time.time()
+    expected = entry_walk(new_space(False))
+    entry_time = time.time() - start
+
+    start = time.time()
+    space = new_space(True)
+    pages = list(space.get_available_pages())
+    bulk_time = time.time() - start
+
+    runs = list(space.get_available_addresses())
+    start = time.time()
+    reused = list(amd64.AMD64PagedMemory(space.base, config, dtb = DTB, skip_as_check = True).get_available_addresses())
+    reuse_time = time.time() - start
+
+    if pages != expected or reused != runs:
+        print "Mismatch"
+        return 1
+
+    print "%d MB image, %d pages in %d runs" % (size, len(pages), len(runs))
+    print "%-24s %10s %8s" % ("walk", "time (s)", "speedup")
+    print "%-24s %10.3f %7.1fx" % ("entry by entry", entry_time, 1.0)
+    print "%-24s %10.3f %7.1fx" % ("table page at a time", bulk_time, entry_time / bulk_time)
+    print "%-24s %10.3f %7.1fx" % ("cached run list", reuse_time, entry_time / reuse_time)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,100 @@
+# DAMM
+# Copyright (c) 2013 504ENSICS Labs
+#
+# This file is part of DAMM.
+#
+# DAMM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# DAMM is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DAMM.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+#
+# Time a MultiPoolScanner pass over a synthetic raw image, sprinkled with the
+# pool tags DAMM's plugins scan for, with SCAN-JOBS at 1, 2, 4 and the number
+# of cores. Every run must find the same hits as the serial scan. Scaling
+# needs that many cores: with fewer, the extra workers only add overhead.
+#
+# usage: python benchmarks/parallel_scan.py [image size in MB, default 256]
+#
+
+import sys
+import os
+import time
+import random
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import volatility.conf as conf
+import volatility.registry as registry
+import volatility.addrspace as addrspace
+import volatility.scan as scan
+import volatility.poolscan as poolscan
+import volatility.plugins.addrspaces.standard as standard
+
+
+# processes, modules, mutants, connections, callbacks and mftentries
+NEEDLES = ["Pro\xe3", "Thr\xe5", "Wind", "MmLd", "Mut\xe1", "UdpA", "TcpL",
+           "TcpE", "IoFs", "IoSh", "Cbrb", "DbCb", "CMcb", "Pnp9", "PnpD",
+           "PnpC", "FILE", "BAAD"]
+
+
+def make_image(f, size, rand):
+    '''
+    @f: file to write the image to
+    @size: image size in MB
+    @rand: a random.Random
+    '''
+    for x in xrange(size):
+        block = bytearray(os.urandom(1024 * 1024))
+        for y in xrange(1024):
+            offset = rand.randrange(len(block) - 4)
+            block[offset:offset + 4] = rand.choice(NEEDLES)
+        f.write(block)
+    f.flush()
+
+
+def main(argv):
+    size = int(argv[1]) if len(argv) > 1 else 256
+    registry.PluginImporter()
+
+    image = tempfile.NamedTemporaryFile(suffix='.raw')
+    make_image(image, size, random.Random(1))
+
+    config = conf.ConfObject()
+    registry.register_global_options(config, addrspace.BaseAddressSpace)
+    config.PROFILE = 'WinXPSP2x86'
+    config.LOCATION = 'file://' + image.name
+    space = standard.FileAddressSpace(None, config)
+
+    cores = multiprocessing.cpu_count()
+    print "%d MB image, %d cores" % (size, cores)
+    print "%-8s %10s %8s %8s" % ("jobs", "time (s)", "speedup", "hits")
+
+    serial = None
+    for jobs in sorted(set([1, 2, 4, cores])):
+        scan.config.update('SCAN_JOBS', jobs)
+        start = time.time()
+        hits = list(poolscan.MultiPoolScanner(NEEDLES).scan(space))
+        elapsed = time.time() - start
+
+        if serial is None:
+            serial = (hits, elapsed)
+        elif hits != serial[0]:
+            print "Mismatch with %d jobs" % jobs
+            return 1
+        print "%-8d %10.2f %7.2fx %8d" % (jobs, elapsed, serial[1] / elapsed, len(hits))
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
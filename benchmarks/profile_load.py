@@ -0,0 +1,105 @@
+# DAMM
+# Copyright (c) 2013 504ENSICS Labs
+#
+# This file is part of DAMM.
+#
+# DAMM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# DAMM is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DAMM.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+#
+# Time setting up Volatility and building a profile, each run in a fresh
+# interpreter: the eager way (import every profile's vtypes, compile every
+# structure) against VolSetup's lazy importer with a cold and a warm vtype
+# cache, which loads and compiles only what the profile uses.
+#
+# usage: python benchmarks/profile_load.py [profile, default Win7SP1x64] [runs, default 5]
+#
+
+import sys
+import os
+import time
+import shutil
+import tempfile
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+SETUP = '''
+import sys
+sys.path.insert(0, %(root)r)
+sys.path.insert(0, %(libdamm)r)
+import volatility.obj as obj
+import volatility.registry as registry
+obj.VTYPE_CACHE_DIRECTORY = %(cache)r
+'''
+
+EAGER = SETUP + '''
+registry.PluginImporter()
+profile = registry.get_plugin_classes(obj.Profile)[%(profile)r]()
+for name in profile.vtypes.keys():
+    profile.types[name]
+print profile.get_obj_size('_EPROCESS')
+'''
+
+LAZY = SETUP + '''
+import volsetup
+volsetup.VolSetup(%(profile)r, None, None)
+profile = registry.get_plugin_classes(obj.Profile)[%(profile)r]()
+print profile.get_obj_size('_EPROCESS')
+'''
+
+
+def run(code, profile, cache):
+    '''
+    @code: python source to run
+    @profile: a Volatility profile string
+    @cache: vtype cache directory, or None
+
+    @return: (seconds taken, output) for running the code in a new
+        interpreter
+    '''
+    args = {'root' : ROOT, 'libdamm' : os.path.join(ROOT, 'libdamm'), 'profile' : profile, 'cache' : cache}
+    start = time.time()
+    proc = subprocess.Popen([sys.executable, '-c', code % args], stdout=subprocess.PIPE, stderr=open(os.devnull, 'w'))
+    out = proc.communicate()[0]
+    return time.time() - start, out.strip()
+
+
+def main(argv):
+    profile = argv[1] if len(argv) > 1 else 'Win7SP1x64'
+    runs = int(argv[2]) if len(argv) > 2 else 5
+    cache = tempfile.mkdtemp()
+
+    print "%s, %d runs" % (profile, runs)
+    print "%-12s %10s %10s %10s" % ("load", "best (s)", "mean (s)", "_EPROCESS")
+
+    try:
+        # Once to warm up the file cache
+        run(EAGER, profile, None)
+        for name, code, warm in (("eager", EAGER, None), ("lazy cold", LAZY, False), ("lazy warm", LAZY, True)):
+            results = []
+            for x in xrange(runs):
+                if warm is False:
+                    shutil.rmtree(cache)
+                    os.mkdir(cache)
+                results.append(run(code, profile, cache if warm is not None else None))
+            times = [x[0] for x in results]
+            print "%-12s %10.2f %10.2f %10s" % (name, min(times), sum(times) / len(times), results[-1][1].split()[-1])
+    finally:
+        shutil.rmtree(cache)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,120 @@
+# DAMM
+# Copyright (c) 2013 504ENSICS Labs
+#
+# This file is part of DAMM.
+#
+# DAMM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# DAMM is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DAMM.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+#
+# Time address translation and a physical scan's zreads over a run based
+# address space with many runs, like a fragmented crash dump: the linear
+# walk over the runs with a base read per page, as it was before, against
+# the bisect indexed runs with a base read per run.
+#
+# usage: python benchmarks/run_lookup.py [number of runs, default 5000] [lookups, default 50000]
+#
+
+import sys
+import os
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import volatility.conf as conf
+import volatility.registry as registry
+import volatility.constants as constants
+import volatility.addrspace as addrspace
+
+
+class RunSpace(addrspace.AbstractRunBasedMemory):
+    def __init__(self, base, config, runs):
+        addrspace.AbstractRunBasedMemory.__init__(self, base, config)
+        self.runs = runs
+
+
+class LinearRunSpace(RunSpace):
+    def translate(self, addr):
+        for input_addr, output_addr, length in self.runs:
+            if addr >= input_addr and addr < input_addr + length:
+                return output_addr + (addr - input_addr)
+            if addr < input_addr:
+                return None
+        return None
+
+    def translate_length(self, addr, length):
+        return addrspace.AbstractDiscreteAllocMemory.translate_length(self, addr, length)
+
+
+def make_runs(count, rand):
+    '''
+    @count: number of runs
+    @rand: a random.Random
+
+    @return: (runs, size of the data they map) for runs of 1 to 16 pages
+        separated by holes
+    '''
+    runs = []
+    phys = 0
+    offset = 0
+    for x in xrange(count):
+        length = rand.randrange(1, 17) * 0x1000
+        runs.append((phys, offset, length))
+        offset += length
+        phys += length + rand.randrange(1, 5) * 0x1000
+    return runs, offset
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 5000
+    lookups = int(argv[2]) if len(argv) > 2 else 50000
+    rand = random.Random(1)
+    registry.PluginImporter()
+
+    runs, size = make_runs(count, rand)
+    config = conf.ConfObject()
+    registry.register_global_options(config, addrspace.BaseAddressSpace)
+    config.PROFILE = 'WinXPSP2x86'
+    base = addrspace.BufferAddressSpace(config, data = os.urandom(size))
+
+    end = runs[-1][0] + runs[-1][2]
+    addrs = [rand.randrange(end) for x in xrange(lookups)]
+
+    print "%d runs, %d MB mapped, %d lookups" % (count, size >> 20, lookups)
+    print "%-8s %14s %10s" % ("runs", "translate (s)", "scan (s)")
+
+    results = {}
+    for name, cls in (("linear", LinearRunSpace), ("bisect", RunSpace)):
+        space = cls(base, config, runs)
+
+        start = time.time()
+        found = [space.translate(addr) for addr in addrs]
+        translate_time = time.time() - start
+
+        start = time.time()
+        data = [space.zread(offset, constants.SCAN_BLOCKSIZE + 20) for offset in xrange(0, end, constants.SCAN_BLOCKSIZE)]
+        scan_time = time.time() - start
+
+        results[name] = (translate_time, scan_time, found, data)
+        print "%-8s %14.2f %10.2f" % (name, translate_time, scan_time)
+
+    if results["linear"][2:] != results["bisect"][2:]:
+        print "Mismatch"
+        return 1
+    print "speedup: %.1fx translate, %.1fx scan" % (results["linear"][0] / results["bisect"][0], results["linear"][1] / results["bisect"][1])
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,104 @@
+# DAMM
+# Copyright (c) 2013 504ENSICS Labs
+#
+# This file is part of DAMM.
+#
+# DAMM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# DAMM is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DAMM.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+#
+# Time DAMM's startup for a db only command (damm.py -q), each run in a fresh
+# interpreter: the eager startup API.__init__ used to do (import every DAMM
+# plugin, set up Volatility and import all of its plugins), against the lazy
+# one, which lists plugins from the manifest and never sets up Volatility.
+#
+# usage: python benchmarks/startup.py [number of runs, default 5]
+#
+
+import sys
+import os
+import time
+import tempfile
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import libdamm.db_ops as db_ops
+
+
+EAGER = '''
+import sys
+sys.path.insert(0, %(root)r)
+import libdamm.api as api
+import libdamm.volsetup as volsetup
+damm = api.API(db=%(db)r)
+for name, info in damm.get_pluglib().getPlugins():
+    info.handle
+volsetup.VolSetup(None, '0', None)
+damm.query_db()
+'''
+
+LAZY = '''
+import sys
+sys.path.insert(0, %(root)r)
+import libdamm.api as api
+damm = api.API(db=%(db)r)
+damm.query_db()
+'''
+
+COUNT_MODULES = '''
+print len([x for x in sys.modules if x.startswith('volatility.plugins.') and sys.modules[x]])
+'''
+
+
+def run(code, db):
+    '''
+    @code: python source to run, formatted with root and db
+    @db: a DAMM db
+
+    @return: (seconds taken, output) for running the code in a new
+        interpreter
+    '''
+    start = time.time()
+    proc = subprocess.Popen([sys.executable, '-c', code % {'root' : ROOT, 'db' : db}], stdout=subprocess.PIPE, stderr=open(os.devnull, 'w'))
+    out = proc.communicate()[0]
+    return time.time() - start, out.strip()
+
+
+def main(argv):
+    runs = int(argv[1]) if len(argv) > 1 else 5
+
+    db = tempfile.NamedTemporaryFile(suffix='.db')
+    ops = db_ops.DBOps()
+    ops.init_db(db.name, 'image.dmp', 'WinXPSP2x86', [('SystemRoot', 'C:\\WINDOWS')])
+    ops.close()
+
+    print "%d runs of a db only command" % runs
+    print "%-8s %10s %10s %16s" % ("startup", "best (s)", "mean (s)", "vol plugin mods")
+
+    results = {}
+    for name, code in (("eager", EAGER), ("lazy", LAZY)):
+        # Once to warm up the file cache and write any .pyc files
+        run(code, db.name)
+        times = [run(code, db.name)[0] for x in xrange(runs)]
+        modules = run(code + COUNT_MODULES, db.name)[1].split()[-1]
+        results[name] = min(times)
+        print "%-8s %10.2f %10.2f %16s" % (name, min(times), sum(times) / len(times), modules)
+
+    print "speedup: %.1fx" % (results["eager"] / results["lazy"])
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,145 @@
+# DAMM
+# Copyright (c) 2013 504ENSICS Labs
+#
+# This file is part of DAMM.
+#
+# DAMM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# DAMM is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DAMM.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+#
+# Time the SCAN_BLOCKSIZE zreads of a scan over an AMD64 virtual address
+# space, on a raw image of synthetic page tables that map runs of physically
+# contiguous pages with holes in between: a translate, validity check, base
+# read and string concatenation per page, as _read used to do, against the
+# read planner, which merges contiguous pages into one base read each.
+#
+# usage: python benchmarks/virtual_scan.py [mapped MB, default 64]
+#
+
+import sys
+import os
+import time
+import struct
+import random
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import volatility.conf as conf
+import volatility.registry as registry
+import volatility.constants as constants
+import volatility.addrspace as addrspace
+import volatility.plugins.addrspaces.standard as standard
+import volatility.plugins.addrspaces.amd64 as amd64
+
+
+DTB = 0x1000
+
+
+def make_image(mapped, rand):
+    '''
+    @mapped: number of pages to map
+    @rand: a random.Random
+
+    @return: a raw image with page tables at the start, mapping virtual
+        address 0 onwards to runs of 1 to 64 physically contiguous pages,
+        with unmapped pages between some of them
+    '''
+    tables = 3 + (mapped + 511) // 512
+    buf = bytearray((tables + mapped) * 0x1000)
+    struct.pack_into('<Q', buf, DTB, (DTB + 0x1000) | 1)
+    struct.pack_into('<Q', buf, DTB + 0x1000, (DTB + 0x2000) | 1)
+    for x in xrange(tables - 3):
+        struct.pack_into('<Q', buf, DTB + 0x2000 + x * 8, (DTB + (3 + x) * 0x1000) | 1)
+
+    frames = range(tables + 1, tables + mapped)
+    runs = []
+    while frames:
+        length = rand.randrange(1, 65)
+        runs.append(frames[:length])
+        frames = frames[length:]
+    rand.shuffle(runs)
+
+    entry = DTB + 0x3000
+    for run in runs:
+        for frame in run:
+            struct.pack_into('<Q', buf, entry, (frame << 12) | 1)
+            entry += 8
+        if rand.random() < 0.3:
+            entry += 8
+    return buf, (entry - DTB - 0x3000) // 8 * 0x1000
+
+
+def page_read(space, addr, length):
+    '''
+    @space: a paged address space
+    @addr: virtual address
+    @length: bytes to read
+
+    @return: the zread of length bytes at addr, a page at a time
+    '''
+    buff = ""
+    position = addr
+    remaining = length
+    while remaining > 0:
+        datalen = min(remaining, 0x1000 - (position % 0x1000))
+        paddr = space.translate(position)
+        if paddr is None or not space.base.is_valid_address(paddr):
+            data = "\x00" * datalen
+        else:
+            data = space.base.zread(paddr, datalen)
+        buff += data
+        position += datalen
+        remaining -= datalen
+    return buff
+
+
+def main(argv):
+    mapped = (int(argv[1]) if len(argv) > 1 else 64) << 8
+    rand = random.Random(1)
+    registry.PluginImporter()
+
+    data, end = make_image(mapped, rand)
+    image = tempfile.NamedTemporaryFile(suffix='.raw')
+    image.write(data)
+    image.flush()
+
+    config = conf.ConfObject()
+    registry.register_global_options(config, addrspace.BaseAddressSpace)
+    config.PROFILE = 'Win7SP1x64'
+    config.LOCATION = 'file://' + image.name
+    space = amd64.AMD64PagedMemory(standard.FileAddressSpace(None, config), config, dtb = DTB, skip_as_check = True)
+    windows = [(offset, constants.SCAN_BLOCKSIZE + 20) for offset in xrange(0, end, constants.SCAN_BLOCKSIZE)]
+
+    print "%d MB mapped, %d scan windows" % (mapped >> 8, len(windows))
+    print "%-10s %10s" % ("reads", "time (s)")
+
+    results = {}
+    for name, read in (("per page", lambda addr, length: page_read(space, addr, length)), ("planned", space.zread)):
+        # Once to fill the TLB, so only the reads are timed
+        read(*windows[0])
+        start = time.time()
+        results[name] = [read(offset, length) for offset, length in windows]
+        elapsed = time.time() - start
+        results[name + " time"] = elapsed
+        print "%-10s %10.2f" % (name, elapsed)
+
+    if results["per page"] != results["planned"]:
+        print "Mismatch"
+        return 1
+    print "speedup: %.1fx" % (results["per page time"] / results["planned time"])
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,119 @@
+# DAMM
+# Copyright (c) 2013 504ENSICS Labs
+#
+# This file is part of DAMM.
+#
+# DAMM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# DAMM is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DAMM.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+#
+# Time virtual to physical translation for the IA32, PAE and AMD64 address
+# spaces over a raw image of synthetic page tables, with the TLB and page
+# table cache off (every vtop reads each level of the tables from the file)
+# and on. Lookups are clustered around random addresses, like structures
+# followed through a process's memory, and both ways must agree.
+#
+# usage: python benchmarks/vtop_cache.py [number of lookups, default 200000]
+#
+
+import sys
+import os
+import time
+import struct
+import random
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import volatility.conf as conf
+import volatility.registry as registry
+import volatility.addrspace as addrspace
+import volatility.plugins.addrspaces.standard as standard
+import volatility.plugins.addrspaces.intel as intel
+import volatility.plugins.addrspaces.amd64 as amd64
+
+
+PAGES = 0x4000
+DTB = 0x5000
+
+
+def make_image(entry_size, rand):
+    '''
+    @entry_size: size of a page table entry, 4 or 8
+    @rand: a random.Random
+
+    @return: a raw image where every page is a page table of present, in
+        transition, large page and not present entries
+    '''
+    fmt = '<I' if entry_size == 4 else '<Q'
+    buf = bytearray(PAGES * 0x1000)
+    for x in xrange(len(buf) // entry_size):
+        pick = rand.random()
+        if pick < 0.5:
+            entry = (rand.randrange(PAGES) << 12) | 1 | (0x80 if pick < 0.02 else 0)
+        elif pick < 0.6:
+            entry = (rand.randrange(PAGES) << 12) | (1 << 11)
+        else:
+            entry = rand.randrange(1 << 20) & ~1
+        struct.pack_into(fmt, buf, x * entry_size, entry)
+    return buf
+
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 200000
+    rand = random.Random(1)
+    registry.PluginImporter()
+
+    print "%d lookups" % count
+    print "%-20s %12s %10s %8s %9s %11s" % ("address space", "no cache (s)", "cache (s)", "speedup", "tlb hits", "table hits")
+
+    for cls, entry_size, bits, profile in ((intel.IA32PagedMemory, 4, 32, 'WinXPSP2x86'),
+                                           (intel.IA32PagedMemoryPae, 8, 32, 'WinXPSP2x86'),
+                                           (amd64.AMD64PagedMemory, 8, 48, 'Win7SP1x64')):
+        image = tempfile.NamedTemporaryFile(suffix='.raw')
+        image.write(make_image(entry_size, rand))
+        image.flush()
+
+        config = conf.ConfObject()
+        registry.register_global_options(config, addrspace.BaseAddressSpace)
+        config.PROFILE = profile
+        config.LOCATION = 'file://' + image.name
+
+        addrs = []
+        while len(addrs) < count:
+            start = rand.randrange(1 << bits)
+            addrs.extend([start + rand.randrange(0x4000) for x in xrange(50)])
+
+        times = []
+        for caching in (False, True):
+            space = cls(standard.FileAddressSpace(None, config), config, dtb = DTB, skip_as_check = True)
+            if not caching:
+                space.caching = False
+                space.table_cache = None
+            start = time.time()
+            found = [space.vtop(addr) for addr in addrs]
+            times.append(time.time() - start)
+            if caching and found != expected:
+                print "Mismatch for %s" % cls.__name__
+                return 1
+            expected = found
+
+        stats = space.cache_stats()
+        print "%-20s %12.2f %10.2f %7.2fx %8.1f%% %10.1f%%" % (cls.__name__, times[0], times[1], times[0] / times[1],
+            100.0 * stats['tlb_hits'] / (stats['tlb_hits'] + stats['tlb_misses']),
+            100.0 * stats['table_hits'] / (stats['table_hits'] + stats['table_misses']))
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -19,6 +19,7 @@
 
 import sys, os
 from libdamm.api import API as DAMM
+from libdamm.image_cache import DEFAULT_DIR as IMAGE_CACHE_DIR
 import tempfile
 
 
@@ -41,7 +42,15 @@ def parse_args(argv):
     parser.add_argument('--diff', help='Diff the db with this db file as a baseline', metavar='BASELINE')
     parser.add_argument('-u', nargs='+', help='Use the specified fields to determine uniqueness of memobjs when diffing', metavar='FIELD')
     parser.add_argument('--warnings', help='Look for suspicious objects', action='store_true')
+    parser.add_argument('--rules', help='File of extra warning rules, in the format of libdamm/warning_rules.json', metavar='FILE')
+    parser.add_argument('--severity', choices=['low', 'medium', 'high'], help='Only check warning rules of at least this severity')
     parser.add_argument('-q', help='Query the supplied db (via --db)', action='store_true')
+    parser.add_argument('--jobs', type=int, default=1, help='Run plugins in N parallel processes', metavar='N')
+    parser.add_argument('--fleet', help='Diff the db against every baseline in this fleet baseline store', metavar='STORE')
+    parser.add_argument('--add-baselines', nargs='+', help='Add these dbs to the fleet baseline store (via --fleet)', metavar='BASELINE')
+    parser.add_argument('--rare', type=int, default=0, help='With --fleet, also show results seen in at most N baselines', metavar='N')
+    parser.add_argument('--convert', help='Convert the image (via -f) once into a flat raw copy in the image cache, which later runs read instead', action='store_true')
+    parser.add_argument('--image-cache', default=IMAGE_CACHE_DIR, help='Directory of converted images (default %s)' % IMAGE_CACHE_DIR, metavar='DIR')
 
     return parser.parse_args()
 
@@ -52,7 +61,7 @@ def main(argv=None):
     '''
     args = parse_args(argv)
 
-    damm = DAMM(plugins=args.p, extra_dir=args.d, memimg=args.f, profile=args.profile, kdbg=args.k, debug=args.debug, filterp=args.filter, filterp_type=args.filtertype, db=args.db, unique_id_fields=args.u, diff=args.diff)
+    damm = DAMM(plugins=args.p, extra_dir=args.d, memimg=args.f, profile=args.profile, kdbg=args.k, debug=args.debug, filterp=args.filter, filterp_type=args.filtertype, db=args.db, unique_id_fields=args.u, diff=args.diff, jobs=args.jobs, fleet=args.fleet, rules=args.rules, severity=args.severity, image_cache_dir=args.image_cache)
 
     if args.info:
         print damm.vol_profiles_info()
@@ -76,11 +85,45 @@ def main(argv=None):
         sys.exit()
 
     if args.warnings:
+        if args.rules and not os.path.isfile(args.rules):
+            print '%s is not a file.' % args.rules
+            sys.exit()
+
         warns = damm.check_warnings(damm.get_plugins(), args.db)
         for elem in warns:
             print elem
         sys.exit()    
 
+    if args.add_baselines:
+        if not args.fleet:
+            print 'Adding baselines requires the --fleet argument.'
+            sys.exit()
+
+        for elem in args.add_baselines:
+            if not os.path.isfile(elem):
+                print '%s is not a file.' % elem
+                sys.exit()
+
+        for elem in damm.add_fleet_baselines(args.add_baselines):
+            print elem
+
+        # Nothing to diff
+        if not args.db:
+            damm.close()
+            sys.exit()
+
+    if args.convert:
+        if not args.f or not os.path.isfile(args.f):
+            print 'Converting requires an image file (via -f).'
+            sys.exit()
+
+        index = damm.convert_image()
+        if index:
+            print "%s is cached as %s" % (args.f, index['raw'])
+        else:
+            print "%s is already a raw image." % args.f
+        sys.exit()
+
     if args.p is None:
         print "You must specify plugins to run."
         sys.exit()
@@ -125,6 +168,31 @@ def main(argv=None):
         for elem in results:
             print elem
 
+    elif args.fleet:
+        if not args.db:
+            print 'Diffing against a fleet requires the --db argument.'
+            sys.exit()
+
+        if not os.path.isfile(args.db):
+            print '%s is not a file.' % args.db
+            sys.exit()
+
+        if args.rare < 0:
+            print "--rare must be at least 0."
+            sys.exit()
+
+        if args.grepable:
+            results = damm.do_fleet_diffs_grepable(args.rare)
+        elif args.tsv:
+            results = damm.do_fleet_diffs_tsv(args.rare)
+        else:
+            results = damm.do_fleet_diffs_screen(args.rare)
+
+        for elem in results:
+            print elem
+
+        damm.close()
+
     else: # no diff
 
         # require at least one of -f or --db
@@ -140,6 +208,10 @@ def main(argv=None):
             print "The -u is only applicable to diff operations."
             sys.exit() 
 
+        if args.jobs < 1:
+            print "--jobs must be at least 1."
+            sys.exit()
+
         if args.profile:
             if args.profile not in damm.get_vol_profiles():
                 print "%s is not a valid profile." % args.profile 
@@ -162,6 +234,8 @@ def main(argv=None):
         for elem in results:
             print elem        
 
+        damm.close()
+
         # If we created a temp db, clean up    
         if kill_tempdb:
             tempdb.close()
@@ -19,7 +19,6 @@
 
 import sys
 import os
-import volsetup
 import plugin
 from utils import debug
 from utils import set_debug
@@ -27,18 +26,25 @@ import sqlite3
 import itertools
 import db_ops
 import warnings
+import scan_coordinator
+import plugin_pool
+import fleet_ops
+import image_cache
 
 
 class API:
 
-    def __init__(self, plugins=None, extra_dir=None, memimg='', profile='', kdbg='0', filterp=None, filterp_type=None, output=None, db=None, debug=False, unique_id_fields=None, diff=None):
+    def __init__(self, plugins=None, extra_dir=None, memimg='', profile='', kdbg='0', filterp=None, filterp_type=None, output=None, db=None, debug=False, unique_id_fields=None, diff=None, jobs=1, fleet=None, rules=None, severity=None, image_cache_dir=None):
 
         set_debug(debug)
+        self.debug = debug
 
         # Use the supplied db file
         self.db = db
         self.db_ops = db_ops.DBOps()
         self.diff = diff
+        if self.diff:
+            self.db_ops.add_baseline(self.diff)
 
         # Set up plugin system
         self.pluglib = plugin.PluginLibrary()
@@ -46,6 +52,7 @@ class API:
         self.plugins = plugins
         self.plugins = self.pluglib.getPluginList() if (self.plugins and self.plugins[0].lower() == 'all') else self.plugins
         # Add user specified directory of plugins
+        self.extra_dir = None
         if extra_dir:
             self.extra_dir = extra_dir
             self.pluglib.addPluginDir(self.extra_dir)
@@ -57,17 +64,26 @@ class API:
         self.filterp_type = filterp_type if filterp_type else 'exact'
         self.unique_id_fields = unique_id_fields        
 
+        # Extra warning rules file, and the least severity of rules to run
+        self.rules = rules
+        self.severity = severity
+
+        # Fleet baseline store to diff against
+        self.fleet = fleet
+        self.fleet_ops = fleet_ops.FleetOps(self.fleet, self.db_ops, self.unique_id_fields) if self.fleet else None
+
         # Settings for the volatility subsystem
         self.memimg = memimg
         self.profile = profile
         self.kdbg = kdbg
-        self.vol = self.__vol_init()
-        # In case we're guessing a profile and need to get the result. Kind of a hack.
-        if self.profile == None:
-            try:
-                self.profile = self.vol.config.get_value('profile')
-            except:
-                pass
+        # Set up on first use, see get_vol()
+        self.vol = None
+        self.scan_coordinator = None
+        # Number of worker processes to run plugins in
+        self.jobs = jobs if jobs else 1
+        # Flat raw copies of layered images, see get_vol_image()
+        self.image_cache = image_cache.ImageCache(image_cache_dir) if image_cache_dir else None
+        self.vol_image = None
 
 
     def set_debug(self, bool):
@@ -81,14 +97,29 @@ class API:
 
     def check_warnings(self, plugins, db):
         '''
-        Check for inidcators of malicious activity
+        Check for inidcators of malicious activity. With a memory image, the
+        plugins not in the db yet are run first, and checked as they run.
 
         @plugins: list of plugin names
         @db: a DAMM db
 
         @return: generator of warnings results
         '''
-        return warnings.check_warnings(plugins, db)
+        if self.memimg and plugins:
+            return self.__watch_warnings(plugins)
+
+        return warnings.check_warnings(plugins, db, self.get_warning_rules())
+
+
+    def get_warning_rules(self):
+        '''
+        @return: list of the default warning rules and those of the user's
+            rules file, at or above the user's severity
+        '''
+        rules = warnings.load_rules(warnings.DEFAULT_RULES, self.severity)
+        if self.rules:
+            rules += warnings.load_rules(self.rules, self.severity)
+        return rules
 
 
     def __filter_passed(self, elem, typedefs):
@@ -133,7 +164,24 @@ class API:
         if self.filterp == None:
             return plug_results
 
-        filtered_plug_results = []
+        return list(self.__filter_iter(plug_results, setobj, changed))
+
+
+    def __filter_iter(self, plug_results, setobj, changed=False):
+        '''
+        Lazily apply specified filter to plugin results
+
+        @plug_results: iterable of plugin output
+        @setobj: the setobj for the plugin
+        @changed: True if plug_results is from a diff operation
+
+        @return: generator of filtered plugin results 
+        '''
+        # If there is no filter defined, return as is.
+        if self.filterp == None:
+            for elem in plug_results:
+                yield elem
+            return
 
         # get type definitions for this memobj type
         typedefs = setobj.get_field_typedefs()
@@ -151,9 +199,38 @@ class API:
 
                 debug("filter passed %s" % filter_passed)
                 if filter_passed:
-                    filtered_plug_results.append(elem)
-            
-        return filtered_plug_results
+                    yield elem
+
+
+    def filter_sql(self, setobj):
+        '''
+        Compile specified filter to an SQL condition on the plugin's table, 
+        matching the same rows as filter_plugin.
+
+        @setobj: the setobj for the plugin
+
+        @return: string SQL condition, list of values for its placeholders
+        '''
+        # get type definitions for this memobj type
+        typedefs = setobj.get_field_typedefs()
+        columns = setobj.get_child().fields.keys()
+        fields = [x for x in typedefs.get(self.filterp_name, []) if x in columns]
+
+        if self.filterp_type.lower() == 'exact':
+            conds = ["%s = ? collate nocase" % x for x in fields]
+            value = self.filterp_value
+        elif self.filterp_type.lower() == 'partial':
+            conds = ["%s like ? escape '\\'" % x for x in fields]
+            value = "%%%s%%" % self.filterp_value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        else:
+            debug("bad filter type")
+            conds = []
+
+        # Nothing can pass a filter on fields the memobj type doesn't have
+        if not conds:
+            return "0", []
+
+        return " or ".join(conds), [value for x in conds]
 
 
     def filter_diff(self, changed, new, setobj):
@@ -186,42 +263,31 @@ class API:
 
         @return list of plugin results
         '''
-        # Are we an empty db? If so, init the db.
-        if self.db_ops.db_empty(self.db):
-            env = []
-            import volatility.plugins.envars as envars
-            for task in envars.Envars(self.vol.config).calculate():
-                if task.ImageFileName.lower() == 'explorer.exe':
-                    for var, val in task.environment_variables():
-                        env.append((var, val))
-                    break
-
-            self.db_ops.init_db(self.db, self.memimg, self.profile, env)
-        
-        # If we're a valid loaded plugin
-        if plug in self.pluglib.getPluginList():
-            # get the setobj for this plugin
-            setobj = self.pluglib.getPlugin(plug).handle.getPluginObject(self.vol)
-            table_name = self.db_ops.get_table_name(setobj)
-            # If we're not currently in the db, run plugin get inserted.
-            if not self.db_ops.in_db(self.db, table_name):
-                self.db_ops.insert_plugin(setobj, self.db, self.memimg)
-
-            # Operate from the db.
-            plug_results = []
-            # For each row in the db
-            for elem in self.db_ops.get_rows(self.db, table_name):
-                # Convert to memobj and add to results
-                plug_results.append(setobj.memobj_from_row(elem))
-            # Filter the results
-            filtered_plug_results = self.filter_plugin(plug_results, setobj)
-            # Return the sorted list of results.
-            return setobj.sort_elems(filtered_plug_results)
-    
-        else:
+        setobj = self.__load_plugin(plug)
+        if setobj is None:
             # Bogus plugin. Return nothing.
             return []
 
+        # Return the sorted list of results.
+        return setobj.sort_elems(list(self.__plugin_results(setobj)))
+
+
+    def stream_plugin(self, plug):
+        '''
+        Run a single plugin, without sorting the results. Results are read
+        from the db as they are consumed, so memory use stays flat.
+
+        @plug: string name of plugin to run
+
+        @return generator of plugin results, in db order
+        '''
+        setobj = self.__load_plugin(plug)
+        if setobj is None:
+            return
+
+        for elem in self.__plugin_results(setobj):
+            yield elem
+
 
     def run_plugins(self):
         '''
@@ -229,6 +295,7 @@ class API:
 
         @return: generator of memobj results of running plugins
         '''
+        self.__run_parallel()
         for curr in self.plugins:
             for elem in self.run_plugin(curr):
                 yield elem
@@ -240,8 +307,9 @@ class API:
 
         @return: generator of grepable string results of running plugins
         '''
+        self.__run_parallel()
         for curr in self.plugins:
-            for elem in self.run_plugin(curr):
+            for elem in self.stream_plugin(curr):
                 yield "%s: %s" % (curr, elem)
 
 
@@ -252,6 +320,7 @@ class API:
         @return: generator of screen formatted string results of running 
             plugins
         '''
+        self.__run_parallel()
         for curr in self.plugins:
             # Get appropriate fields lengths for each attribute of the memobjs
             res = []
@@ -289,8 +358,9 @@ class API:
 
         @return: generator of tsv formatted string results of running plugins
         '''
+        self.__run_parallel()
         for curr in self.plugins:
-            gen = self.run_plugin(curr)
+            gen = self.stream_plugin(curr)
 
             # Print a header as first row
             header_done = False
@@ -310,20 +380,19 @@ class API:
         yield ''
 
 
-    def __memobj_equals(self, first, second, setobj):
+    def __memobj_equals(self, first, second, diff_fields):
         '''
         Using the fields in diff_fields list, determine if two objects are 
         equal (i.e., their field values are equal)
 
         @first: a memobj
         @second: another memobj of the same type
-        @setobj: the setobj for the memobj type
+        @diff_fields: the setobj's diff fields for the memobj type
 
         @return: True if equal
         '''
         # Use diff_fields if some were specified, else use everything available
-        for field in setobj.get_diff_fields():
-            debug('Diffing on field: %s' % field)
+        for field in diff_fields:
             foundFirst = field in first.fields
             # Check if presence of field in both First and Second is the same...
             if foundFirst != (field in second.fields):
@@ -343,22 +412,73 @@ class API:
 
         @return: a dict of (unique_id : memobj), the setobj for the memobj type
         '''
-        # Table name is of form modulename_setobjname
-        # module name == plugin name
-        mod_name, setobj_name = table.split("_")
-        mod = __import__(mod_name)
-
         res = {}
-        setobj = getattr(mod, setobj_name)()
+        setobj = self.db_ops.get_setobj(table)
         for elem in self.db_ops.get_rows(db, table):
             memobj = setobj.memobj_from_row(elem)
             unique_id = ''.join([memobj.fields[x] for x in self.unique_id_fields]) if self.unique_id_fields else setobj.get_unique_id(memobj)
-            debug("db: %s table: %s unique_id: %s" % (db, table, unique_id))
             res[unique_id] = memobj
+        debug("db: %s table: %s unique_ids: %d" % (db, table, len(res)))
 
         return res, setobj
 
 
+    def get_digest_dict(self, db, table):
+        '''
+        Return dict of unique id digest : (rowid, diff fields digest)
+
+        @db: a DAMM db
+        @table: the table name to make a digest dictionary of
+
+        @return: a dict of (unique id digest : (rowid, diff fields digest))
+        '''
+        # In rowid order, so later rows win like in get_object_dict
+        res = dict((uid, (rowid, digest)) for rowid, uid, digest in self.db_ops.get_digests(db, table))
+        debug("db: %s table: %s unique_ids: %d" % (db, table, len(res)))
+
+        return res
+
+
+    def __digest_diff(self, table):
+        '''
+        Diff a table on the digests stored with its rows. Only the rows that
+        are new or changed are read back from the dbs as memobjs.
+
+        @table: the table to perform the diff operation on
+
+        @return: as for do_diff()
+        '''
+        new_ids = []  # rowids in db of memobjs only in db2
+        changed_ids = []  # (rowid in diff, rowid in db) of changed memobjs
+
+        diff_dict = self.get_digest_dict(self.diff, table)
+        db_dict = self.get_digest_dict(self.db, table)
+        for elem, (rowid, digest) in db_dict.iteritems():
+            if elem not in diff_dict:
+                new_ids.append(rowid)
+            elif diff_dict[elem][1] != digest:
+                changed_ids.append((diff_dict[elem][0], rowid))
+        new_ids.sort()
+        changed_ids.sort(key=lambda x: x[1])
+
+        db_rows = self.db_ops.get_rows_by_id(self.db, table, new_ids + [x[1] for x in changed_ids])
+        diff_rows = self.db_ops.get_rows_by_id(self.diff, table, [x[0] for x in changed_ids])
+
+        setobj = self.db_ops.get_setobj(table)
+        diff_fields = setobj.get_diff_fields()
+        debug('Diffing on fields: %s' % diff_fields)
+
+        new = [setobj.memobj_from_row(db_rows[x]) for x in new_ids]
+        changed = []
+        for diff_id, db_id in changed_ids:
+            pair = (setobj.memobj_from_row(diff_rows[diff_id]), setobj.memobj_from_row(db_rows[db_id]))
+            # Differing digests should mean differing fields, but check
+            if not self.__memobj_equals(pair[0], pair[1], diff_fields):
+                changed.append(pair)
+
+        return self.filter_diff(changed, new, setobj)
+
+
     def do_diff(self, table):
         '''
         Perform the differencing operation on two sets of memobjs pulled from
@@ -378,21 +498,30 @@ class API:
         db_tables = self.db_ops.get_tables(self.db)
         debug("DB2: %s" % db_tables)
         debug("TABLE: %s" % table)
+
+        # Compare digests when both dbs have them, unless -u overrides 
+        # the unique ids they were computed from
+        if not self.unique_id_fields and self.db_ops.has_digests(self.diff, table) and self.db_ops.has_digests(self.db, table):
+            return self.__digest_diff(table)
         
         # get dicts of {unique_id : memobject} 
         diff_dict, setobj = self.get_object_dict(self.diff, table)
         db_dict, _ = self.get_object_dict(self.db, table)
 
-        for elem in db_dict.keys():
+        diff_fields = setobj.get_diff_fields()
+        debug('Diffing on fields: %s' % diff_fields)
+
+        # Match on the unique ids with hashed lookups, not by searching lists
+        for elem, memobj in db_dict.iteritems():
+            # db has no corresponding memobj
+            if elem not in diff_dict:
+                new.append(memobj)
             # corresponding memobjs are equal
-            if (elem in diff_dict.keys()) and (self.__memobj_equals(diff_dict[elem], db_dict[elem], setobj)):
-                unchanged.append(db_dict[elem])
+            elif self.__memobj_equals(diff_dict[elem], memobj, diff_fields):
+                unchanged.append(memobj)
             # corresponding memobjs have differing fields
-            elif elem in diff_dict.keys():
-                changed.append((diff_dict[elem], db_dict[elem]))
-            # db has no corresponding memobj
             else:
-                new.append(db_dict[elem])
+                changed.append((diff_dict[elem], memobj))
         
         return self.filter_diff(changed, new, setobj)
 
@@ -555,6 +684,150 @@ class API:
             yield ''
 
 
+    def add_fleet_baselines(self, dbs):
+        '''
+        Add baseline dbs to the fleet baseline store
+
+        @dbs: list of DAMM dbs
+
+        @return: generator of string results of adding each db
+        '''
+        for db in dbs:
+            self.db_ops.add_baseline(db)
+            if self.fleet_ops.add_baseline(db):
+                yield "Added %s" % db
+            else:
+                yield "%s is already in the fleet baseline" % db
+            self.db_ops.close(db)
+
+
+    def do_fleet_diff(self, table, rare=0):
+        '''
+        Diff the memobjs of one plugin against the fleet baseline store.
+
+        @table: the table to perform the diff operation on
+        @rare: also report memobjs seen in at most this many baselines
+
+        @return: list of (number of baselines seen in, memobj), the setobj
+            for the plugin
+        '''
+        setobj = self.db_ops.get_setobj(table)
+        res = [(count, setobj.memobj_from_row(row)) for count, row in self.fleet_ops.diff(self.db, table, rare)]
+
+        if self.filterp != None:
+            passed = set([id(x) for x in self.filter_plugin([x[1] for x in res], setobj)])
+            res = [x for x in res if id(x[1]) in passed]
+
+        return res, setobj
+
+
+    def do_fleet_diffs(self, rare=0):
+        '''
+        Return the memobjs of the db that are new relative to all the fleet
+        baselines, or rare across them.
+
+        @rare: also report memobjs seen in at most this many baselines
+
+        @return: list of (list of (status, memobj), plugin name)
+        '''
+        fleet_tables = self.fleet_ops.get_tables()
+        debug("FLEET: %s" % fleet_tables)
+        db_tables = self.db_ops.get_tables(self.db)
+        debug("DB: %s" % db_tables)
+
+        # Can only compare memobjs for tables which some baseline has
+        compareable = [x for x in db_tables if x in fleet_tables and x.split("_")[0] in self.plugins]
+        debug("Can't compare %s" % str(set(db_tables).difference(fleet_tables)))
+
+        res = []
+        for table in compareable:
+            results, setobj = self.do_fleet_diff(table, rare)
+            status = lambda count: "Rare %d/%d" % (count, fleet_tables[table]) if count else "New"
+            res.append(([(status(count), memobj) for count, memobj in results], table.split("_")[0]))
+        return res
+
+
+    def do_fleet_diffs_grepable(self, rare=0):
+        '''
+        Return the fleet differences of the db in grepable format.
+
+        @rare: also report memobjs seen in at most this many baselines
+
+        @return: generator of grepable string results
+        '''
+        for results, plugname in self.do_fleet_diffs(rare):
+            if not results:
+                yield "%s: Nothing to report." % plugname
+            for status, memobj in results:
+                yield "%s: %s\t%s" % (plugname, status, "\t".join(["%s: %s" % (x, memobj.fields[x]) for x in memobj.fields.keys()]))
+            yield ''
+
+
+    def do_fleet_diffs_screen(self, rare=0):
+        '''
+        Return the fleet differences of the db in screen formatted output.
+
+        @rare: also report memobjs seen in at most this many baselines
+
+        @return: generator of screen formatted string results
+        '''
+        for results, plugname in self.do_fleet_diffs(rare):
+            if not results:
+                yield "%s: Nothing to report." % plugname
+                yield ''
+                continue
+
+            yield plugname
+
+            # Get fields lengths for each attribute of the memobjs
+            keys = results[0][1].fields.keys()
+            status_length = max([len(x[0]) for x in results] + [len('Status')])
+            field_lengths = [len(x) for x in keys]
+            for _, elem in results:
+                for idx, attr in enumerate(keys):
+                    if elem.fields[attr]:
+                        field_lengths[idx] = max(field_lengths[idx], len(elem.fields[attr]))
+
+            yield "%s\t%s" % ('{column: <{width}}'.format(column='Status', width=status_length), "\t".join(['{column: <{width}}'.format(column=x, width=field_lengths[i]) for i, x in enumerate(keys)]))  # column headers
+            for status, elem in results:
+                yield "%s\t%s" % ('{column: <{width}}'.format(column=status, width=status_length), "\t".join(['{column: <{width}}'.format(column=elem.fields[x], width=field_lengths[i]) for i, x in enumerate(keys)]).strip())
+
+            yield ''
+
+
+    def do_fleet_diffs_tsv(self, rare=0):
+        '''
+        Return the fleet differences of the db in tsv format.
+
+        @rare: also report memobjs seen in at most this many baselines
+
+        @return: generator of tsv formatted string results
+        '''
+        for results, plugname in self.do_fleet_diffs(rare):
+            if not results:
+                yield "%s: Nothing to report." % plugname
+                yield ''
+                continue
+
+            yield plugname
+            yield "Status\t%s" % "".join([("%s\t" % x) for x in results[0][1].fields.keys()])  # column headers
+            for status, memobj in results:
+                yield "%s\t%s" % (status, "".join([("%s\t" % memobj.fields[x]) for x in memobj.fields.keys()]))
+
+            yield ''
+
+
+    def close(self):
+        '''
+        Close the connections to the dbs, and stop replaying pool scans from
+        the shared scan.
+        '''
+        self.db_ops.close()
+        if self.scan_coordinator is not None:
+            self.scan_coordinator.close()
+            self.scan_coordinator = None
+
+
     # Getter Setter Goodness (Madness?)
 
     def query_db(self):
@@ -592,17 +865,22 @@ class API:
         '''
         @return: string info available Volatility profiles
         '''
-        return self.vol.vol_profiles_list()
+        return self.get_vol().vol_profiles_list()
 
 
     def get_vol_profiles(self):
-        return self.vol.vol_profiles()
+        return self.get_vol().vol_profiles()
 
 
     def get_vol(self):
         '''
+        The Volatility runtime is only set up when first needed, so commands
+        that only read dbs never load it.
+
         @return: the underlying Volsetup instance
         '''
+        if self.vol is None:
+            self.vol = self.__vol_init()
         return self.vol
 
 
@@ -646,14 +924,50 @@ class API:
 
         @fname: name if memory image file 
         '''
-        self.vol.set_memimg(fname)
+        self.get_vol().set_memimg(fname)
 
 
     def get_memimg(self):
         '''
         @return name if memory image file 
         '''
-        return self.vol.config.location
+        return self.get_vol().config.location
+
+
+    def get_vol_image(self):
+        '''
+        The image Volatility reads is the flat raw copy of the memory image
+        in the image cache, if it has been converted, or else the memory
+        image itself.
+
+        @return: (image file name, DTB address or None)
+        '''
+        if self.vol_image is None:
+            index = None
+            if self.image_cache and self.memimg:
+                index = self.image_cache.find(self.memimg)
+            if index:
+                debug("Reading %s from its cached copy %s" % (self.memimg, index['raw']))
+                if self.profile is None:
+                    self.profile = index['profile']
+                self.vol_image = (index['raw'], index['dtb'])
+            else:
+                self.vol_image = (self.memimg, None)
+        return self.vol_image
+
+
+    def convert_image(self):
+        '''
+        Convert the memory image once into a flat raw copy in the image
+        cache, which later runs on the image then read instead.
+
+        @return: the index dict of the cached copy, or None if the memory
+            image is already a raw image
+        '''
+        index = self.image_cache.find(self.memimg)
+        if index:
+            return index
+        return self.image_cache.convert(self.memimg, self.get_vol().config)
 
 
     def set_profile(self, profile):
@@ -662,14 +976,14 @@ class API:
 
         @profile: string Volatility profile
         '''
-        self.vol.set_profile(profile)
+        self.get_vol().set_profile(profile)
 
 
     def get_profile(self):
         '''
         @return: string for Volatility profile 
         '''
-        return self.vol.config.profile
+        return self.get_vol().config.profile
 
 
     def set_kdbg(self, kdbg):
@@ -678,14 +992,14 @@ class API:
 
         @profile: hex string Volatility kdbg
         '''
-        self.vol.set_kdbg(kdbg)
+        self.get_vol().set_kdbg(kdbg)
 
 
     def get_kdbg(self):
         '''
         @return: hex string for Volatility kdbg 
         '''
-        return self.vol.config.kdbg
+        return self.get_vol().config.kdbg
 
 
     def set_filterp(self, filterp):
@@ -721,6 +1035,22 @@ class API:
         return self.filterp_type
 
 
+    def set_jobs(self, jobs):
+        '''
+        Set the number of worker processes to run plugins in.
+
+        @jobs: int number of processes, 1 to run plugins serially
+        '''
+        self.jobs = jobs
+
+
+    def get_jobs(self):
+        '''
+        @return: int number of worker processes to run plugins in
+        '''
+        return self.jobs
+
+
     def set_db(self, db):
         '''
         Set the name of the db to use for persistence. If 'db' is not a db, it
@@ -741,9 +1071,171 @@ class API:
    # private internal functions
 
 
+    def __init_db(self):
+        '''
+        If this is an empty db, store the metadata for the memory image.
+        '''
+        if self.db_ops.db_empty(self.db):
+            env = []
+            import volatility.plugins.envars as envars
+            for task in envars.Envars(self.get_vol().config).calculate():
+                if task.ImageFileName.lower() == 'explorer.exe':
+                    for var, val in task.environment_variables():
+                        env.append((var, val))
+                    break
+
+            self.db_ops.init_db(self.db, self.memimg, self.profile, env)
+
+
+    def __load_plugin(self, plug, watch=None):
+        '''
+        Get a plugin's results into the db, running it if they're not there
+        yet.
+
+        @plug: string name of plugin to run
+        @watch: optional function called with the setobj and each memobj if
+            the plugin is run
+
+        @return: the setobj for the plugin, or None if it's not a valid 
+            loaded plugin
+        '''
+        self.__init_db()
+
+        # If we're a valid loaded plugin
+        if plug not in self.pluglib.getPluginList():
+            return None
+
+        info = self.pluglib.getPlugin(plug)
+        # Results already in the db are read back without Volatility
+        if self.db_ops.in_db(self.db, info.table):
+            return info.handle.getPluginObject(self.vol)
+
+        # Otherwise run the plugin and get inserted.
+        setobj = info.handle.getPluginObject(self.get_vol())
+        self.__shared_scan()
+        self.db_ops.insert_plugin(setobj, self.db, self.memimg, watch)
+
+        return setobj
+
+
+    def __plugin_results(self, setobj):
+        '''
+        Operate from the db: convert each row of a plugin's table that passes
+        the filter to a memobj. The filter is run by the db.
+
+        @setobj: the setobj for the plugin
+
+        @return: generator of filtered plugin results
+        '''
+        table = self.db_ops.get_table_name(setobj)
+        where, params = None, []
+        if self.filterp != None:
+            # Tables from older dbs may not have the filter indexes yet
+            self.db_ops.create_indexes(self.db_ops.connect(self.db), setobj)
+            where, params = self.filter_sql(setobj)
+
+        rows = self.db_ops.get_rows(self.db, table, where, params)
+        return (setobj.memobj_from_row(elem) for elem in rows)
+
+
+    def __pending_plugins(self):
+        '''
+        @return: dict of plugin name : setobj for the plugins to run that 
+            are not in the db yet
+        '''
+        res = {}
+        for plug in self.plugins:
+            if plug in self.pluglib.getPluginList():
+                info = self.pluglib.getPlugin(plug)
+                if not self.db_ops.in_db(self.db, info.table):
+                    res[plug] = info.handle.getPluginObject(self.get_vol())
+        return res
+
+
+    def __shared_scan(self):
+        '''
+        Scan the memory image once for the needles of every plugin that still
+        has to be run, so each plugin's pool scans don't re-read the image.
+        '''
+        if self.scan_coordinator is not None or not self.memimg:
+            return
+
+        self.scan_coordinator = scan_coordinator.shared_scan(self.get_vol(), self.__pending_plugins().values())
+
+
+    def __run_parallel(self, watch=None):
+        '''
+        With more than one job, run the plugins not in the db yet in worker
+        processes and insert their results. Output is then read back from the
+        db exactly as for a serial run.
+
+        @watch: optional function called with the setobj and each memobj 
+            as it is inserted
+        '''
+        if self.jobs <= 1 or not self.memimg:
+            return
+
+        self.__init_db()
+        pending = self.__pending_plugins()
+        if not pending:
+            return
+
+        # Workers are forked after the shared scan and replay its hits
+        self.__shared_scan()
+        memimg, dtb = self.get_vol_image()
+        plugin_pool.insert_plugins(pending, self.db, self.jobs, self.profile, self.kdbg, memimg, self.extra_dir, self.debug, self.db_ops, watch, dtb)
+
+
+    def __watch_warnings(self, plugins):
+        '''
+        Run the plugins not in the db yet, checking their memobjs for 
+        warnings as they are inserted. Plugins already in the db are checked
+        from it.
+
+        @plugins: list of plugin names
+
+        @return: generator of warnings results
+        '''
+        self.__init_db()
+        engine = warnings.WarningsEngine(self.db_ops.get_meta(self.db), self.get_warning_rules())
+        # Warnings found while running, by plugin name
+        found = {}
+        def watch(setobj, memobj):
+            found.setdefault(setobj.__module__, []).extend(engine.feed(setobj.__module__, memobj))
+
+        yield "\nWarnings: (Experimental)"
+
+        self.__run_parallel(watch)
+        for plug in plugins:
+            setobj = self.__load_plugin(plug, watch)
+            if setobj is None or not engine.watches(plug):
+                continue
+
+            yield "\nChecking: %s" % plug
+            if plug in found:
+                for elem in found.pop(plug, []):
+                    yield elem
+                for elem in engine.finish(plug):
+                    yield elem
+            else:
+                for elem in engine.check_table(self.db_ops, self.db, self.db_ops.get_table_name(setobj)):
+                    yield elem
+
+        yield "\nDone."
+
+
     def __vol_init(self):
         '''
         Initialize the underlying Volatility runtime.
         '''
-        return volsetup.VolSetup(self.profile, self.kdbg, self.memimg)
+        import volsetup
+        memimg, dtb = self.get_vol_image()
+        vol = volsetup.VolSetup(self.profile, self.kdbg, memimg, dtb)
+        # In case we're guessing a profile and need to get the result. Kind of a hack.
+        if self.profile == None:
+            try:
+                self.profile = vol.config.get_value('profile')
+            except:
+                pass
+        return vol
 
@@ -17,17 +17,128 @@
 # along with DAMM.  If not, see <http://www.gnu.org/licenses/>.
 #
 
+import os
 import sqlite3
+import hashlib
+import struct
 from utils import debug
 from utils import err
 import plugin
 import sys
 
 
+# Default number of rows inserted per executemany() batch
+CHUNK_SIZE = 5000
+
+# Columns after the memobj fields in each plugin table: digests of the 
+# unique id and of the diff fields, so diffs can match and compare rows 
+# without looking at their fields. Tables whose digests were taken of the 
+# field values rather than of their text in the db have differently named
+# columns, so they are treated as having none.
+DIGEST_COLUMNS = ('uid_text_digest', 'diff_text_digest')
+
+# Most parameters sqlite takes in one statement
+MAX_PARAMS = 999
+
+# In-memory db that converts floats to text, see db_text()
+float_conn = None
+
+
+def db_text(value):
+    '''
+    Plugin table columns are text, so sqlite stores each field value as
+    text, e.g., True as '1'. Digests are taken of this text, so digests
+    worked out from memobjs before they are inserted match those of the
+    memobjs read back from the db.
+
+    @value: a field value
+
+    @return: the value as text, exactly as sqlite stores it in a text
+        column, or None for NULL
+    '''
+    global float_conn
+    if value is None:
+        return None
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, float):
+        # Let sqlite format it, since its format differs from Python's
+        if float_conn is None:
+            float_conn = sqlite3.connect(':memory:')
+        return float_conn.execute('select cast(? as text)', (value,)).fetchone()[0].encode('utf-8')
+    return str(value)
+
+
 class DBOps:
 
-    def __init__(self):
-        pass
+    def __init__(self, chunk_size=CHUNK_SIZE):
+        '''
+        @chunk_size: number of rows to insert per batch
+        '''
+        self.chunk_size = chunk_size
+        # Open connections, by db file path
+        self.conns = {}
+        # Paths of the dbs to only ever read from
+        self.baselines = set()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    def add_baseline(self, db):
+        '''
+        Mark a db as a baseline, which is only read from. Its connection 
+        refuses to modify it.
+
+        @db: a DAMM db
+        '''
+        self.baselines.add(os.path.abspath(db))
+
+
+    def connect(self, db):
+        '''
+        Get the connection to a db, opening it on first use. The connection 
+        stays open, with its parsed schema, until close().
+
+        @db: a DAMM db
+
+        @return: a db connection object
+        '''
+        path = os.path.abspath(db)
+        if path not in self.conns:
+            debug("Opening %s" % path)
+            conn = sqlite3.connect(path)
+            if path in self.baselines:
+                # No URI filenames (mode=ro) in python 2's sqlite3
+                conn.execute("pragma query_only=ON")
+            self.conns[path] = conn
+
+        return self.conns[path]
+
+
+    def close(self, db=None):
+        '''
+        Close the connection to a db, or to all dbs. Uncommitted changes 
+        are lost.
+
+        @db: a DAMM db, or None for all dbs
+        '''
+        if db is None:
+            paths = self.conns.keys()
+        else:
+            paths = [os.path.abspath(db)]
+
+        for path in paths:
+            if path in self.conns:
+                debug("Closing %s" % path)
+                self.conns.pop(path).close()
 
 
     def get_tables(self, db):
@@ -38,29 +149,34 @@ class DBOps:
 
         @return: list of string names of db tables 
         '''
-        conn = sqlite3.connect(db)
+        conn = self.connect(db)
         curs = conn.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        res = [str(x[0]) for x in curs.fetchall()]
-        conn.close()
-
-        return res
+        return [str(x[0]) for x in curs.fetchall()]
 
 
-    def get_rows(self, db, table):
+    def get_rows(self, db, table, where=None, params=()):
         '''
-        Get rows from a db table
+        Get rows from a db table, fetched lazily in batches of chunk_size
+        rows so memory use doesn't grow with the size of the table
 
         @db: a DAMM db
         @table: string name of table to get rows from
+        @where: optional SQL condition the rows must meet
+        @params: values for the ? placeholders in where
 
-        @return: list of db rows
+        @return: generator of db rows
         '''
-        conn = sqlite3.connect(db)
-        curs = conn.execute('select * from %s' % table)
-        rows = curs.fetchall()
-        conn.close()
-
-        return rows
+        conn = self.connect(db)
+        cmd = 'select * from %s' % table
+        if where:
+            cmd += ' where %s' % where
+            debug("%s %s" % (cmd, params))
+        curs = conn.execute(cmd, params)
+        rows = curs.fetchmany(self.chunk_size)
+        while rows:
+            for row in rows:
+                yield row
+            rows = curs.fetchmany(self.chunk_size)
 
 
     def db_empty(self, db):
@@ -77,13 +193,7 @@ class DBOps:
 
         @return: True if the specified table in the specified db
         '''
-        conn = sqlite3.connect(db)
-        res = False
-        if table_name in self.get_tables(db):
-            res = True
-        conn.close()
-
-        return res
+        return table_name in self.get_tables(db)
 
 
     def init_db(self, db, memimg, profile, env):
@@ -97,7 +207,7 @@ class DBOps:
         @profile: the string profile name for the memory image
         @env: the list of environment data for the memory image
         '''
-        conn = sqlite3.connect(db)
+        conn = self.connect(db)
         cmd = "create table META (varname text, varval text)"
         debug(cmd)
         conn.execute(cmd)
@@ -110,7 +220,6 @@ class DBOps:
             fields = (var, val)
             conn.execute(cmd, fields)
         conn.commit()
-        conn.close()
 
 
     def get_meta(self, db):
@@ -119,7 +228,7 @@ class DBOps:
 
         @return: the filename, profile and set of tables stored in the db 
         '''
-        return self.get_rows(db,'META')
+        return list(self.get_rows(db,'META'))
 
 
     def get_table_name(self, setobj):
@@ -131,6 +240,19 @@ class DBOps:
         return "%s_%s" % (setobj.__module__, setobj.__class__.__name__)
 
 
+    def get_setobj(self, table):
+        '''
+        @table: a plugin's table name
+
+        @return: a setobj for the plugin's memobj type
+        '''
+        # Table name is of form modulename_setobjname
+        # module name == plugin name
+        mod_name, setobj_name = table.split("_")
+        mod = __import__(mod_name)
+        return getattr(mod, setobj_name)()
+
+
     def create_table(self, conn, setobj):
         '''
         Create a new db table for the specified memobj type.
@@ -141,41 +263,252 @@ class DBOps:
         command = "create table %s (" % (self.get_table_name(setobj))
         for elem in setobj.get_child().fields.keys():
             command += "%s text," % elem
+        for elem in DIGEST_COLUMNS:
+            command += "%s integer," % elem
         command = command.rstrip(",") + ")"
         debug(command)
         conn.execute(command)
 
 
-    def __insert_into_table(self, conn, memobj, setobj):
+    def drop_table(self, conn, setobj):
         '''
-        Insert a single memobj into a db.
+        Drop the db table for the specified memobj type.
 
         @conn: a db connection object
-        @memobj: a memobj to insert
         @setobj: a setobj for the memobj type
         '''
-        fields = tuple([memobj.fields[field] for field in memobj.fields.keys()])
-        qms = "?"
-        for x in xrange(len(fields) - 1):
-            qms += ",?"
-        cmd = 'insert into %s values(%s)' % (self.get_table_name(setobj), qms)
-        debug("cmd: %s\nfields: %s\ntypes: %s" % (cmd, fields, str([type(x) for x in fields])))
-        conn.execute(cmd, fields)
+        command = "drop table if exists %s" % (self.get_table_name(setobj))
+        debug(command)
+        conn.execute(command)
+
+
+    def get_digest(self, values):
+        '''
+        @values: a sequence of field values
+
+        @return: a stable 64 bit digest of the values, which only depends on
+            their text as stored in the db, see db_text()
+        '''
+        digest = hashlib.md5()
+        for value in values:
+            text = db_text(value)
+            digest.update('\x01' if text is None else text)
+            digest.update('\x00')
+
+        return struct.unpack('<q', digest.digest()[:8])[0]
+
+
+    def get_unique_id_digest(self, memobj, setobj, unique_id_fields=None):
+        '''
+        @memobj: a memobj
+        @setobj: a setobj for the memobj type
+        @unique_id_fields: list of fields making up the unique id, as with 
+            -u, or None for the setobj's get_unique_id()
+
+        @return: the digest of the memobj's unique id
+        '''
+        if unique_id_fields:
+            return self.get_digest([memobj.fields[x] for x in unique_id_fields])
+
+        unique_id = setobj.get_unique_id(memobj)
+        if not isinstance(unique_id, tuple):
+            unique_id = (unique_id,)
+        return self.get_digest(unique_id)
 
 
-    def insert_plugin(self, setobj, db, memimg):
+    def get_row(self, memobj, setobj):
+        '''
+        @memobj: a memobj
+        @setobj: a setobj for the memobj type
+
+        @return: the db row for the memobj, with the DIGEST_COLUMNS
+        '''
+        diff_values = [memobj.fields.get(field) for field in setobj.get_diff_fields()]
+
+        row = [memobj.fields[field] for field in memobj.fields.keys()]
+        row.append(self.get_unique_id_digest(memobj, setobj))
+        row.append(self.get_digest(diff_values))
+        return tuple(row)
+
+
+    def has_digests(self, db, table):
+        '''
+        Tables in dbs from before the digests were added don't have them.
+
+        @db: a DAMM db
+        @table: string name of a plugin's table
+
+        @return: True if the table has the DIGEST_COLUMNS
+        '''
+        conn = self.connect(db)
+        columns = [str(x[1]) for x in conn.execute('pragma table_info(%s)' % table)]
+        return set(DIGEST_COLUMNS).issubset(columns)
+
+
+    def get_digests(self, db, table):
+        '''
+        @db: a DAMM db
+        @table: string name of a plugin's table
+
+        @return: generator of (rowid, unique id digest, diff fields digest) 
+            for the rows of the table, in rowid order
+        '''
+        conn = self.connect(db)
+        curs = conn.execute('select rowid, %s from %s order by rowid' % (", ".join(DIGEST_COLUMNS), table))
+        rows = curs.fetchmany(self.chunk_size)
+        while rows:
+            for row in rows:
+                yield row
+            rows = curs.fetchmany(self.chunk_size)
+
+
+    def get_rows_by_id(self, db, table, rowids):
+        '''
+        @db: a DAMM db
+        @table: string name of table to get rows from
+        @rowids: list of the rowids of the rows to get
+
+        @return: dict of rowid : db row
+        '''
+        conn = self.connect(db)
+        res = {}
+        for i in xrange(0, len(rowids), MAX_PARAMS):
+            chunk = rowids[i:i + MAX_PARAMS]
+            cmd = 'select rowid, * from %s where rowid in (%s)' % (table, ",".join(["?" for x in chunk]))
+            for row in conn.execute(cmd, chunk):
+                res[row[0]] = row[1:]
+
+        return res
+
+
+    def get_insert_cmd(self, setobj):
+        '''
+        @setobj: a setobj for the memobj type
+
+        @return: the parameterized insert statement for the memobj type
+        '''
+        qms = ",".join(["?" for x in setobj.get_child().fields.keys() + list(DIGEST_COLUMNS)])
+        return 'insert into %s values(%s)' % (self.get_table_name(setobj), qms)
+
+
+    def insert_row(self, conn, fields, setobj):
+        '''
+        Insert a single db row into a db.
+
+        @conn: a db connection object
+        @fields: a db row, as from get_row()
+        @setobj: a setobj for the memobj type
+        '''
+        self.insert_rows(conn, [fields], setobj)
+
+
+    def insert_rows(self, conn, rows, setobj, cmd=None):
+        '''
+        Insert a batch of db rows into a db.
+
+        @conn: a db connection object
+        @rows: list of db rows, as from get_row()
+        @setobj: a setobj for the memobj type
+        @cmd: the insert statement, as from get_insert_cmd()
+        '''
+        if not rows:
+            return
+        if cmd is None:
+            cmd = self.get_insert_cmd(setobj)
+        conn.executemany(cmd, rows)
+        debug("Inserted %d rows into %s" % (len(rows), self.get_table_name(setobj)))
+
+
+    def create_indexes(self, conn, setobj):
+        '''
+        Index the columns of the memobj type's typedefs, which are the ones
+        filters are run against. Cheaper to do once a table is loaded than
+        to keep up to date while inserting.
+
+        @conn: a db connection object
+        @setobj: a setobj for the memobj type
+        '''
+        table = self.get_table_name(setobj)
+        columns = setobj.get_child().fields.keys()
+
+        # Diffs look rows up by their unique id
+        command = "create index if not exists %s_%s on %s (%s)" % (table, DIGEST_COLUMNS[0], table, DIGEST_COLUMNS[0])
+        debug(command)
+        conn.execute(command)
+
+        for fields in setobj.get_field_typedefs().values():
+            for field in fields:
+                if field not in columns:
+                    continue
+                command = "create index if not exists %s_%s on %s (%s collate nocase)" % (table, field, table, field)
+                debug(command)
+                conn.execute(command)
+
+
+    def begin_bulk_load(self, conn):
+        '''
+        Trade durability for speed while loading a db. A db that is being
+        loaded is no use anyway if we crash.
+
+        @conn: a db connection object
+
+        @return: the journal mode and synchronous settings to restore with 
+            end_bulk_load()
+        '''
+        journal_mode = conn.execute("pragma journal_mode").fetchone()[0]
+        synchronous = conn.execute("pragma synchronous").fetchone()[0]
+        conn.execute("pragma journal_mode=WAL")
+        conn.execute("pragma synchronous=OFF")
+        return journal_mode, synchronous
+
+
+    def end_bulk_load(self, conn, settings):
+        '''
+        Restore the settings changed by begin_bulk_load(), so the db is
+        again a single self contained file.
+
+        @conn: a db connection object
+        @settings: the settings returned by begin_bulk_load()
+        '''
+        journal_mode, synchronous = settings
+        conn.execute("pragma synchronous=%d" % synchronous)
+        conn.execute("pragma journal_mode=%s" % journal_mode)
+
+
+    def insert_plugin(self, setobj, db, memimg, watch=None):
         '''
         Run plugin against memimg and insert into db.
 
         @setobj: a setobj for the plugin type
         @conn: a db to insert into
+        @watch: optional function called with the setobj and each memobj as
+            it is inserted
         '''
-        conn = sqlite3.connect(db)
+        conn = self.connect(db)
         self.create_table(conn, setobj)
-
-        for elem in setobj.analyze_file():  # run plugin on file ##memimg
-            self.__insert_into_table(conn, elem, setobj)
-            debug("Inserted %s into %s" % (str(elem), str(conn)))
-
-        conn.commit()
-        conn.close()
+        settings = self.begin_bulk_load(conn)
+        committed = False
+
+        try:
+            cmd = self.get_insert_cmd(setobj)
+            rows = []
+            for elem in setobj.analyze_file():  # run plugin on file ##memimg
+                rows.append(self.get_row(elem, setobj))
+                if watch:
+                    watch(setobj, elem)
+                if len(rows) >= self.chunk_size:
+                    self.insert_rows(conn, rows, setobj, cmd)
+                    rows = []
+            self.insert_rows(conn, rows, setobj, cmd)
+
+            conn.commit()
+            committed = True
+            self.create_indexes(conn, setobj)
+        finally:
+            # Don't keep a partial load if the plugin failed, nor its table,
+            # which was committed as soon as it was created and would be
+            # taken for a finished plugin
+            conn.rollback()
+            if not committed:
+                self.drop_table(conn, setobj)
+            self.end_bulk_load(conn, settings)
@@ -0,0 +1,182 @@
+# DAMM
+# Copyright (c) 2013 504ENSICS Labs
+#
+# This file is part of DAMM.
+#
+# DAMM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# DAMM is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DAMM.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+#
+# A fleet baseline store merges many known good DAMM dbs, e.g., captures of
+# the same gold image, into one SQLite db. For each plugin table it keeps the
+# unique ids of the memobjs seen across the baselines, and how many baselines
+# each was seen in. A db can then be diffed against the whole fleet in one
+# pass, and baselines can be added to the store as they come in.
+#
+# Unique ids are kept as the digests DBOps stores with each row. Memobjs are
+# keyed by the -u fields in effect when a baseline is added, so stores built
+# with and without -u live side by side in the same db.
+#
+
+import os
+import hashlib
+import db_ops
+from utils import debug
+
+
+class FleetOps:
+
+    def __init__(self, store, ops, unique_id_fields=None):
+        '''
+        @store: the fleet baseline store db file
+        @ops: the DBOps to get db connections from
+        @unique_id_fields: list of fields making up the unique ids, as with
+            -u, or None for each setobj's get_unique_id()
+        '''
+        self.store = store
+        self.ops = ops
+        self.unique_id_fields = unique_id_fields
+        # Key of the unique ids in the store
+        self.unique_id = ",".join(unique_id_fields) if unique_id_fields else ''
+
+        conn = self.ops.connect(self.store)
+        conn.execute("create table if not exists FLEET_BASELINES (signature text, unique_id text, path text, memimg text, primary key (signature, unique_id))")
+        conn.execute("create table if not exists FLEET_TABLES (name text, unique_id text, baselines integer, primary key (name, unique_id))")
+        conn.commit()
+
+
+    def get_signature(self, db):
+        '''
+        @db: a DAMM db
+
+        @return: a digest of the contents of the db, so a baseline is only
+            counted once wherever it is copied to
+        '''
+        digest = hashlib.md5()
+        with open(db, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), ''):
+                digest.update(block)
+        return digest.hexdigest()
+
+
+    def get_unique_ids(self, db, table):
+        '''
+        @db: a DAMM db
+        @table: string name of a plugin's table
+
+        @return: generator of (unique id digest, db row) for the rows of
+            the table
+        '''
+        rows = self.ops.get_rows(db, table)
+        if not self.unique_id_fields and self.ops.has_digests(db, table):
+            # The digests come right after the fields
+            idx = -len(db_ops.DIGEST_COLUMNS)
+            for row in rows:
+                yield row[idx], row
+            return
+
+        # Older dbs and -u: work the digests out from the memobjs
+        setobj = self.ops.get_setobj(table)
+        for row in rows:
+            memobj = setobj.memobj_from_row(row)
+            yield self.ops.get_unique_id_digest(memobj, setobj, self.unique_id_fields), row
+
+
+    def get_tables(self):
+        '''
+        @return: dict of plugin table name : number of baselines with that
+            table, for the current unique ids
+        '''
+        conn = self.ops.connect(self.store)
+        return dict(conn.execute("select name, baselines from FLEET_TABLES where unique_id = ?", (self.unique_id,)))
+
+
+    def get_baselines(self):
+        '''
+        @return: list of (path, memimg) of the baselines in the store, for 
+            the current unique ids
+        '''
+        conn = self.ops.connect(self.store)
+        cmd = "select path, memimg from FLEET_BASELINES where unique_id = ?"
+        return [(str(x[0]), x[1]) for x in conn.execute(cmd, (self.unique_id,))]
+
+
+    def get_counts(self, table):
+        '''
+        @table: string name of a plugin's table
+
+        @return: dict of unique id digest : number of baselines it was seen in
+        '''
+        conn = self.ops.connect(self.store)
+        cmd = "select uid_digest, baselines from %s where unique_id = ?" % table
+        return dict(conn.execute(cmd, (self.unique_id,)))
+
+
+    def add_baseline(self, db):
+        '''
+        Merge a baseline db into the store. A db whose contents are already
+        in the store, for the current unique ids, is skipped.
+
+        @db: a DAMM db
+
+        @return: True if the db was added
+        '''
+        signature = self.get_signature(db)
+        conn = self.ops.connect(self.store)
+        if conn.execute("select 1 from FLEET_BASELINES where signature = ? and unique_id = ?", (signature, self.unique_id)).fetchone():
+            debug("%s is already in %s" % (db, self.store))
+            return False
+
+        tables = self.ops.get_tables(db)
+        memimg = dict(self.ops.get_meta(db)).get('memimg') if 'META' in tables else None
+        tables = [x for x in tables if x != 'META']
+
+        # Tables first; creating one would commit a half merged baseline
+        for table in tables:
+            conn.execute("create table if not exists %s (unique_id text, uid_digest integer, baselines integer, primary key (unique_id, uid_digest))" % table)
+
+        try:
+            for table in tables:
+                # Count each unique id once per baseline
+                uids = [(self.unique_id, x) for x in set(x[0] for x in self.get_unique_ids(db, table))]
+                conn.executemany("insert or ignore into %s values (?, ?, 0)" % table, uids)
+                conn.executemany("update %s set baselines = baselines + 1 where unique_id = ? and uid_digest = ?" % table, uids)
+                conn.execute("insert or ignore into FLEET_TABLES values (?, ?, 0)", (table, self.unique_id))
+                conn.execute("update FLEET_TABLES set baselines = baselines + 1 where name = ? and unique_id = ?", (table, self.unique_id))
+                debug("%s: %s: %d unique ids" % (db, table, len(uids)))
+
+            conn.execute("insert into FLEET_BASELINES values (?, ?, ?, ?)", (signature, self.unique_id, os.path.abspath(db), memimg))
+            conn.commit()
+        finally:
+            conn.rollback()
+
+        return True
+
+
+    def diff(self, db, table, rare=0):
+        '''
+        Find the memobjs in a db that are new relative to all of the
+        baselines, or rare across them.
+
+        @db: a DAMM db
+        @table: string name of a plugin's table, in both the db and the store
+        @rare: also find memobjs seen in at most this many baselines
+
+        @return: generator of (number of baselines seen in, db row)
+        '''
+        counts = self.get_counts(table)
+        for unique_id, row in self.get_unique_ids(db, table):
+            count = counts.get(unique_id, 0)
+            if count <= rare:
+                yield count, row
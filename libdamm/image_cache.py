@@ -0,0 +1,207 @@
+# DAMM
+# Copyright (c) 2013 504ENSICS Labs
+#
+# This file is part of DAMM.
+#
+# DAMM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# DAMM is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DAMM.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+#
+# An image cache holds flat raw copies of layered memory images, e.g., crash
+# dumps, hibernation files, VMware snapshots and LiME files. Each copy is
+# converted once, through the image's address spaces, into a sparse
+# <key>.raw file, with a small <key>.json index of its runs, keyed by the
+# digest of the source image. Later runs on the same image read the raw
+# copy directly, without translating each read through the layers.
+#
+# Digests are remembered by path, size and mtime, so the source image is
+# only hashed again when it changes, or when a new file is the same size
+# as a cached image.
+#
+
+import os
+import json
+import hashlib
+from utils import debug
+
+
+# Where images are cached unless another directory is given
+DEFAULT_DIR = os.path.join(os.path.expanduser('~'), '.damm', 'image_cache')
+
+# File of the remembered digests, in the cache directory
+KEYS_FILE = 'keys.json'
+
+
+def write_atomic(fname, data):
+    '''
+    Write a file under a temporary name first, so a cache file is never seen
+    half written.
+
+    @fname: file name
+    @data: string contents
+    '''
+    tmp = fname + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.rename(tmp, fname)
+
+
+class ImageCache:
+
+    def __init__(self, directory=DEFAULT_DIR):
+        '''
+        @directory: the image cache directory, created when an image is
+            first converted
+        '''
+        self.directory = os.path.expanduser(directory)
+
+
+    def get_paths(self, key):
+        '''
+        @key: a source image digest
+
+        @return: (raw file, index file) names for the key
+        '''
+        base = os.path.join(self.directory, key)
+        return (base + '.raw', base + '.json')
+
+
+    def get_indexes(self):
+        '''
+        @return: generator of the index dicts of the cached images
+        '''
+        if not os.path.isdir(self.directory):
+            return
+        for fname in sorted(os.listdir(self.directory)):
+            if fname == KEYS_FILE or not fname.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, fname)) as f:
+                    yield json.load(f)
+            except (IOError, ValueError):
+                debug("Skipping unreadable image index %s" % fname)
+
+
+    def get_keys(self):
+        '''
+        @return: dict of the remembered "path:size:mtime" : digest
+        '''
+        try:
+            with open(os.path.join(self.directory, KEYS_FILE)) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+
+    def get_key(self, memimg, remember=True):
+        '''
+        @memimg: a memory image file name
+        @remember: True to remember the digest if it had to be computed
+
+        @return: the digest the image is cached by
+        '''
+        st = os.stat(memimg)
+        stamp = "%s:%d:%d" % (os.path.abspath(memimg), st.st_size, st.st_mtime)
+        keys = self.get_keys()
+        if stamp in keys:
+            return keys[stamp]
+
+        digest = hashlib.md5()
+        with open(memimg, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), ''):
+                digest.update(block)
+        key = digest.hexdigest()
+
+        if remember and os.path.isdir(self.directory):
+            keys[stamp] = key
+            write_atomic(os.path.join(self.directory, KEYS_FILE), json.dumps(keys, indent=1))
+        return key
+
+
+    def find(self, memimg):
+        '''
+        @memimg: a memory image file name
+
+        @return: the index dict of the cached copy of the image, or None if
+            it has not been converted. The raw copy is index['raw'].
+        '''
+        size = os.path.getsize(memimg)
+        # Only hash images that could be in the cache at all
+        if not any(index.get('source_size') == size for index in self.get_indexes()):
+            return None
+
+        raw, fname = self.get_paths(self.get_key(memimg))
+        try:
+            with open(fname) as f:
+                index = json.load(f)
+        except (IOError, ValueError):
+            return None
+
+        # A raw copy ends with the last run of the source image
+        start, length = index['runs'][-1]
+        if not os.path.isfile(raw) or os.path.getsize(raw) != start + length:
+            debug("Cached copy %s of %s is incomplete" % (raw, memimg))
+            return None
+
+        index['raw'] = raw
+        return index
+
+
+    def convert(self, memimg, config):
+        '''
+        Copy a memory image out through its address spaces into the cache,
+        with imagecopy.
+
+        @memimg: a memory image file name
+        @config: the Volatility config set up for memimg
+
+        @return: the index dict of the cached copy, or None if the image is
+            already a raw image
+        '''
+        import volatility.utils as utils
+        import volatility.plugins.imagecopy as imagecopy
+
+        addr_space = utils.load_as(config, astype='physical')
+        if addr_space.base is None:
+            return None
+
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        key = self.get_key(memimg)
+        raw, fname = self.get_paths(key)
+
+        # Unavailable ranges are left as holes in the sparse copy
+        runs = sorted(addr_space.get_available_addresses())
+        tmp = raw + '.tmp'
+        with open(tmp, 'wb') as f:
+            for offset, block in imagecopy.ImageCopy(config).copy_blocks(addr_space, runs):
+                f.seek(offset)
+                f.write(block)
+            if runs:
+                f.truncate(runs[-1][0] + runs[-1][1])
+        os.rename(tmp, raw)
+
+        # The copy is read as a plain raw image, so keep what the layers
+        # knew that a raw image can't tell
+        index = {'key': key,
+            'source': os.path.abspath(memimg),
+            'source_size': os.path.getsize(memimg),
+            'address_space': addr_space.__class__.__name__,
+            'profile': config.PROFILE,
+            'dtb': getattr(addr_space, 'dtb', None),
+            'runs': [[start, length] for start, length in runs]}
+        write_atomic(fname, json.dumps(index, indent=1))
+
+        index['raw'] = raw
+        return index
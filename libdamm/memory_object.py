@@ -29,6 +29,9 @@ class MemObjectSet(object):
     '''
     The parent class for all sets of objects parsed from a memory dump.
     '''
+    # The FieldSchema of the memobjs read back from the db
+    schema = None
+
     @staticmethod
     def get_field_typedefs():
         '''
@@ -58,18 +61,18 @@ class MemObjectSet(object):
 
     def memobj_from_row(self, row):
         '''
-        Convert db row back to memobj
+        Convert db row back to memobj. The memobj is a compact MemObjectRow 
+        rather than an instance of the child class, since there can be 
+        millions of them.
 
         @row: a DAMM db row
 
         @return: a memobj created from the row
         '''
-        memobj = self.get_child()
-        fields = memobj.fields.keys()
-        for i, name in enumerate(row):
-            memobj.fields[fields[i]] = row[i]
+        if self.schema is None:
+            self.schema = FieldSchema(self.get_child())
 
-        return memobj
+        return MemObjectRow(RowFields(self.schema, row))
 
 
     def analyze_file(self):
@@ -140,6 +143,29 @@ class MemObjectSet(object):
         return []
 
 
+    def get_scanners(self, addr_space):
+        '''
+        @addr_space: the physical volatility address_space
+
+        @return: list of the Volatility pool scanner classes get_all() runs
+            over the physical image.
+        '''
+        return []
+
+
+    def get_needles(self, addr_space):
+        '''
+        Used to fold this plugin's scans into a single shared pass over the
+        memory image.
+
+        @addr_space: the physical volatility address_space
+
+        @return: list of needle strings (e.g., pool tags) get_all() scans
+            the physical image for.
+        '''
+        return [scanner(addr_space).pooltag for scanner in self.get_scanners(addr_space)]
+
+
     def get_diff_fields(self):
         '''
         @return: the default set of memobj fields to use in a diff operation.
@@ -152,7 +178,7 @@ class MemObjectSet(object):
         @return: the default set of memobj fields to use to determine the
         the object's uniqueness.        
         '''
-        return tuple(elem.fields[x] for x in elem.fields.keys())
+        return tuple(elem.fields.values())
 
 
     def sort_elems(self, elems):
@@ -169,6 +195,8 @@ class MemObject(object):
     '''
     The superclass for all objects parsed from memory captures.
     '''
+    __slots__ = ('fields',)
+
     def __init__(self, offset):
         '''
         All memobj attributes are stored in the fields dictionary
@@ -198,3 +226,112 @@ class MemObject(object):
         return "".join(["%s: %s\t" % (elem, self.fields[elem]) for elem in self.fields.keys()])
 
 
+class MemObjectRow(MemObject):
+    '''
+    A memobj read back from a db row. Has no attributes besides its fields.
+    '''
+    __slots__ = ()
+
+    def __init__(self, fields):
+        '''
+        @fields: the RowFields of the memobj
+        '''
+        self.fields = fields
+
+
+class FieldSchema(object):
+    '''
+    The ordered field names of a memobj type, shared by all the memobjs of 
+    that type read back from the db.
+    '''
+    __slots__ = ('names', 'index', 'defaults')
+
+    def __init__(self, memobj):
+        '''
+        @memobj: a memobj of the type, e.g., from setobj.get_child()
+        '''
+        self.names = tuple(memobj.fields.keys())
+        self.index = dict((name, i) for i, name in enumerate(self.names))
+        # Values for fields missing from short rows
+        self.defaults = tuple(memobj.fields.values())
+
+
+    def extend(self, name):
+        '''
+        @name: name of a new field
+
+        @return: a new schema with the field added at the end
+        '''
+        schema = FieldSchema.__new__(FieldSchema)
+        schema.names = self.names + (name,)
+        schema.index = dict(self.index)
+        schema.index[name] = len(self.names)
+        schema.defaults = self.defaults + (None,)
+        return schema
+
+
+class RowFields(object):
+    '''
+    A compact stand in for the fields OrderedDict of a memobj: the values 
+    of a db row, with the field names held by a shared FieldSchema. 
+    Supports the read/write dict interface memobj fields are used with.
+    '''
+    __slots__ = ('schema', 'row')
+
+    def __init__(self, schema, row):
+        '''
+        @schema: the FieldSchema for the memobj type
+        @row: tuple of field values, in schema order, e.g., a db row
+        '''
+        if len(row) < len(schema.names):
+            row = tuple(row) + schema.defaults[len(row):]
+        self.schema = schema
+        self.row = row
+
+
+    def __getitem__(self, name):
+        return self.row[self.schema.index[name]]
+
+
+    def __setitem__(self, name, value):
+        if name not in self.schema.index:
+            self.row = tuple(self.row[:len(self.schema.names)]) + (value,)
+            self.schema = self.schema.extend(name)
+        else:
+            row = list(self.row)
+            row[self.schema.index[name]] = value
+            self.row = tuple(row)
+
+
+    def __contains__(self, name):
+        return name in self.schema.index
+
+
+    def __iter__(self):
+        return iter(self.schema.names)
+
+
+    def __len__(self):
+        return len(self.schema.names)
+
+
+    def __repr__(self):
+        return "RowFields(%r)" % self.items()
+
+
+    def get(self, name, default=None):
+        if name in self.schema.index:
+            return self[name]
+        return default
+
+
+    def keys(self):
+        return list(self.schema.names)
+
+
+    def values(self):
+        return list(self.row[:len(self.schema.names)])
+
+
+    def items(self):
+        return zip(self.schema.names, self.row)
@@ -17,12 +17,33 @@
 # along with DAMM.  If not, see <http://www.gnu.org/licenses/>.
 #
 
+#
+# DAMM plugins are listed in a manifest, with the table and fields of each 
+# plugin, so they can be listed and their tables found in a db without 
+# importing them. A plugin module is only imported the first time its handle
+# is used. Entries are keyed by a digest of the plugin's source.
+#
+# DAMM's own plugin directory ships with a manifest. Plugin directories are
+# never written to: manifests for other directories (e.g., -d), and for 
+# plugins changed since the shipped manifest, are kept in the user's cache,
+# keyed by the directory's path.
+#
+
 import os
 import sys
 import glob
+import json
+import hashlib
 from utils import debug
 
 
+# Name of the manifest file shipped in a plugin directory
+MANIFEST = 'manifest.json'
+
+# Where the manifests of plugin directories are cached
+MANIFEST_CACHE_DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache', 'damm', 'manifests')
+
+
 def loaded_plugins_info(plugLibrary):
     '''
     Returns info on loaded plugins with field options
@@ -34,7 +55,7 @@ def loaded_plugins_info(plugLibrary):
     res += '\tall\n'
     for cur in plugList:
         res += '\t%s   %s\n' % (cur, '-' * 10)
-        for field in plugLibrary.getPlugin(cur).handle.getFields():
+        for field in plugLibrary.getPlugin(cur).fields:
             res += '\t\t%s\n' % field
 
     return res
@@ -44,11 +65,96 @@ def loaded_plugins(plugLibrary):
     return sorted(plugLibrary.getPluginList())
 
 
-class PluginInformation():
+def source_digest(path):
+    '''
+    @path: a plugin's source file
 
-    def __init__(self, name, handle):
+    @return: hex digest of the source
+    '''
+    with open(path, 'rb') as f:
+        return hashlib.md5(f.read()).hexdigest()
+
+
+def cached_manifest_path(path):
+    '''
+    @path: a plugin directory
+
+    @return: the file the directory's manifest is cached in
+    '''
+    key = hashlib.md5(os.path.abspath(path)).hexdigest()
+    return os.path.join(MANIFEST_CACHE_DIRECTORY, '%s.json' % key)
+
+
+def read_manifest(fname):
+    '''
+    @fname: a manifest file
+
+    @return: dict of plugin name : manifest entry, empty if there is no 
+        manifest or it can't be read
+    '''
+    try:
+        with open(fname) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {}
+
+
+def write_manifest(fname, manifest):
+    '''
+    Write a manifest. If it can't be written, the plugins it would list 
+    are just imported again next time.
+
+    @fname: a manifest file
+    @manifest: dict of plugin name : manifest entry
+    '''
+    try:
+        if not os.path.isdir(os.path.dirname(fname)):
+            os.makedirs(os.path.dirname(fname))
+        with open(fname + '.tmp', 'w') as f:
+            json.dump(manifest, f, indent=1, separators=(',', ': '), sort_keys=True)
+            f.write('\n')
+        os.rename(fname + '.tmp', fname)
+    except (IOError, OSError), e:
+        debug('Could not write %s: %s' % (fname, e))
+
+
+def manifest_entry(mod, digest):
+    '''
+    @mod: an imported plugin module
+    @digest: hex digest of the module's source
+
+    @return: the manifest entry for the plugin
+    '''
+    setobj = mod.getPluginObject(None)
+    return {'digest': digest,
+            'table': '%s_%s' % (setobj.__module__, setobj.__class__.__name__),
+            'fields': list(mod.getFields())}
+
+
+class PluginInformation(object):
+
+    def __init__(self, name, entry, handle=None):
+        '''
+        @name: the plugin's module name
+        @entry: the plugin's manifest entry
+        @handle: the plugin's module, or None to import it on first use
+        '''
         self.name = name
-        self.handle = handle
+        self.entry = entry
+        self.table = entry['table']
+        self.fields = entry['fields']
+        self._handle = handle
+
+
+    @property
+    def handle(self):
+        '''
+        @return: the plugin's module
+        '''
+        if self._handle is None:
+            debug('Importing plugin: %s' % self.name)
+            self._handle = __import__(self.name)
+        return self._handle
 
 
 class PluginLibrary():
@@ -70,8 +176,12 @@ class PluginLibrary():
         return self._library.items()
 
 
-    def addPlugin(self, path):
-
+    def addPlugin(self, path, manifest=None):
+        '''
+        @path: a plugin's source file
+        @manifest: the manifest of the plugin's directory, if any; the 
+            plugin is only imported if it's not in it or has changed
+        '''
         # debug('Adding plugin: %s' % path)
         if not os.path.exists(path):
             return (False, '%s doesn\'t exist' % (path))
@@ -82,8 +192,13 @@ class PluginLibrary():
         # TODO: either change to imp.import_source(...) for path based loading
         #    or change over just to name based loading
         modName = os.path.basename(path)[:-3]
-        mod = __import__(modName)
-        modInfo = PluginInformation(modName, mod)
+        digest = source_digest(path)
+        entry = (manifest or {}).get(modName)
+        if entry and entry.get('digest') == digest:
+            modInfo = PluginInformation(modName, entry)
+        else:
+            mod = __import__(modName)
+            modInfo = PluginInformation(modName, manifest_entry(mod, digest), mod)
         # self._library[modName] = mod
         self._library[modName] = modInfo
 
@@ -98,11 +213,24 @@ class PluginLibrary():
         added = 0
         # TODO check if dir already in path
         sys.path.append(path)
+        shipped = read_manifest(os.path.join(path, MANIFEST))
+        cached_path = cached_manifest_path(path)
+        cached = read_manifest(cached_path)
+        # Entries are only used if the plugin's digest still matches
+        manifest = dict(shipped)
+        manifest.update(cached)
+        entries = {}
         for pyFile in glob.iglob(os.path.join(path, '*.py')):
             seen += 1
-            status, msg = self.addPlugin(pyFile)
+            status, msg = self.addPlugin(pyFile, manifest)
             # debug(msg)
             if status:
                 added += 1
+                modName = os.path.basename(pyFile)[:-3]
+                entries[modName] = self._library[modName].entry
+        # Plugins were added, changed or removed since the shipped manifest
+        # was written, and since it was last cached
+        if entries != shipped and entries != cached:
+            write_manifest(cached_path, entries)
         return (True, '%s : %i of %i plugins successfully loaded' % (path, added, seen))
 
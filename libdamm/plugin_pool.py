@@ -0,0 +1,175 @@
+# DAMM
+# Copyright (c) 2013 504ENSICS Labs
+#
+# This file is part of DAMM.
+#
+# DAMM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# DAMM is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DAMM.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+#
+# Run DAMM plugins against a memory image in a pool of worker processes. Each
+# worker has its own Volatility runtime and streams db rows back to the
+# parent, which is the only process writing to the DAMM db.
+#
+
+import os
+import traceback
+import multiprocessing
+import Queue
+import volsetup
+import plugin
+import db_ops
+from utils import debug
+from utils import err
+from utils import set_debug
+
+
+# Number of rows a worker sends back per message
+CHUNK_SIZE = 1000
+
+
+def plugin_worker(tasks, results, profile, kdbg, memimg, extra_dir, debug_on, dtb=None):
+    '''
+    Worker process main loop: run each plugin named on the tasks queue and
+    send its rows back on the results queue.
+
+    Messages are (plugin name, list of rows) for results, (plugin name, None)
+    once a plugin is done and (plugin name, string traceback) on failure.
+
+    @tasks: queue of plugin names, None to stop
+    @results: queue of messages to the parent
+    @profile: a Volatality profile string
+    @kdbg: a kdbg address string
+    @memimg: a memory image file name
+    @extra_dir: user specified directory of plugins, or None
+    @debug_on: True for debug on
+    @dtb: the DTB address of the image, or None to find it
+    '''
+    set_debug(debug_on)
+
+    vol = volsetup.VolSetup(profile, kdbg, memimg, dtb)
+    pluglib = plugin.PluginLibrary()
+    pluglib.addPluginDir(os.path.join(os.path.dirname(__file__), 'plugins'))
+    if extra_dir:
+        pluglib.addPluginDir(extra_dir)
+    ops = db_ops.DBOps()
+
+    for plug in iter(tasks.get, None):
+        debug("worker %d running %s" % (os.getpid(), plug))
+        try:
+            setobj = pluglib.getPlugin(plug).handle.getPluginObject(vol)
+            rows = []
+            for elem in setobj.analyze_file():
+                rows.append(ops.get_row(elem, setobj))
+                if len(rows) >= CHUNK_SIZE:
+                    results.put((plug, rows))
+                    rows = []
+            results.put((plug, rows))
+            results.put((plug, None))
+        except Exception:
+            results.put((plug, traceback.format_exc()))
+
+
+def insert_plugins(setobjs, db, jobs, profile, kdbg, memimg, extra_dir=None, debug_on=False, ops=None, watch=None, dtb=None):
+    '''
+    Run plugins against memimg in a pool of worker processes and insert their
+    results into db. A plugin that fails is left out of the db, and if the
+    load itself fails (e.g., on Ctrl-C) they all are.
+
+    @setobjs: dict of plugin name : setobj for the plugins to run
+    @db: a DAMM db
+    @jobs: number of worker processes
+    @profile: a Volatality profile string
+    @kdbg: a kdbg address string
+    @memimg: a memory image file name
+    @extra_dir: user specified directory of plugins, or None
+    @debug_on: True for debug on
+    @ops: the DBOps to get the db connection from, or None for a new one
+    @watch: optional function called with the setobj and each memobj as
+        it is inserted
+    @dtb: the DTB address of the image, or None to find it
+    '''
+    own_ops = ops is None
+    if own_ops:
+        ops = db_ops.DBOps()
+    pending = dict(setobjs)
+
+    tasks = multiprocessing.Queue()
+    results = multiprocessing.Queue()
+    workers = []
+    for x in xrange(min(jobs, len(pending))):
+        worker = multiprocessing.Process(target=plugin_worker, args=(tasks, results, profile, kdbg, memimg, extra_dir, debug_on, dtb))
+        worker.daemon = True
+        worker.start()
+        workers.append(worker)
+
+    for plug in pending.keys():
+        tasks.put(plug)
+    for worker in workers:
+        tasks.put(None)
+
+    conn = ops.connect(db)
+    for setobj in pending.values():
+        ops.create_table(conn, setobj)
+    settings = ops.begin_bulk_load(conn)
+    cmds = dict((plug, ops.get_insert_cmd(setobj)) for plug, setobj in pending.items())
+    done = []
+    committed = False
+
+    try:
+        while pending:
+            try:
+                plug, msg = results.get(timeout=1)
+            except Queue.Empty:
+                if not [x for x in workers if x.is_alive()]:
+                    for plug in pending.keys():
+                        err("%s: worker exited before finishing" % plug)
+                    break
+                continue
+
+            setobj = pending[plug]
+            if msg is None:
+                debug("Inserted %s" % plug)
+                done.append(setobj)
+                del pending[plug]
+            elif isinstance(msg, list):
+                ops.insert_rows(conn, msg, setobj, cmds[plug])
+                if watch:
+                    for row in msg:
+                        watch(setobj, setobj.memobj_from_row(row))
+            else:
+                err("%s failed:\n%s" % (plug, msg))
+                del pending[plug]
+
+        conn.commit()
+        committed = True
+        for setobj in done:
+            ops.create_indexes(conn, setobj)
+    finally:
+        conn.rollback()
+        # Tables are created up front, and DDL is committed right away, so
+        # drop those of the plugins that failed, and of every plugin if the
+        # rows were rolled back, or they'd be taken for finished plugins.
+        # Not until now, since dropping a table commits any pending rows.
+        for setobj in setobjs.values():
+            if not committed or setobj not in done:
+                ops.drop_table(conn, setobj)
+        ops.end_bulk_load(conn, settings)
+        if own_ops:
+            ops.close()
+        for worker in workers:
+            # Workers left running only if we're bailing out on an error
+            if pending:
+                worker.terminate()
+            worker.join()
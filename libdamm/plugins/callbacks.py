@@ -61,6 +61,16 @@ class CallbackSet(memobj.MemObjectSet):
             yield Callback(module, sym, cb, detail, 0)
 
 
+    def get_scanners(self, addr_space):
+        import volatility.plugins.malware.callbacks as callbacks
+
+        scanners = [callbacks.PoolScanFSCallback, callbacks.PoolScanShutdownCallback, callbacks.PoolScanGenericCallback]
+        # Valid for Vista and later
+        if addr_space.profile.metadata.get('major', 0) >= 6:
+            scanners += [callbacks.PoolScanDbgPrintCallback, callbacks.PoolScanRegistryCallback, callbacks.PoolScanPnp9, callbacks.PoolScanPnpD, callbacks.PoolScanPnpC]
+        return scanners
+
+
     def get_child(self):
         return Callback()
 
@@ -138,6 +138,22 @@ class ConnectionSet(memobj.MemObjectSet):
                 yield Connection(offset=self.get_offset(sock), pid=str(sock.Pid), local_ip=str(sock.LocalIpAddress), local_port=str(sock.LocalPort), proto=str(protos.protos.get(sock.Protocol.v(), "-")), protocol=str(sock.Protocol), created=str(sock.CreateTime), allocated='False')
 
 
+    def get_scanners(self, addr_space):
+        '''
+        netscan on Vista and later, connscan and sockscan on XP
+        '''
+        if self.is_post_XP_profile(addr_space.profile):
+            import volatility.plugins.netscan as netscan
+            return [netscan.PoolScanUdpEndpoint, netscan.PoolScanTcpListener, netscan.PoolScanTcpEndpoint]
+
+        elif self.is_XP_profile(addr_space.profile):
+            import volatility.plugins.connscan as connscan
+            import volatility.plugins.sockscan as sockscan
+            return [connscan.PoolScanConn, sockscan.PoolScanSocket]
+
+        return []
+
+
     def get_child(self):
         return Connection()
 
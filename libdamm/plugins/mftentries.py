@@ -116,6 +116,14 @@ class MFTSet(memobj.MemObjectSet):
                     yield MFTEntry(body)
 
             
+
+
+    def get_needles(self, addr_space):
+        '''
+        mftparser scans for the MFT entry signatures rather than pool tags
+        '''
+        return ['FILE', 'BAAD']
+
                   
     def get_child(self):
         return MFTEntry()        
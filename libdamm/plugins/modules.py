@@ -64,6 +64,11 @@ class ModuleSet(memobj.MemObjectSet):
         for mod in modscan.ModScan(self.vol.config).calculate():
             yield Module(mod, False, self.get_offset(mod))
 
+
+
+    def get_scanners(self, addr_space):
+        return [modscan.PoolScanModule]
+
                           
     def get_child(self):
         return Module()
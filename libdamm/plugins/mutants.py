@@ -59,6 +59,12 @@ class MutantSet(memobj.MemObjectSet):
             yield Mutant(mutant, str(hex(mutant.obj_offset)).rstrip('L'))
 
 
+    def get_scanners(self, addr_space):
+        from volatility.plugins.filescan import PoolScanMutant as PoolScanMutant
+
+        return [PoolScanMutant]
+
+
     def get_child(self):
         return Mutant()
 
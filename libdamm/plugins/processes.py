@@ -74,6 +74,17 @@ class ProcessSet(memobj.MemObjectSet):
             yield Process(process, ps_sources, offset)
 
 
+    def get_scanners(self, addr_space):
+        '''
+        psxview's psscan, thrdproc and deskthrd sources are pool scans
+        '''
+        import volatility.plugins.filescan as filescan
+        import volatility.plugins.modscan as modscan
+        import volatility.plugins.gui.windowstations as windowstations
+
+        return [filescan.PoolScanProcess, modscan.PoolScanThread, windowstations.PoolScanWind]
+
+
     def get_child(self):
         return Process()
 
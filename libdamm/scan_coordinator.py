@@ -0,0 +1,138 @@
+# DAMM
+# Copyright (c) 2013 504ENSICS Labs
+#
+# This file is part of DAMM.
+#
+# DAMM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# DAMM is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DAMM.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+#
+# Many DAMM plugins carve objects out of the physical image with Volatility's
+# pool scanners, and each of those scanners reads the whole image. The
+# ScanCoordinator collects the needles (pool tags, MFT signatures) of every
+# plugin to be run, reads the image once, and then answers each plugin's
+# scans from the recorded hits.
+#
+
+import heapq
+import volatility.poolscan as poolscan
+import volatility.utils
+from utils import debug
+
+
+class ScanCoordinator:
+
+    def __init__(self):
+        self.space = None
+        self.needles = []
+        self.hits = {}
+
+
+    def add_needles(self, needles):
+        '''
+        Add needles to look for in the shared scan
+
+        @needles: list of needle strings, e.g., pool tags
+        '''
+        for needle in needles:
+            if needle not in self.needles:
+                self.needles.append(needle)
+
+
+    def scan(self, space):
+        '''
+        Read the address space once, recording the hits for every needle. The
+        windows are the same as those of a MultiPoolScanner so replayed scans
+        are identical to a fresh scan, duplicates in the overlaps included.
+
+        @space: a physical Volatility address space
+        '''
+        self.space = space
+        self.hits = dict((needle, []) for needle in self.needles)
+
+        scanner = poolscan.MultiPoolScanner(needles = self.needles)
+        for block, hits in scanner.scan_windows(space):
+            for needle, offset in hits:
+                self.hits[needle].append((block, offset))
+
+        debug("shared scan: %s" % ", ".join(["%r: %d" % (x, len(self.hits[x])) for x in self.needles]))
+
+
+    def replay(self, space, needles):
+        '''
+        Replay the hits of a full scan of space for the given needles, in the
+        order a MultiPoolScanner would have found them.
+
+        @space: the address space being scanned
+        @needles: list of needle strings being scanned for
+
+        @return: generator of (needle, offset) or None if the shared scan
+            did not cover this scan
+        '''
+        if self.space is None or space != self.space:
+            return None
+        for needle in needles:
+            if needle not in self.hits:
+                return None
+
+        # Within a window, hits come in offset order, ties in needle order
+        streams = [self.__stream(i, needle) for i, needle in enumerate(needles)]
+        return ((needle, offset) for _, offset, _, needle in heapq.merge(*streams))
+
+
+    def install(self):
+        '''
+        Route the full pool scans of the scanned address space through this
+        coordinator, until close()
+        '''
+        poolscan.MultiPoolScanner.prescan = self
+
+
+    def close(self):
+        '''
+        Stop routing pool scans through this coordinator and drop its hits
+        '''
+        if poolscan.MultiPoolScanner.prescan is self:
+            poolscan.MultiPoolScanner.prescan = None
+        self.space = None
+        self.hits = {}
+
+
+    def __stream(self, i, needle):
+        for block, offset in self.hits[needle]:
+            yield block, offset, i, needle
+
+
+def shared_scan(vol, setobjs):
+    '''
+    Run a single shared scan for all of the given plugins and route later
+    pool scans of the image through it, until it is closed.
+
+    @vol: a Volsetup object
+    @setobjs: list of setobjs for the plugins about to be run
+
+    @return: the ScanCoordinator
+    '''
+    space = volatility.utils.load_as(vol.config).physical_space()
+
+    coordinator = ScanCoordinator()
+    for setobj in setobjs:
+        coordinator.add_needles(setobj.get_needles(space))
+
+    if not coordinator.needles:
+        return coordinator
+
+    coordinator.scan(space)
+    coordinator.install()
+    return coordinator
@@ -28,18 +28,97 @@ from utils import debug
 import sys
 
 
+# Volatility's Linux and Mac plugin trees. Their profile modifications only
+# apply to Linux and Mac profiles, so Windows profiles never need them.
+OTHER_OS_PLUGINS = ['linux', 'mac']
+
+# Suffixes of the modules that may hold nothing but a profile's vtypes or
+# syscalls. These are several MB of dictionaries per profile.
+DATA_MODULE_SUFFIXES = ('_vtypes', '_syscalls')
+
+
+def is_windows_profile(profile):
+    '''
+    @profile: a Volatality profile string, or None
+
+    @return: True if the profile is a Windows profile
+    '''
+    return bool(profile) and profile.startswith(('Win', 'Vista'))
+
+
+def get_subclasses(cls):
+    '''
+    @cls: a class
+
+    @return: generator of the subclasses of cls, at any depth
+    '''
+    for sub in cls.__subclasses__():
+        yield sub
+        for elem in get_subclasses(sub):
+            yield elem
+
+
+def profile_data_modules():
+    '''
+    @return: set of the names of the modules the imported profiles get their
+        vtypes and syscalls from
+    '''
+    res = set()
+    for cls in get_subclasses(obj.Profile):
+        res.add(getattr(cls, '_md_vtype_module', None))
+    for cls in get_subclasses(obj.ProfileModification):
+        res.add(getattr(cls, 'syscall_module', None))
+    res.discard(None)
+    return res
+
+
+class LazyPluginImporter(registry.PluginImporter):
+    '''
+    Import Volatility's plugins, except for the modules holding the vtypes 
+    and syscalls of each profile. Volatility loads those, through its vtype
+    cache, for the one profile that is used. With windows_only, Volatility's
+    Linux and Mac plugins are left out too.
+    '''
+    def __init__(self, windows_only=False):
+        '''
+        @windows_only: True to leave out the Linux and Mac plugins
+        '''
+        self.windows_only = windows_only
+        registry.PluginImporter.__init__(self)
+
+
+    def run_imports(self):
+        deferred = {}
+        for name in self.modnames.keys():
+            # e.g., volatility.plugins.linux.pslist, but not the ELF overlays
+            # in volatility.plugins.overlays.linux used by VirtualBox cores
+            parts = name.split('.')
+            if self.windows_only and len(parts) > 2 and parts[2] in OTHER_OS_PLUGINS:
+                self.modnames[name] = None
+            elif parts[-1].endswith(DATA_MODULE_SUFFIXES):
+                deferred[name] = self.modnames.pop(name)
+        registry.PluginImporter.run_imports(self)
+
+        # Some of these hold profile modifications or are otherwise used
+        # directly; only the profiles' own data is left to be loaded lazily
+        data_modules = profile_data_modules()
+        self.modnames = dict((k, v) for k, v in deferred.items() if k not in data_modules)
+        registry.PluginImporter.run_imports(self)
+
+
 class VolSetup:
     '''
     This class manages data that the underlying Volatility system requires.
     '''
-    def __init__(self, profile, kdbg, memimg):
+    def __init__(self, profile, kdbg, memimg, dtb=None):
         '''
         @profile: a Volatality profile string
         @kdbg: a kdbg address string
         @memimg: a memory image file name
+        @dtb: the DTB address of the image, or None to find it
         '''
         # volatility black magic
-        registry.PluginImporter()
+        LazyPluginImporter(is_windows_profile(profile))
         self.config = conf.ConfObject()
         self.config.optparser.set_conflict_handler(handler="resolve")
         registry.register_global_options(self.config, commands.Command)
@@ -56,7 +135,7 @@ class VolSetup:
                 'output_file': None,
                 'physical_offset': None,
                 'conf_file': None,
-                'dtb': None,
+                'dtb': dtb,
                 'output': None,
                 'info': None,
                 'location': "file://" + memimg,
@@ -113,7 +192,7 @@ class VolSetup:
         @return: the list of loaded Volatility profiles
         '''
         prof = obj.Profile
-        registry.PluginImporter()
+        LazyPluginImporter()
         profList = sorted([i.__name__.split('.')[-1] for i in prof.__subclasses__()])
         return profList
 
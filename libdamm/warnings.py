@@ -35,6 +35,9 @@
 
 
 import sqlite3
+import re
+import os
+import json
 from utils import debug
 import plugin
 import time   
@@ -96,18 +99,63 @@ def transpositions(s):
 
         yield trans
 
- 
-suspicious_processes = ['rar.exe', 'reg.exe', 'sc.exe', 'psexec.exe', 'procdump.exe', 'net.exe', 'at.exe',\
-                        'schtask.exe', 'cmd.exe', 'net1.exe', 'netstat.exe', 'systeminfo.exe', 'taskkill.exe',\
-                        'tasklist.exe', 'powershell.exe', 'nbtstat.exe', 'xcopy.exe', 'nslookup.exe', 'quser.exe',\
-                        'ping.exe', 'ftp.exe', 'bitsadmin.exe', 'route.exe', 'regsvr32.exe', 'makecab.exe']
 
+class NameMatcher:
+
+    # All of the name mangling detectors above, precompiled for a set of known
+    # process names so each process name is checked in one pass per known
+    # name rather than with an LCS matrix per pair. Finds exactly what 
+    # matching_lcs(), the number -> letter swaps and transpositions() do.
+
+    def __init__(self, names):
+
+        self.names = list(names)
+
+        # The known name is a subsequence of the process name, the same as
+        # matching_lcs(). Each [^c]*c step can only go one way, so the 
+        # regex never backtracks.
+        self.subsequences = []
+        for name in self.names:
+            pattern = "".join(["[^%s]*%s" % (re.escape(c), re.escape(c)) for c in name.split('.')[0]])
+            self.subsequences.append((name, re.compile(pattern)))
+
+        # There are only a few known processes so in order to detect letter 
+        # swapping name mangling we'll just build a dict of all possibilities
+        self.transpositions = {}
+        for elem in self.names:
+            for t in transpositions(elem.split('.')[0]):
+                self.transpositions[t] = elem
+
+
+    # Known names the process name is suspiciously similar to, by adding 
+    # letters or number -> letter swaps, in the order of the known names
+    def similar(self, proc_name):
+
+        lower = proc_name.lower()
+        base = proc_name.split('.')[0]
+        swapped = proc_name.replace('1', 'l').replace('3', 'e').replace('0', 'o').replace('5', 's').lower()
+        return [name for name, pattern in self.subsequences if lower != name and (swapped == name or pattern.match(base))]
+
+
+    # Known name the process name is a transposition of, or None
+    def transposed(self, proc_name):
+
+        return self.transpositions.get(proc_name.split('.')[0])
+
+
+# NameMatchers by known process names, so each profile family builds one
+name_matchers = {}
 
-def process_warnings(procs, envars):
+def get_name_matcher(names):
 
-    # Get the actual system root from the system environment variables and the profile for this sample
-    profile = [x[1] for x in envars if x[0].lower() == 'profile'][0]
-    sysroot = [x[1] for x in envars if x[0].lower() == 'systemroot'][0]
+    key = tuple(names)
+    if key not in name_matchers:
+        name_matchers[key] = NameMatcher(key)
+    return name_matchers[key]
+
+ 
+# The known processes for a profile, and the constraints on them
+def get_known_processes(profile, sysroot):
 
     # A set of known details about processes.
 
@@ -156,47 +204,110 @@ def process_warnings(procs, envars):
     else:
         known_processes = { }
 
-    # Wrangle some useful data
-    procs_by_name = {}
-    procs_by_pid = {}
-    num_children = {}
-    system_start = None
-    for elem in procs:
-        procs_by_name[elem.fields['name']] = elem
-        procs_by_pid[elem.fields['pid']] = elem
-        num_children['ppid'] = 1 if not num_children.get('ppid') else num_children['ppid'] + 1
+    return known_processes
+
+
+# Parse a create_time, e.g., 2010-08-11 06:06:39 UTC+0000
+def create_time(s):
+    return time.strptime(s.split('UTC')[0].strip(), '%Y-%m-%d %H:%M:%S')
+
+
+# For allocated, running processes only
+def running(proc):
+    return proc.fields['pslist'] == 'True' and proc.fields['exit_time'] == ''
+
+
+class ProcessWarnings:
+
+    # Checks processes one at a time, as they come out of the processes 
+    # plugin or the db. Checks against other processes keep indexes of the
+    # processes seen so far, and report once every process has been seen:
+    # parent (which goes by the last process with the parent's pid, since
+    # pids are reused), singleton, childless and starts_at_boot (which goes
+    # by the last smss.exe).
+
+    def __init__(self, envars):
+
+        # Get the actual system root from the system environment variables and the profile for this sample
+        profile = [x[1] for x in envars if x[0].lower() == 'profile'][0]
+        self.sysroot = [x[1] for x in envars if x[0].lower() == 'systemroot'][0]
+        self.known_processes = get_known_processes(profile, self.sysroot)
+        self.name_matcher = get_name_matcher(self.known_processes.keys())
+
+        # Indexes of the processes seen so far
+        self.procs_by_pid = {}
+        self.num_children = {}
+        self.instances = {}
+        self.system_start = None
+
+        # Known processes to check once all processes have been seen
+        self.deferred = []
+
+
+    def feed(self, elem):
+
+        for warning in self.check_process(elem):
+            yield warning
+
+        # Keep the indexes up to date
+        self.procs_by_pid[elem.fields['pid']] = elem
+        self.num_children[elem.fields['ppid']] = self.num_children.get(elem.fields['ppid'], 0) + 1
+        if running(elem):
+            self.instances[elem.fields['name']] = self.instances.get(elem.fields['name'], 0) + 1
+
         # We want below to be System, but there is no create_time for System
         if elem.fields['name'].lower() == 'smss.exe':
-            system_start = elem.fields['create_time']
+            self.system_start = elem.fields['create_time']
 
-    # There are only a few known processes so in order to detect letter 
-    # swapping name mangling we'll just build a dict of all possibilities
-    known_proc_transpostitons = {}
-    for elem in known_processes.keys():
-        for t in transpositions(elem.split('.')[0]):
-            known_proc_transpostitons[t] = elem
+        if elem.fields['name'].lower() in self.known_processes and running(elem):
+            for warning in self.check_known_process(elem):
+                yield warning
 
 
-    # 2010-08-11 06:06:39 UTC+0000     
-    system_start = time.strptime(system_start.split('UTC')[0].strip(), '%Y-%m-%d %H:%M:%S')
+    def finish(self):
 
-    # Checks for all processes; if the fields are populated, why not?                    
-    for elem in procs:
+        system_start = None
+
+        for elem in self.deferred:
+
+            constraints = self.known_processes[elem.fields['name'].lower()]
+
+            if constraints.get('parent') and elem.fields['ppid'] != '0':
+                parent = self.procs_by_pid.get(elem.fields['ppid'])
+                if parent:
+                    for warning in self.check_parent(elem, parent):
+                        yield warning
+
+            if constraints.get('singleton'):
+                instances = self.instances.get(elem.fields['name'], 0)
+                if instances != 1:
+                    yield "%s (pid: %s) has %s instances. Only one instance should exist." % (elem.fields['name'], elem.fields['pid'], instances)
+
+            # Thanks to Barry McIntosh for the idea for this check
+            if constraints.get('childless'):
+                if self.num_children.get(elem.fields['pid']):
+                    yield "%s (pid: %s) has %s children where none were expected." % (elem.fields['name'], elem.fields['pid'], self.num_children.get(elem.fields['pid']))
+
+            # Thanks to Barry McIntosh for the idea for this check        
+            if constraints.get('starts_at_boot'):
+                # 2010-08-11 06:06:39 UTC+0000     
+                if system_start is None:
+                    system_start = create_time(self.system_start)
+                start_time = create_time(elem.fields['create_time'])
+                delta = time.mktime(start_time) - time.mktime(system_start)
+                # Is this a reasonable heauristic?
+                if delta > 60:
+                    #yield "%s (pid: %s) started %s, long after the machine booted at %s." % (elem.fields['name'], elem.fields['pid'], elem.fields['create_time'], str(system_start))
+                    yield "%s (pid: %s, %s) started %s seconds after boot time which may be suspicious." % (elem.fields['name'], elem.fields['pid'], elem.fields['command_line'], delta)
 
-        # Thanks to Barry McIntosh for the idea for this check, and to the 
-        # sysforensics blog post "Do not fumble the lateral movement"
-        if elem.fields['name'].lower() in suspicious_processes:
-            yield "%s (pid: %s) is suspicious (possible info gathering/persistence/lateral movement)." % (elem.fields['name'], elem.fields['pid'])
+        self.deferred = []
 
-        # Look for 'temp' or 'tmp' file or directory names
-        if temp(elem.fields['image_path_name']):
-            yield "%s (pid: %s) image path in temp: %s." % (elem.fields['name'], elem.fields['pid'], elem.fields['image_path_name'])            
-        if temp(elem.fields['command_line']):
-            yield "%s (pid: %s) command line contains temp: %s." % (elem.fields['name'], elem.fields['pid'], elem.fields['command_line'])
 
-        # Fake exit time, still has threads running, from AOMF    
-        if (elem.fields['exit_time'] != '') and (elem.fields['threads'] != '0'):
-            yield "%s (pid: %s) has an exit time of %s and but also has %s running threads." % (elem.fields['name'], elem.fields['pid'], elem.fields['exit_time'], elem.fields['threads'])
+    # Checks for all processes; if the fields are populated, why not?                    
+    def check_process(self, elem):
+
+        # Suspicious names, temp paths and fake exit times are rules in
+        # warning_rules.json
 
         # Process unlinked from list    
         # So not in pslist        
@@ -211,245 +322,344 @@ def process_warnings(procs, envars):
                 yield "%s (pid: %s) may be a hidden process." % (elem.fields['name'], elem.fields['pid'])
 
         # Is process disguised to look like a known_process by adding letters or number -> letter swaps?
-        for proc_name in known_processes.keys():
-            if (elem.fields['name'].lower() != proc_name) and (matching_lcs(proc_name, elem.fields['name'])):
-                yield "%s (pid: %s) is named suspiciously similarly to a Windows process: %s." % (elem.fields['name'], elem.fields['pid'], proc_name)
-            elif (elem.fields['name'].lower() != proc_name) and (elem.fields['name'].replace('1', 'l').replace('3', 'e').replace('0', 'o').replace('5', 's').lower() == proc_name):
-                yield "%s (pid: %s) is named suspiciously similarly to a Windows process: %s." % (elem.fields['name'], elem.fields['pid'], proc_name)
+        for proc_name in self.name_matcher.similar(elem.fields['name']):
+            yield "%s (pid: %s) is named suspiciously similarly to a Windows process: %s." % (elem.fields['name'], elem.fields['pid'], proc_name)
 
         # Did we just transpose some pair of letters, e.g., csrss.exe -> crsss.exe
         # Must also account for junk appended to end of process name
-        if known_proc_transpostitons.get(elem.fields['name'].split('.')[0]):
-            yield "%s (pid: %s) is named suspiciously similarly to a Windows process: %s." % (elem.fields['name'], elem.fields['pid'], known_proc_transpostitons.get(elem.fields['name'].split('.')[0]))
-
-
-    # Checks all for known processes, using constraints dict above        
-    for elem in [x for x in procs if x.fields['name'].lower() in known_processes.keys()]:
-
-        # For allocated, running processes only.       
-        if elem.fields['pslist'] == 'True' and elem.fields['exit_time'] == '':
-
-            # Get the set of constraints for this known process
-            constraints = known_processes[elem.fields['name'].lower()]
-
-            if constraints.get('pid'):
-                expected = int(constraints['pid'])
-                actual = int(elem.fields['pid'])
-                if actual != expected:
-                    yield "%s pid expected: %s, actual: %s." % (elem.fields['name'], expected, actual)
-
-            if constraints.get('parent'):
-                expected = constraints['parent']
-                actual = None
-                ppid = elem.fields['ppid']
-                #if ppid != '0':
-                #    parent = procs_by_pid.get(elem.fields['ppid'])
-                #    if parent:
-                #        actual = parent.fields['name']
-                if ppid != '0':
-                    parent = procs_by_pid.get(elem.fields['ppid'])
-                    if parent:
-                        actual = parent.fields['name']
-                if actual and actual.lower() not in [p.lower() for p in expected]:
-                    yield "%s (pid: %s) parent process expected: %s, actual: %s." % (elem.fields['name'], elem.fields['pid'], expected, actual)
+        proc_name = self.name_matcher.transposed(elem.fields['name'])
+        if proc_name:
+            yield "%s (pid: %s) is named suspiciously similarly to a Windows process: %s." % (elem.fields['name'], elem.fields['pid'], proc_name)
 
-            if constraints.get('singleton'):
-                instances = 0
-                for e in procs:
-                    if e.fields['name'] == elem.fields['name'] and e.fields['pslist'] == 'True' and e.fields['exit_time'] == '': 
-                        instances += 1
-                if instances != 1:
-                    yield "%s (pid: %s) has %s instances. Only one instance should exist." % (elem.fields['name'], elem.fields['pid'], instances)
 
-            if constraints.get('image_path'):
-                expected = constraints['image_path']
-                actual = str(elem.fields['image_path_name'])
-
-                if actual != '':
-                    if actual.startswith('\\??\\'):
-                        actual = actual.lstrip('\\??\\')
-                   
-                    if actual.startswith('\\SystemRoot'):
-                        actual = actual.replace('\\SystemRoot', sysroot)
-                      
-                    if actual.lower() != expected.lower():
-                        yield "%s (pid: %s) image path expected: %s, actual: %s." % (elem.fields['name'], elem.fields['pid'], expected, elem.fields['image_path_name'])
-
-            if constraints.get('session'):        
-                expected = constraints['session']
-                actual = elem.fields['session_id']
-                if actual != expected:
-                    yield "%s (pid: %s) session_id expected: %s, actual: %s." % (elem.fields['name'], elem.fields['pid'], expected, actual)
-
-            if constraints.get('prio'):        
-                expected = int(constraints['prio'])
-                actual = int(elem.fields['prio'])
-                if actual != expected:
-                    yield "%s (pid: %s) base priority expected: %s, actual: %s." % (elem.fields['name'], elem.fields['pid'], expected, actual)
+    # Checks for known processes, using constraints dict above        
+    def check_known_process(self, elem):
 
-            # Thanks to Barry McIntosh for the idea for this check
-            if constraints.get('childless'):
-                if num_children.get(elem.fields['pid']):
-                    yield "%s (pid: %s) has %s children where none were expected." % (elem.fields['name'], elem.fields['pid'], num_children.get(elem.fields['pid']))
+        # Get the set of constraints for this known process
+        constraints = self.known_processes[elem.fields['name'].lower()]
 
-            # Thanks to Barry McIntosh for the idea for this check        
-            if constraints.get('starts_at_boot'):
-                start_time = time.strptime(elem.fields['create_time'].split('UTC')[0].strip(), '%Y-%m-%d %H:%M:%S')
-                delta = time.mktime(start_time) - time.mktime(system_start)
-                # Is this a reasonable heauristic?
-                if delta > 60:
-                    #yield "%s (pid: %s) started %s, long after the machine booted at %s." % (elem.fields['name'], elem.fields['pid'], elem.fields['create_time'], str(system_start))
-                    yield "%s (pid: %s, %s) started %s seconds after boot time which may be suspicious." % (elem.fields['name'], elem.fields['pid'], elem.fields['command_line'], delta)
+        if constraints.get('pid'):
+            expected = int(constraints['pid'])
+            actual = int(elem.fields['pid'])
+            if actual != expected:
+                yield "%s pid expected: %s, actual: %s." % (elem.fields['name'], expected, actual)
 
- 
+        if constraints.get('image_path'):
+            expected = constraints['image_path']
+            actual = str(elem.fields['image_path_name'])
 
-def injection_warnings(injects, envars):
+            if actual != '':
+                if actual.startswith('\\??\\'):
+                    actual = actual.lstrip('\\??\\')
+               
+                if actual.startswith('\\SystemRoot'):
+                    actual = actual.replace('\\SystemRoot', self.sysroot)
+                  
+                if actual.lower() != expected.lower():
+                    yield "%s (pid: %s) image path expected: %s, actual: %s." % (elem.fields['name'], elem.fields['pid'], expected, elem.fields['image_path_name'])
 
-    # Look for MZ in 'content' - only searches first few bytes
-    for inject in injects:
-        if 'MZ' in inject.fields['content']:
-            yield "%s (pid: %s) has PE header in injection." % (inject.fields['task_image_file_name'], inject.fields['task_unique_proces_id'])
+        if constraints.get('session'):        
+            expected = constraints['session']
+            actual = elem.fields['session_id']
+            if actual != expected:
+                yield "%s (pid: %s) session_id expected: %s, actual: %s." % (elem.fields['name'], elem.fields['pid'], expected, actual)
 
+        if constraints.get('prio'):        
+            expected = int(constraints['prio'])
+            actual = int(elem.fields['prio'])
+            if actual != expected:
+                yield "%s (pid: %s) base priority expected: %s, actual: %s." % (elem.fields['name'], elem.fields['pid'], expected, actual)
 
-def dll_warnings(dlls, envars):
+        if constraints.get('parent') or constraints.get('singleton') or constraints.get('childless') or constraints.get('starts_at_boot'):
+            self.deferred.append(elem)
 
-    for dll in dlls:
 
-        # Is dll run from temp directory?
-        if temp(dll.fields['dll_mapped_path']):
-            yield "%s (pid: %s) has temp in dll_mapped_path." % (dll.fields['dll_mapped_path'], dll.fields['process_id'])
-        if temp(dll.fields['load_full_dll_name']):
-            yield "%s (pid: %s) has temp in load_full_dll_name." % (dll.fields['load_full_dll_name'], dll.fields['process_id'])
-        if temp(dll.fields['init_full_dll_name']):
-            yield "%s (pid: %s) has temp in init_full_dll_name." % (dll.fields['init_full_dll_name'], dll.fields['process_id'])
-        if temp(dll.fields['mem_full_dll_name']):
-            yield "%s (pid: %s) has temp in mem_full_dll_name." % (dll.fields['mem_full_dll_name'], dll.fields['process_id'])
+    def check_parent(self, elem, parent):
 
-        # No name or extension or bad extension
-        pieces = dll.fields['dll_mapped_path'].rsplit('.', 1)
-        if len(pieces) < 2:
-            yield "%s (pid: %s) has no extension." % (dll.fields['dll_mapped_path'], dll.fields['process_id'])
-        elif dll.fields['dll_mapped_path'].rsplit('.', 1)[1].lower() in ['d1l', 'dl1', 'd11']:
-            yield "%s (pid: %s) has a 1 (one) in the extension." % (dll.fields['dll_mapped_path'], dll.fields['process_id'])
+        expected = self.known_processes[elem.fields['name'].lower()]['parent']
+        actual = parent.fields['name']
+        if actual and actual.lower() not in [p.lower() for p in expected]:
+            yield "%s (pid: %s) parent process expected: %s, actual: %s." % (elem.fields['name'], elem.fields['pid'], expected, actual)
 
-        # Hidden dlls
-        if dll.fields['dll_mapped_path'].lower().endswith('.dll'):
-            if not (dll.fields['dll_in_load'] == 'True') and (dll.fields['dll_in_init'] == 'True') and (dll.fields['dll_in_mem'] == 'True'):
-                yield "%s (pid: %s) may be hidden." % (dll.fields['dll_mapped_path'], dll.fields['process_id'])
- 
 
-def sid_warnings(sids, envars):
+# Declarative warnings: rules of (field, operator, value) conditions on the
+# memobjs of a plugin, with a severity and a message formatted from the 
+# memobj's fields. The default rules are in warning_rules.json; more can be
+# loaded from a file of the same format with --rules. For example:
+#
+#    {
+#        "plugin" : "dlls",
+#        "when" : [
+#            ["dll_mapped_path", "iendswith", [".d1l", ".dl1", ".d11"]]
+#        ],
+#        "severity" : "high",
+#        "message" : "%(dll_mapped_path)s (pid: %(process_id)s) has a 1 (one) in the extension."
+#    }
+#
+# All of a rule's conditions must hold. A list value matches if any of its 
+# values do (for 'iin', if the field is one of them). A rule with "each" : 
+# true warns once for each value of its list values that matches, e.g., 
+# once per suspicious name in a prefetch entry's name. Messages are Python 
+# format strings, formatted with the memobj's fields. Rules compile to SQL 
+# to run over a table of a DAMM db, and to Python predicates to run over
+# memobjs as a plugin runs; the two match the same memobjs.
+
+DEFAULT_RULES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'warning_rules.json')
+
+SEVERITIES = ['low', 'medium', 'high']
+
+
+# Escape a value for a SQL like pattern
+def like_escape(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+# Rule operators: SQL for a field and one value, the SQL parameter for the 
+# value, and the same test in Python. NULL fields only pass 'ne'.
+rule_operators = {
+    'eq'           : ("{0} = ?", lambda v: v, lambda x, v: x == v),
+    'ne'           : ("({0} is null or {0} != ?)", lambda v: v, lambda x, v: x != v),
+    'contains'     : ("instr({0}, ?) > 0", lambda v: v, lambda x, v: v in x),
+    'not_contains' : ("instr({0}, ?) = 0", lambda v: v, lambda x, v: v not in x),
+    'icontains'    : ("{0} like ? escape '\\'", lambda v: "%%%s%%" % like_escape(v), lambda x, v: v.lower() in x.lower()),
+    'istartswith'  : ("{0} like ? escape '\\'", lambda v: "%s%%" % like_escape(v), lambda x, v: x.lower().startswith(v.lower())),
+    'iendswith'    : ("{0} like ? escape '\\'", lambda v: "%%%s" % like_escape(v), lambda x, v: x.lower().endswith(v.lower())),
+    'iin'          : ("lower({0}) = ?", lambda v: v.lower(), lambda x, v: x.lower() == v.lower()),
+}
+
+
+class RuleFields(dict):
+
+    # Fields to format a rule's message with; fields the memobj doesn't 
+    # have come out empty
+
+    def __missing__(self, key):
+        return ''
+
+
+# Rule values as plain strings where they can be, to compare with and 
+# format alongside the byte strings of memobjs fresh from a plugin
+def plain(value):
+    if isinstance(value, list):
+        return [plain(x) for x in value]
+    try:
+        return str(value)
+    except UnicodeEncodeError:
+        return value
+
+
+class Rule:
+
+    def __init__(self, plugin, when, severity, message, each=False):
 
-    # Do we see domain privs? This should maybe just look for domain/enterprise admin? From Volatility cheat sheet.
-    for sid in sids:
-        if 'domain' in sid.fields['sid_name'].lower() or 'enterprise' in sid.fields['sid_name'].lower():
-            yield "%s (pid: %s) has %s rights." % (sid.fields['filename'], sid.fields['process_id'], sid.fields['sid_name'])
+        self.plugin = plain(plugin)
+        self.when = [(plain(field), plain(op), plain(value)) for field, op, value in when]
+        self.severity = plain(severity)
+        self.message = plain(message)
+        self.each = each
 
+        for field, op, value in self.when:
+            if op not in rule_operators:
+                raise ValueError("Unknown operator in rule for %s: %s" % (self.plugin, op))
+        if self.severity not in SEVERITIES:
+            raise ValueError("Unknown severity in rule for %s: %s" % (self.plugin, self.severity))
 
-def handle_warnings(handles, envars):
 
-    # Does the process have a raw socket handles? From Volatility cheat sheet.
-    for handle in handles:
-        if '\\Device\\RawIp\\0' in handle.fields['name']:
-            yield "%s (pid: %s) has a raw socket handle." % (sid.fields['filename'], sid.fields['process_id'], sid.fields['sid_name'])
+    def fields(self):
+        return [field for field, op, value in self.when]
 
 
-def privilege_warnings(privs, envars):
+    # SQL condition for the rule, and its parameters. With each, it is the
+    # number of times the rule matches, as from matches()
+    def sql(self):
 
-    # Does the process have explicitly enabled debug privileges? From Volatility cheat sheet.
-    for priv in privs:
-        if 'debug' in priv.fields['privilege'].lower():
-            if priv.fields['present'] == 'True' and  priv.fields['enabled'] == 'True' and priv.fields['the_default'] == 'False':
-                yield "%s (pid: %s) has privilege %s present and enabled, not default." % (priv.fields['filename'], priv.fields['process_id'], priv.fields['privilege'])
+        conds = []
+        params = []
+        for field, op, value in self.when:
+            template, param, test = rule_operators[op]
+            values = value if isinstance(value, list) else [value]
+            # Comparisons are 1 or 0 in sqlite, so a sum counts the matches
+            conds.append("(%s)" % (" + " if self.each else " or ").join(["(%s)" % template.format(field) for v in values]))
+            params.extend([param(v) for v in values])
 
+        return (" * " if self.each else " and ").join(conds), params
 
-def mftentry_warnings(mftentries, envars):
 
-    for entry in mftentries:
-        # Check for alternate data streams
-        if "DATA ADS" in entry.fields['name']:
-            yield "File: %s has an ADS." % (entry.fields['name'])
-        # Check for suspicous processes in prefetch
-        if entry.fields['name'].lower().endswith('pf'):
-            for elem in suspicious_processes:
-                if elem.lower() in  entry.fields['name'].lower():
-                    yield "%s is a prefetch entry for a suspicious process." % (entry.fields['name'])
+    def test(self, memobj):
 
+        return self.matches(memobj) > 0
 
-def callback_warnings(callbacks, envars):
 
-    # From Volatility cheat sheet.
-    for cb in callbacks:
-        if 'unknown' in cb.fields['module'].lower():
-            yield "Possible malicious callback: %s %s %s %s." % (cb.fields['type'], cb.fields['callback'], cb.fields['module'], cb.fields['detail'])
+    # Number of warnings the rule gives for the memobj: 1 or 0, or with 
+    # each, the product of the number of values each condition matches
+    def matches(self, memobj):
 
+        count = 1
+        for field, op, value in self.when:
+            template, param, test = rule_operators[op]
+            actual = memobj.fields.get(field)
+            if actual is None:
+                if op != 'ne':
+                    return 0
+                continue
+            # As stored in the db
+            if not isinstance(actual, basestring):
+                actual = str(actual)
+            values = value if isinstance(value, list) else [value]
+            matched = len([v for v in values if test(actual, v)])
+            if not matched:
+                return 0
+            if self.each:
+                count *= matched
 
-def timer_warnings(timers, envars):
+        return count
 
-    # From Volatility cheat sheet.
-    for timer in timers:
-        if 'unknown' in timer.fields['module'].lower():
-            yield "Possible malicious timer: %s %s %s %s %s." % (timer.fields['due_time'], timer.fields['period'], timer.fields['signaled'], timer.fields['routine'], timer.fields['module'])
 
+    def format(self, memobj):
+        return self.message % RuleFields(memobj.fields.items())
 
-def module_warnings (modules, envars):
 
-    # Is dll run from temp directory?
-    for mod in modules:
-        if temp(mod.fields['full_dll_name']):
-            yield "Module %s has temp in path." % (mod.fields['full_dll_name'])
+def load_rules(path, severity=None):
 
+    # Rules from a rules file, at or above the given severity
+    with open(path) as f:
+        rules = [Rule(x['plugin'], x['when'], x.get('severity', 'medium'), x['message'], x.get('each', False)) for x in json.load(f)]
 
-def check_warnings(plugins, db):
+    if severity:
+        rules = [x for x in rules if SEVERITIES.index(x.severity) >= SEVERITIES.index(severity)]
+
+    return rules
+
+
+class WarningsEngine:
+
+    # Runs the warnings for each plugin over its memobjs as they are fed in, 
+    # e.g., while the plugin runs, rather than over a list of every memobj 
+    # read back from the db. Call finish() once a plugin's memobjs are all in.
+    # Over a db table, check_table() runs everything in one pass.
+
+    def __init__(self, envars, rules=None):
+        self.envars = envars
+        self.checks = {}
+        self.rules = {}
+        for rule in (rules if rules is not None else load_rules(DEFAULT_RULES)):
+            self.rules.setdefault(rule.plugin, []).append(rule)
+
+
+    def watches(self, plug_name):
+        return plug_name in self.rules or plug_name in memobj_warning_classes
+
+
+    def feed(self, plug_name, memobj):
+
+        for rule in self.rules.get(plug_name, []):
+            for x in xrange(rule.matches(memobj)):
+                yield rule.format(memobj)
+
+        for warning in self.get_checks(plug_name, memobj):
+            yield warning
+
+
+    def get_checks(self, plug_name, memobj):
+
+        if plug_name not in memobj_warning_classes:
+            return []
+
+        if plug_name not in self.checks:
+            self.checks[plug_name] = memobj_warning_classes[plug_name](self.envars)
+
+        return self.checks[plug_name].feed(memobj)
+
+
+    def finish(self, plug_name):
+
+        if plug_name not in self.checks:
+            return []
+
+        return self.checks.pop(plug_name).finish()
+
+
+    # Check a db table in one query: the rules are run by the db, and the
+    # rows are only fed through if a plugin has warnings in Python too
+    def check_table(self, ops, db, table):
+
+        plug_name = table.split('_')[0]
+        setobj = ops.get_setobj(table)
+        columns = setobj.get_child().fields.keys()
+
+        rules = []
+        for rule in self.rules.get(plug_name, []):
+            missing = [x for x in rule.fields() if x not in columns]
+            if missing:
+                debug("Skipping rule for %s, no %s in %s" % (plug_name, ", ".join(missing), table))
+            else:
+                rules.append(rule)
+
+        # A flag column per rule, so the rows come back marked with the rules
+        # they match
+        conds = [rule.sql() for rule in rules]
+        flags = [cond for cond, cond_params in conds]
+        params = [param for cond, cond_params in conds for param in cond_params]
+        cmd = "select %s from %s" % (", ".join(["*"] + flags), table)
+        if plug_name not in memobj_warning_classes:
+            if not rules:
+                return
+            cmd += " where %s" % " or ".join(["(%s)" % x for x in flags])
+            params = params + params
+        debug(cmd)
+
+        conn = ops.connect(db)
+        curs = conn.execute(cmd, params)
+        rows = curs.fetchmany(ops.chunk_size)
+        while rows:
+            for row in rows:
+                memobj = setobj.memobj_from_row(row[:len(row) - len(rules)])
+                for i, rule in enumerate(rules):
+                    for x in xrange(row[len(row) - len(rules) + i] or 0):
+                        yield rule.format(memobj)
+                for warning in self.get_checks(plug_name, memobj):
+                    yield warning
+            rows = curs.fetchmany(ops.chunk_size)
+
+        for warning in self.finish(plug_name):
+            yield warning
+
+
+def check_warnings(plugins, db, rules=None):
     
     import db_ops
-    db_ops = db_ops.DBOps()
 
     yield "\nWarnings: (Experimental)"
     
-    # Get table names from db
-    tables = db_ops.get_tables(db)
+    with db_ops.DBOps() as ops:
 
-    # Get profile from db
-    envars = db_ops.get_meta(db)
+        # Get table names from db
+        tables = ops.get_tables(db)
 
-    # For each table in the db
-    for table in tables:
+        # Get profile from db
+        envars = ops.get_meta(db)
+        engine = WarningsEngine(envars, rules)
 
-        if table == 'META':
-            continue
-
-        # Get the plugin name and setobj name for this db table 
-        plug_name, setobj_name = table.split('_')
-        # Import the plugin module
-        plug = __import__(plug_name)
-        # Get a setobj object
-        setobj = getattr(plug, setobj_name)()
+        # For each table in the db
+        for table in tables:
 
-        # Get the db rows for this table back into objects
-        memobjs = []
-        for row in db_ops.get_rows(db, table):
-            memobjs.append(setobj.memobj_from_row(row))
+            if table == 'META':
+                continue
 
-        # If we have warnings to check, then do it    
-        if plug_name in memobj_warning_funcs.keys():
+            # If we have warnings to check, then do it    
+            plug_name = table.split('_')[0]
+            if not engine.watches(plug_name):
+                continue
             yield "\nChecking: %s" % plug_name
-            for elem in memobj_warning_funcs[plug_name](memobjs, envars):
-                yield elem    
+
+            for elem in engine.check_table(ops, db, table):
+                yield elem
     
     yield "\nDone."
 
 
-memobj_warning_funcs = { 'processes' : process_warnings,
-                        'injections' : injection_warnings,
-                        'dlls'       : dll_warnings,
-                        'privileges' : privilege_warnings,
-                        'sids'       : sid_warnings,
-                        'handles'    : handle_warnings,
-                        'mftentries' : mftentry_warnings,
-                        'callback'   : callback_warnings,
-                        'timers'     : timer_warnings, 
-                        'modules'    : module_warnings }
+# Warnings that need more than a rule, e.g., to see more than one memobj
+memobj_warning_classes = { 'processes' : ProcessWarnings }
 
 
 # Name mangling detectors
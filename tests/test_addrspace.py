@@ -0,0 +1,103 @@
+# DAMM
+# Copyright (c) 2013 504ENSICS Labs
+#
+# This file is part of DAMM.
+#
+# DAMM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# DAMM is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DAMM.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+#
+# usage: python -m unittest discover tests
+#
+
+import sys
+import os
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import volatility.conf as conf
+import volatility.registry as registry
+import volatility.addrspace as addrspace
+
+
+class RunSpace(addrspace.AbstractRunBasedMemory):
+    def __init__(self, base, config, runs):
+        addrspace.AbstractRunBasedMemory.__init__(self, base, config)
+        self.runs = runs
+
+
+class RunBasedReadTest(unittest.TestCase):
+
+    def setUp(self):
+        registry.PluginImporter()
+        import volatility.plugins.addrspaces.standard as standard
+
+        self.tmp = tempfile.mkdtemp()
+        fname = os.path.join(self.tmp, 'base.bin')
+        self.data = "".join(chr(ord('A') + i % 26) for i in xrange(8000))
+        with open(fname, 'wb') as f:
+            f.write(self.data)
+
+        self.config = conf.ConfObject()
+        registry.register_global_options(self.config, addrspace.BaseAddressSpace)
+        self.config.LOCATION = 'file://' + fname
+        self.base = standard.FileAddressSpace(None, self.config)
+
+
+    def tearDown(self):
+        self.base.close()
+        shutil.rmtree(self.tmp)
+
+
+    def test_zread_run_past_end_of_base(self):
+        '''
+        The part of a run the base holds is read, and the rest is padded
+        '''
+        space = RunSpace(self.base, self.config, [(0, 7968, 128), (128, 0, 32)])
+        self.assertEqual(space.zread(26, 13), self.data[7994:] + "\x00" * 7)
+        self.assertFalse(space.read(26, 13))
+
+
+    def test_zread_across_runs(self):
+        '''
+        Reads across runs, and across a gap between runs, are in order
+        '''
+        space = RunSpace(self.base, self.config, [(0, 4096, 64), (64, 0, 64), (160, 64, 32)])
+        self.assertEqual(space.zread(32, 96), self.data[4128:4160] + self.data[0:64])
+        self.assertEqual(space.zread(96, 96), self.data[32:64] + "\x00" * 32 + self.data[64:96])
+        self.assertEqual(space.read(96, 32), self.data[32:64])
+        self.assertEqual(space.read(96, 96), None)
+
+
+    def test_runs_edited_in_place(self):
+        '''
+        Lookups follow runs edited in place, not only runs replaced or
+        added to
+        '''
+        space = RunSpace(self.base, self.config, [(0, 0, 64), (128, 64, 64)])
+        self.assertEqual(space.read(128, 16), self.data[64:80])
+        space.runs[1] = (128, 256, 64)
+        self.assertEqual(space.read(128, 16), self.data[256:272])
+        space.runs[0:1] = [(64, 512, 32)]
+        self.assertEqual(space.read(0, 16), None)
+        self.assertEqual(space.read(64, 16), self.data[512:528])
+        space.runs = [(0, 1024, 32)]
+        self.assertEqual(space.read(0, 16), self.data[1024:1040])
+
+
+if __name__ == '__main__':
+    unittest.main()
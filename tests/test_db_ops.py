@@ -0,0 +1,127 @@
+# DAMM
+# Copyright (c) 2013 504ENSICS Labs
+#
+# This file is part of DAMM.
+#
+# DAMM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# DAMM is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DAMM.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+#
+# usage: python -m unittest discover tests
+#
+
+import sys
+import os
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import libdamm.memory_object as memobj
+from libdamm import db_ops
+
+
+class Thing(memobj.MemObject):
+
+    def __init__(self, offset=None, pid=None, hidden=None, ratio=None, name=None):
+        memobj.MemObject.__init__(self, offset)
+        self.fields['pid'] = pid
+        self.fields['hidden'] = hidden
+        self.fields['ratio'] = ratio
+        self.fields['name'] = name
+
+
+class ThingSet(memobj.MemObjectSet):
+
+    def get_child(self):
+        return Thing()
+
+
+    def get_unique_id(self, thing):
+        return (thing.fields['pid'], thing.fields['hidden'])
+
+
+    def get_diff_fields(self):
+        return ['hidden', 'ratio', 'name', 'offset']
+
+
+class DigestTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.db = os.path.join(self.tmp, 'test.db')
+        self.ops = db_ops.DBOps()
+
+
+    def tearDown(self):
+        self.ops.close()
+        shutil.rmtree(self.tmp)
+
+
+    def test_digests_round_trip(self):
+        '''
+        Digests worked out from the memobjs read back from the db match the
+        ones stored when they were inserted
+        '''
+        setobj = ThingSet(None)
+        things = [Thing('0x1000', 4, True, 0.1, 'System'),
+            Thing(None, 2 ** 40, False, 1e20, u'caf\xe9.exe'),
+            Thing('0x3000', 0, None, 3.0, '')]
+
+        conn = self.ops.connect(self.db)
+        self.ops.create_table(conn, setobj)
+        self.ops.insert_rows(conn, [self.ops.get_row(x, setobj) for x in things], setobj)
+        conn.commit()
+
+        table = self.ops.get_table_name(setobj)
+        self.assertTrue(self.ops.has_digests(self.db, table))
+        rows = list(self.ops.get_rows(self.db, table))
+        self.assertEqual(len(rows), len(things))
+        for row in rows:
+            memobj = setobj.memobj_from_row(row)
+            diff_values = [memobj.fields.get(x) for x in setobj.get_diff_fields()]
+            self.assertEqual(row[-2], self.ops.get_unique_id_digest(memobj, setobj))
+            self.assertEqual(row[-1], self.ops.get_digest(diff_values))
+            self.assertEqual(row[-2], self.ops.get_unique_id_digest(memobj, setobj, ['pid', 'hidden']))
+
+
+    def test_db_text(self):
+        '''
+        Values are digested as the text sqlite stores
+        '''
+        self.assertEqual(db_ops.db_text(True), '1')
+        self.assertEqual(db_ops.db_text(False), '0')
+        self.assertEqual(db_ops.db_text(42L), '42')
+        self.assertEqual(db_ops.db_text(1e20), '1.0e+20')
+        self.assertEqual(db_ops.db_text(u'caf\xe9'), 'caf\xc3\xa9')
+        self.assertEqual(db_ops.db_text(None), None)
+
+
+    def test_failed_plugin(self):
+        '''
+        A plugin that fails as it runs leaves no table behind
+        '''
+        class FailingSet(ThingSet):
+            def analyze_file(self):
+                yield Thing('0x1000', 4, True, 0.1, 'System')
+                raise ValueError('plugin failed')
+
+        setobj = FailingSet(None)
+        self.assertRaises(ValueError, self.ops.insert_plugin, setobj, self.db, None)
+        self.assertFalse(self.ops.in_db(self.db, self.ops.get_table_name(setobj)))
+
+
+if __name__ == '__main__':
+    unittest.main()
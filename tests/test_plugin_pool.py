@@ -0,0 +1,112 @@
+# DAMM
+# Copyright (c) 2013 504ENSICS Labs
+#
+# This file is part of DAMM.
+#
+# DAMM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# DAMM is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DAMM.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+#
+# usage: python -m unittest discover tests
+#
+
+import sys
+import os
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import libdamm.memory_object as memobj
+from libdamm import db_ops
+from libdamm import plugin_pool
+
+
+class Thing(memobj.MemObject):
+
+    def __init__(self, offset=None, name=None):
+        memobj.MemObject.__init__(self, offset)
+        self.fields['name'] = name
+
+
+class GoodSet(memobj.MemObjectSet):
+
+    def get_child(self):
+        return Thing()
+
+
+class BadSet(GoodSet):
+    pass
+
+
+def fake_worker(tasks, results, profile, kdbg, memimg, extra_dir, debug_on, dtb=None):
+    '''
+    Stands in for plugin_worker: 'bad' fails after sending some rows, any 
+    other plugin sends two rows and finishes
+    '''
+    ops = db_ops.DBOps()
+    for plug in iter(tasks.get, None):
+        setobj = GoodSet(None)
+        results.put((plug, [ops.get_row(Thing(hex(i), plug), setobj) for i in xrange(2)]))
+        if plug == 'bad':
+            results.put((plug, 'Traceback: bad plugin'))
+        else:
+            results.put((plug, None))
+
+
+class InsertPluginsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.db = os.path.join(self.tmp, 'test.db')
+        self.ops = db_ops.DBOps()
+        self.worker = plugin_pool.plugin_worker
+        plugin_pool.plugin_worker = fake_worker
+        self.setobjs = {'good': GoodSet(None), 'bad': BadSet(None)}
+
+
+    def tearDown(self):
+        plugin_pool.plugin_worker = self.worker
+        self.ops.close()
+        shutil.rmtree(self.tmp)
+
+
+    def get_tables(self):
+        return sorted(x for x in self.ops.get_tables(self.db) if x != 'META')
+
+
+    def test_failed_plugin(self):
+        '''
+        A failed plugin leaves no table, and the others keep their rows
+        '''
+        plugin_pool.insert_plugins(self.setobjs, self.db, 2, None, None, None, ops=self.ops)
+        good = self.ops.get_table_name(self.setobjs['good'])
+        self.assertEqual(self.get_tables(), [good])
+        self.assertEqual(len(list(self.ops.get_rows(self.db, good))), 2)
+
+
+    def test_failed_load(self):
+        '''
+        If the load itself fails, no table is left to look finished
+        '''
+        def watch(setobj, memobj):
+            raise KeyboardInterrupt()
+
+        self.assertRaises(KeyboardInterrupt, plugin_pool.insert_plugins, self.setobjs, self.db, 2, None, None, None, ops=self.ops, watch=watch)
+        self.assertEqual(self.get_tables(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
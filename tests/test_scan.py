@@ -0,0 +1,115 @@
+# DAMM
+# Copyright (c) 2013 504ENSICS Labs
+#
+# This file is part of DAMM.
+#
+# DAMM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# DAMM is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DAMM.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+#
+# usage: python -m unittest discover tests
+#
+
+import sys
+import os
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import volatility.conf as conf
+import volatility.registry as registry
+import volatility.addrspace as addrspace
+import volatility.constants as constants
+import volatility.scan as scan
+import volatility.poolscan as poolscan
+
+
+# Small scan blocks, so a small buffer takes a few windows
+BLOCKSIZE = 4096
+
+TAG = "Pro\xe3"
+
+
+class TagScanner(scan.BaseScanner):
+    checks = [("PoolTagCheck", {'tag': TAG})]
+
+
+class ParallelScanTest(unittest.TestCase):
+
+    def setUp(self):
+        registry.PluginImporter()
+        self.blocksize = constants.SCAN_BLOCKSIZE
+        self.jobs = scan.config.SCAN_JOBS
+        constants.SCAN_BLOCKSIZE = BLOCKSIZE
+
+        # Hits within a window, straddling two windows, inside the 20 byte
+        # overlap of two windows (seen by both), and straddling the end of
+        # an overlap (seen by the second only)
+        data = bytearray(BLOCKSIZE * 5)
+        for offset in (10, BLOCKSIZE - 2, BLOCKSIZE + 5, 2 * BLOCKSIZE + 19, 3 * BLOCKSIZE - 1, 4 * BLOCKSIZE + 100):
+            data[offset:offset + len(TAG)] = TAG
+
+        config = conf.ConfObject()
+        registry.register_global_options(config, addrspace.BaseAddressSpace)
+        config.PROFILE = 'WinXPSP2x86'
+        self.space = addrspace.BufferAddressSpace(config, data = str(data))
+
+        # Count the scans that really went parallel
+        self.parallel_scans = 0
+        self.parallel_scan = scan.parallel_scan
+        def counting_scan(*args):
+            self.parallel_scans += 1
+            return self.parallel_scan(*args)
+        scan.parallel_scan = counting_scan
+
+
+    def tearDown(self):
+        scan.parallel_scan = self.parallel_scan
+        scan.config.update('SCAN_JOBS', self.jobs)
+        constants.SCAN_BLOCKSIZE = self.blocksize
+
+
+    def scan_with(self, jobs, scanner):
+        scan.config.update('SCAN_JOBS', jobs)
+        return list(scanner.scan(self.space))
+
+
+    def test_base_scanner(self):
+        '''
+        A BaseScanner finds the same hits in the same order with any number
+        of jobs, including the duplicate hit in a window overlap
+        '''
+        serial = self.scan_with(1, TagScanner())
+        self.assertEqual(serial, [10, 4094, 4101, 4101, 8211, 12287, 16484])
+        for jobs in (2, 3, 8):
+            self.assertEqual(self.scan_with(jobs, TagScanner()), serial)
+        self.assertEqual(self.parallel_scans, 3)
+
+
+    def test_pool_scanner(self):
+        '''
+        A MultiPoolScanner finds the same hits in the same order with any
+        number of jobs
+        '''
+        needles = [TAG, "Thr\xe5"]
+        serial = self.scan_with(1, poolscan.MultiPoolScanner(needles))
+        self.assertEqual(serial, [(TAG, x) for x in (10, 4094, 4101, 4101, 8211, 12287, 16484)])
+        for jobs in (2, 3, 8):
+            self.assertEqual(self.scan_with(jobs, poolscan.MultiPoolScanner(needles)), serial)
+        self.assertEqual(self.parallel_scans, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+# DAMM
+# Copyright (c) 2013 504ENSICS Labs
+#
+# This file is part of DAMM.
+#
+# DAMM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# DAMM is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DAMM.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+#
+# usage: python -m unittest discover tests
+#
+
+import sys
+import os
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import volatility.conf as conf
+import volatility.registry as registry
+import volatility.addrspace as addrspace
+import volatility.poolscan as poolscan
+from libdamm import scan_coordinator
+
+
+NEEDLES = ["Pro\xe3", "Thr\xe5", "Mut\xe1"]
+
+
+class ScanCoordinatorTest(unittest.TestCase):
+
+    def setUp(self):
+        registry.PluginImporter()
+        data = bytearray(0x10000)
+        for offset, needle in ((0x10, "Thr\xe5"), (0x2000, "Pro\xe3"), (0x2000 + 4, "Mut\xe1"), (0x8000, "Pro\xe3")):
+            data[offset:offset + 4] = needle
+
+        config = conf.ConfObject()
+        registry.register_global_options(config, addrspace.BaseAddressSpace)
+        config.PROFILE = 'WinXPSP2x86'
+        self.space = addrspace.BufferAddressSpace(config, data = str(data))
+
+
+    def tearDown(self):
+        poolscan.MultiPoolScanner.prescan = None
+
+
+    def test_replay(self):
+        '''
+        Pool scans are replayed from the shared scan until it is closed
+        '''
+        needles = ["Pro\xe3", "Mut\xe1"]
+        fresh = list(poolscan.MultiPoolScanner(needles).scan(self.space))
+
+        coordinator = scan_coordinator.ScanCoordinator()
+        coordinator.add_needles(NEEDLES)
+        coordinator.scan(self.space)
+        coordinator.install()
+        self.assertTrue(poolscan.MultiPoolScanner.prescan is coordinator)
+        self.assertEqual(list(coordinator.replay(self.space, needles)), fresh)
+        self.assertEqual(list(poolscan.MultiPoolScanner(needles).scan(self.space)), fresh)
+
+        coordinator.close()
+        self.assertTrue(poolscan.MultiPoolScanner.prescan is None)
+        self.assertEqual(coordinator.replay(self.space, needles), None)
+
+
+    def test_close_other(self):
+        '''
+        Closing a coordinator leaves another one's scans alone
+        '''
+        first = scan_coordinator.ScanCoordinator()
+        first.install()
+        second = scan_coordinator.ScanCoordinator()
+        second.install()
+        first.close()
+        self.assertTrue(poolscan.MultiPoolScanner.prescan is second)
+
+
+if __name__ == '__main__':
+    unittest.main()
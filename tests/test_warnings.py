@@ -0,0 +1,101 @@
+# DAMM
+# Copyright (c) 2013 504ENSICS Labs
+#
+# This file is part of DAMM.
+#
+# DAMM is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# DAMM is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DAMM.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+#
+# usage: python -m unittest discover tests
+#
+
+import sys
+import os
+import sqlite3
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from libdamm import warnings
+
+
+class Process(object):
+
+    def __init__(self, pid, ppid, name, pslist='True', exit_time=''):
+        self.fields = {'pid': pid, 'ppid': ppid, 'name': name, 'pslist': pslist,
+            'exit_time': exit_time, 'create_time': '2010-08-11 06:06:39 UTC+0000',
+            'image_path_name': '', 'session_id': '0', 'prio': '8', 'command_line': ''}
+        for xview in ['psscan', 'thrdproc', 'pspcid', 'csrss', 'session', 'deskthrd']:
+            self.fields[xview] = 'True'
+
+
+class ProcessWarningsTest(unittest.TestCase):
+
+    def get_parent_warnings(self, procs):
+        '''
+        @procs: list of Processes, in the order they are fed in
+
+        @return: list of the parent warnings for the processes
+        '''
+        checker = warnings.ProcessWarnings([('profile', 'WinXPSP2x86'), ('systemroot', 'C:\\WINDOWS')])
+        res = []
+        for proc in procs:
+            res.extend(checker.feed(proc))
+        res.extend(checker.finish())
+        return [x for x in res if 'parent process' in x]
+
+
+    def test_reused_parent_pid(self):
+        '''
+        A reused pid is resolved to the last process with that pid, wherever
+        the child is
+        '''
+        smss = Process('368', '4', 'smss.exe')
+        winlogon = Process('500', '368', 'winlogon.exe')
+        child = Process('1024', '600', 'svchost.exe')
+        exited = Process('600', '500', 'explorer.exe', pslist='False', exit_time='2010-08-11 06:07:00 UTC+0000')
+        services = Process('600', '500', 'services.exe')
+
+        self.assertEqual(self.get_parent_warnings([smss, winlogon, child, exited, services]), [])
+        self.assertEqual(self.get_parent_warnings([smss, winlogon, exited, services, child]), [])
+        self.assertEqual(len(self.get_parent_warnings([smss, winlogon, services, exited, child])), 1)
+        self.assertEqual(len(self.get_parent_warnings([smss, winlogon, child, services, exited])), 1)
+
+
+class RuleTest(unittest.TestCase):
+
+    def test_each(self):
+        '''
+        A rule with each warns once per matching value, both over memobjs
+        and in SQL
+        '''
+        rules = warnings.load_rules(warnings.DEFAULT_RULES)
+        rule = [x for x in rules if x.plugin == 'mftentries' and x.each][0]
+
+        conn = sqlite3.connect(':memory:')
+        conn.execute('create table mft (name text)')
+        cond, params = rule.sql()
+        for name, count in [('CMD.EXE-4A81B364.pf', 1), ('NET.EXE-NET1.EXE-01.pf', 2), ('cmd.exe', 0), ('notepad.exe.pf', 0)]:
+            entry = Process('0', '0', name)
+            self.assertEqual(rule.matches(entry), count)
+            self.assertEqual(conn.execute('select %s from (select ? as name)' % cond, params + [name]).fetchone()[0], count)
+
+        engine = warnings.WarningsEngine([('profile', 'WinXPSP2x86'), ('systemroot', 'C:\\WINDOWS')], [rule])
+        res = list(engine.feed('mftentries', Process('0', '0', 'NET.EXE-NET1.EXE-01.pf')))
+        self.assertEqual(res, ['NET.EXE-NET1.EXE-01.pf is a prefetch entry for a suspicious process.'] * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -33,6 +33,7 @@
 
 #pylint: disable-msg=C0111
 
+import bisect
 import fractions
 import volatility.obj as obj
 import volatility.registry as registry
@@ -220,53 +221,106 @@ class AbstractDiscreteAllocMemory(BaseAddressSpace):
         if self.alignment_gcd < 0x4:
             debug.warning("Alignment of " + self.__class__.__name__ + " is too small, plugins will be extremely slow")
 
-    def _read(self, addr, length, pad = False):
-        """Reads length bytes at the address addr
+    def translate_length(self, addr, length):
+        """Translates addr and works out how much of a read of length bytes from it is contiguous in the base
 
-           If pad is False, this can return None if some of the address space is empty
-           If pad is True, any read errors result in "\x00" bytes filling the missing read locations
+           Returns (paddr, size), where paddr is None if the size bytes are not available.
+           By default this goes one alloc at a time.
         """
+        alloc_remaining = self.alignment_gcd - (addr % self.alignment_gcd)
+        return self.translate(addr), min(length, alloc_remaining)
+
+    def plan_read(self, addr, length):
+        """Translates a read of length bytes at addr up front
 
+           Returns a list of (paddr, size) pieces covering the read in order, with physically
+           contiguous pieces merged so that each can be read from the base in one go.
+           paddr is None for pieces that are not available.
+        """
         if not self.alignment_gcd or not self.minimum_size:
             self.calculate_alloc_stats()
 
+        plan = []
         position = addr
         remaining = length
-        buff = ""
-        read = self.base.zread if pad else self.base.read
-
-        # For each allocation...
         while remaining > 0:
-            # Determine whether we're within an alloc or not
-            alloc_remaining = (self.alignment_gcd - (addr % self.alignment_gcd))
-            # Try to jump out early
-            paddr = self.translate(position)
-            datalen = min(remaining, alloc_remaining)
+            paddr, datalen = self.translate_length(position, remaining)
+            last_paddr, last_len = plan[-1] if plan else (None, None)
+            if plan and (paddr is None) == (last_paddr is None) and (paddr is None or last_paddr + last_len == paddr):
+                plan[-1] = (last_paddr, last_len + datalen)
+            else:
+                plan.append((paddr, datalen))
+            position += datalen
+            remaining -= datalen
+        return plan
+
+    def _read(self, addr, length, pad = False):
+        """Reads length bytes at the address addr
+
+           If pad is False, this can return None if some of the address space is empty
+           If pad is True, any read errors result in "\x00" bytes filling the missing read locations
+        """
+        plan = self.plan_read(addr, length)
+
+        buff = None
+        position = addr
+        for paddr, datalen in plan:
             if paddr is None:
                 if not pad:
                     return None
-                buff += "\x00" * datalen
             else:
-                # This accounts for a special edge case
-                # when the address is valid in this address space
-                # but not in the underlying (base) address space.
-                # We have seen this happen with IA32/FileAddr
-
-                if self.base.is_valid_address(paddr):
-                    data = read(paddr, datalen)
-                else:
-                    data = None
-
+                data = self._read_piece(position, paddr, datalen, pad)
                 if data is None:
                     if not pad:
                         return obj.NoneObject("Could not read_chunks from addr " + hex(position) + " of size " + hex(datalen))
-                    data = "\x00" * datalen
-                buff += data
+                elif len(plan) == 1:
+                    return data
+                else:
+                    ## Start out with zeros, so missing pieces need no filling in
+                    if buff is None:
+                        buff = bytearray(length)
+                    buff[position - addr:position - addr + datalen] = data
             position += datalen
-            remaining -= datalen
-            assert (addr + length == position + remaining), "Address + length != position + remaining (" + hex(addr + length) + " != " + hex(position + remaining) + ") in " + self.base.__class__.__name__
-            assert (position - addr == len(buff)), "Position - address != len(buff) (" + str(position - addr) + " != " + str(len(buff)) + ") in " + self.base.__class__.__name__
-        return buff
+
+        if buff is None:
+            return "\x00" * length
+        return str(buff)
+
+    def _read_piece(self, addr, paddr, datalen, pad):
+        """Reads the datalen bytes at addr, found at paddr in the base, or returns None
+
+           With zread, a piece the base doesn't hold all of is read a stretch at a
+           time, as translate_length gives them, so the parts the base does hold
+           are still returned.
+        """
+        # This accounts for a special edge case
+        # when the address is valid in this address space
+        # but not in the underlying (base) address space.
+        # We have seen this happen with IA32/FileAddr
+        if not self.base.is_valid_address(paddr) or not self.base.is_valid_address(paddr + datalen - 1):
+            if not pad:
+                return None
+            data = []
+            position = addr
+            while position < addr + datalen:
+                chunk_paddr, chunk = self.translate_length(position, addr + datalen - position)
+                if chunk_paddr is not None and self.base.is_valid_address(chunk_paddr):
+                    chunk_data = self.base.zread(chunk_paddr, chunk) or ""
+                else:
+                    chunk_data = ""
+                data.append(chunk_data + "\x00" * (chunk - len(chunk_data)))
+                position += chunk
+            return "".join(data)
+
+        if pad:
+            data = self.base.zread(paddr, datalen)
+        else:
+            data = self.base.read(paddr, datalen)
+
+        # A piece may run past the end of the base
+        if data is not None and len(data) != datalen:
+            data = data + "\x00" * (datalen - len(data)) if pad else None
+        return data
 
     def read(self, addr, length):
         '''
@@ -282,18 +336,49 @@ class AbstractDiscreteAllocMemory(BaseAddressSpace):
         '''
         return self._read(addr, length, True)
 
+class RunList(list):
+    """A list of runs that counts the changes made to it, so an index 
+    of the runs can tell it is out of date without comparing them all"""
+    version = 0
+
+def _count_changes(name):
+    """Wraps the list method name to count the changes it makes"""
+    method = getattr(list, name)
+    def counted(self, *args):
+        self.version += 1
+        return method(self, *args)
+    counted.__name__ = name
+    return counted
+
+for _name in ("__setitem__", "__delitem__", "__setslice__", "__delslice__",
+              "__iadd__", "__imul__", "append", "extend", "insert", "pop",
+              "remove", "reverse", "sort"):
+    setattr(RunList, _name, _count_changes(_name))
+
 class AbstractRunBasedMemory(AbstractDiscreteAllocMemory):
     """A class based on memory stored as separate segments.
 
        @var runs: Stores an ordered list of the segments or runs
                   A run is a tuple of (input/domain/virtual address, output/range/physical address, size of segment)
     """
+    ## Built from the runs when first needed, see get_run_index
+    run_index = None
+    last_run = None
 
     def __init__(self, base, config, *args, **kwargs):
         AbstractDiscreteAllocMemory.__init__(self, base, config, *args, **kwargs)
         self.runs = []
         self.header = None
 
+    def _get_runs(self):
+        return self._runs
+
+    def _set_runs(self, runs):
+        ## Keep a RunList, so changes made to the runs in place are seen
+        self._runs = RunList(runs)
+
+    runs = property(_get_runs, _set_runs)
+
     def get_runs(self):
         """Get the memory block info"""
         return self.runs
@@ -302,20 +387,52 @@ class AbstractRunBasedMemory(AbstractDiscreteAllocMemory):
         """Get the header info"""
         return self.header
 
+    def get_run_index(self):
+        """Returns the start addresses of the runs, sorted, and the runs in
+        the same order, rebuilding them if the runs have changed"""
+        if self.run_index is None or self.run_index[0] is not self._runs or self.run_index[1] != self._runs.version:
+            runs = sorted(self._runs)
+            self.run_index = (self._runs, self._runs.version, [run[0] for run in runs], runs)
+            self.last_run = None
+        return self.run_index[2], self.run_index[3]
+
+    def find_run(self, addr):
+        """Returns the run that addr falls in, or None.
+
+        @param addr: a memory address
+        """
+        ## Sequential reads mostly stay in the same run
+        run = self.last_run
+        if run and run[0] <= addr < run[0] + run[2] and self.run_index[0] is self._runs and self.run_index[1] == self._runs.version:
+            return run
+        starts, runs = self.get_run_index()
+        i = bisect.bisect_right(starts, addr) - 1
+        if i >= 0 and addr < runs[i][0] + runs[i][2]:
+            self.last_run = runs[i]
+            return runs[i]
+        return None
+
     def translate(self, addr):
         """Find the offset in the file where a memory address can be found.
 
         @param addr: a memory address
         """
-        for input_addr, output_addr, length in self.runs:
-            if addr >= input_addr and addr < input_addr + length:
-                return output_addr + (addr - input_addr)
-            # Since runs are in order, we can bail out early if we're
-            # looking for something before the start of the current one
-            if addr < input_addr:
-                return None
-
-        return None
+        run = self.find_run(addr)
+        if run is None:
+            return None
+        return run[1] + (addr - run[0])
+
+    def translate_length(self, addr, length):
+        """Translates addr, with the rest of its run (or the gap up to the
+        next run) in one go, since a run is contiguous in the base"""
+        run = self.find_run(addr)
+        if run is not None:
+            return run[1] + (addr - run[0]), min(length, run[0] + run[2] - addr)
+        starts, _ = self.get_run_index()
+        i = bisect.bisect_right(starts, addr)
+        if i < len(starts):
+            length = min(length, starts[i] - addr)
+        return None, length
 
     def get_available_allocs(self):
         """Get a list of accessible physical memory regions"""
@@ -35,6 +35,7 @@ if __name__ == '__main__':
 
 import cPickle as pickle # pickle implementation must match that in volatility.cache
 import struct, copy, operator
+import os, imp, glob, marshal, hashlib
 import volatility.debug as debug
 import volatility.fmtspec as fmtspec
 import volatility.exceptions as exceptions
@@ -834,6 +835,91 @@ def VolMagic(vm):
 ## Profiles are the interface for creating/interpreting
 ## objects
 
+## Where the data of vtype modules is cached, or None for no caching
+VTYPE_CACHE_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "volatility", "vtypes")
+
+def _vtype_module_source(modname):
+    """ Returns the source file of a module, without importing it, or None """
+    package, _, name = modname.rpartition('.')
+    try:
+        __import__(package)
+        fobj, path, _desc = imp.find_module(name, sys.modules[package].__path__)
+    except (ImportError, AttributeError):
+        return None
+    if fobj:
+        fobj.close()
+    if not path.endswith('.py'):
+        return None
+    return path
+
+def load_vtype_module(modname):
+    """ Returns the global variables of a data only module, such as a profile's 
+        vtypes or syscalls, as a dictionary.
+
+        Modules already imported are used as they are.  Otherwise the data is
+        read from VTYPE_CACHE_DIRECTORY, keyed by the module name and a hash of
+        its source, which saves importing several MB of dictionaries for every
+        profile.  On a miss the module is imported and its data cached.
+    """
+    module = sys.modules.get(modname, None)
+    if module:
+        return vars(module)
+
+    cache = None
+    path = _vtype_module_source(modname)
+    if path and VTYPE_CACHE_DIRECTORY:
+        with open(path, 'rb') as fobj:
+            digest = hashlib.md5(fobj.read()).hexdigest()
+        cache = os.path.join(VTYPE_CACHE_DIRECTORY, "{0}-{1}.marshal".format(modname, digest))
+        try:
+            with open(cache, 'rb') as fobj:
+                return marshal.load(fobj)
+        except (IOError, EOFError, ValueError, TypeError):
+            pass
+
+    __import__(modname)
+    data = {}
+    for k, v in vars(sys.modules[modname]).items():
+        if k.startswith('__'):
+            continue
+        try:
+            marshal.dumps(v)
+        except ValueError:
+            # Imported modules, functions and the like
+            continue
+        data[k] = v
+
+    if cache:
+        try:
+            if not os.path.isdir(VTYPE_CACHE_DIRECTORY):
+                os.makedirs(VTYPE_CACHE_DIRECTORY)
+            # Drop the data of older versions of the module
+            for old in glob.glob(os.path.join(VTYPE_CACHE_DIRECTORY, "{0}-*.marshal".format(modname))):
+                os.remove(old)
+            with open(cache + ".tmp", 'wb') as fobj:
+                marshal.dump(data, fobj)
+            os.rename(cache + ".tmp", cache)
+        except (IOError, OSError), e:
+            debug.debug("Unable to cache vtypes in {0}: {1}".format(cache, e))
+
+    return data
+
+class CompiledTypes(dict):
+    """ The compiled types of a profile.  A structure's vtypes are only 
+        converted the first time the structure is used, since most of the 
+        thousand or so structures of a profile never are.
+    """
+
+    def __init__(self, profile):
+        dict.__init__(self)
+        self.profile = profile
+
+    def __missing__(self, name):
+        if name not in self.profile.vtypes:
+            raise KeyError(name)
+        result = self[name] = self.profile._convert_members(name)
+        return result
+
 class Profile(object):
 
     native_mapping = {'32bit': native_types.x86_native_types,
@@ -900,12 +986,12 @@ class Profile(object):
         if not vtype_module:
             debug.warning("No vtypes specified for this profile")
         else:
-            module = sys.modules.get(vtype_module, None)
+            module = load_vtype_module(vtype_module)
 
             # Try to locate the _types dictionary
-            for i in dir(module):
+            for i in sorted(module.keys()):
                 if i.endswith('_types'):
-                    self.vtypes.update(getattr(module, i))
+                    self.vtypes.update(module[i])
 
     def load_modifications(self):
         """ Find all subclasses of the modification type and applies them
@@ -948,19 +1034,17 @@ class Profile(object):
         """
 
         # Load the native types
-        self.types = {}
+        self.types = CompiledTypes(self)
         for nt, value in self.native_types.items():
             if type(value) == list:
                 self.types[nt] = Curry(NativeType, nt, format_string = value[1])
 
-        # Go through the vtypes, creating the stubs for object creation at
-        # a later point by the Object factory
-        for name in self.vtypes.keys():
-            self.types[name] = self._convert_members(name)
+        # The vtypes are converted into stubs for object creation by the 
+        # Object factory as they are first used, see CompiledTypes
 
         # Add in any object_classes that had no defined members, for completeness
         for name in self.object_classes.keys():
-            if name not in self.types:
+            if name not in self.types and name not in self.vtypes:
                 self.types[name] = Curry(self.object_classes[name], name)
 
     @property
@@ -1003,7 +1087,7 @@ class Profile(object):
 
     def has_type(self, theType):
         """ Returns a simple check of whether the type is in the profile """
-        return theType in self.types
+        return theType in self.types or theType in self.vtypes
 
     def get_obj_offset(self, name, member):
         """ Returns a members offset within the struct """
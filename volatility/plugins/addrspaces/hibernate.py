@@ -24,10 +24,19 @@
 # this code in Volatility.
 
 """ A Hiber file Address Space """
+import os
+import json
+import mmap
+import struct
+import hashlib
+import itertools
+import collections
+import multiprocessing
 import volatility.addrspace as addrspace
+import volatility.debug as debug
 import volatility.obj as obj
+import volatility.scan as scan
 import volatility.win32.xpress as xpress
-import struct
 
 
 #pylint: disable-msg=C0111
@@ -36,24 +45,39 @@ PAGE_SIZE = 0x1000
 page_shift = 12
 
 class Store(object):
-    def __init__(self, limit = 50):
+    """ A cache of decompressed xpress blocks, bounded by their total size,
+    which drops the least recently used block first """
+    def __init__(self, limit = 0x2000000):
         self.limit = limit
-        self.cache = {}
-        self.seq = []
+        self.cache = collections.OrderedDict()
         self.size = 0
 
     def put(self, key, item):
+        if key in self.cache:
+            self.size -= len(self.cache.pop(key))
         self.cache[key] = item
         self.size += len(item)
 
-        self.seq.append(key)
-        if len(self.seq) >= self.limit:
-            key = self.seq.pop(0)
-            self.size -= len(self.cache[key])
-            del self.cache[key]
+        while self.size > self.limit and len(self.cache) > 1:
+            _, old = self.cache.popitem(last = False)
+            self.size -= len(old)
 
     def get(self, key):
-        return self.cache[key]
+        item = self.cache.pop(key)
+        self.cache[key] = item
+        return item
+
+def decode_block(block):
+    """Decompresses one xpress block, given as (offset, data, block size), for
+    the workers decompressing a whole hibernation file"""
+    offset, data, size = block
+    if size == 0x10000:
+        return offset, data
+    try:
+        return offset, xpress.xpress_decode(data)
+    except IndexError:
+        ## A corrupt block, whose pages are left out
+        return offset, ''
 
 class WindowsHiberFileSpace32(addrspace.BaseAddressSpace):
     """ This is a hibernate address space for windows hibernation files.
@@ -74,7 +98,7 @@ class WindowsHiberFileSpace32(addrspace.BaseAddressSpace):
         self.PageIndex = 0
         self.AddressList = []
         self.LookupCache = {}
-        self.PageCache = Store(50)
+        self.PageCache = Store()
         self.MemRangeCnt = 0
         self.entry_count = 0xFF
 
@@ -101,10 +125,118 @@ class WindowsHiberFileSpace32(addrspace.BaseAddressSpace):
         ## need to search for it.
         self.dtb = self.ProcState.SpecialRegisters.Cr3.v()
 
+        ## With a cache directory the whole file is decompressed once into a
+        ## raw image there, which this and later runs read instead
+        self.raw = None
+        self.raw_pages = None
+        cache_directory = getattr(config, 'HIBERNATION_CACHE', None)
+        if cache_directory:
+            cache_directory = os.path.expanduser(cache_directory)
+            key = self.cache_key()
+            if self.load_raw_image(cache_directory, key):
+                return
+
         # This is a lengthy process, it was cached, but it may be best to delay this
         # until it's absolutely necessary and/or convert it into a generator...
         self.build_page_cache()
 
+        if cache_directory and self.write_raw_image(cache_directory, key):
+            self.load_raw_image(cache_directory, key)
+
+    @staticmethod
+    def register_options(config):
+        config.add_option("HIBERNATION-CACHE", default = None, type = 'str',
+                          help = "Directory to decompress hibernation files into once, for later runs to reuse")
+
+    def cache_key(self):
+        """Identifies the hibernation file by a hash of its header and first memory table"""
+        md5 = hashlib.md5()
+        for page in range(self._get_first_table_page() + 2):
+            md5.update(self.base.zread(page * PAGE_SIZE, PAGE_SIZE))
+        return md5.hexdigest()
+
+    def load_raw_image(self, directory, key):
+        """Uses a raw image of the hibernation file from the cache directory, if there is one
+
+        Returns True if it was found.
+        """
+        path = os.path.join(directory, key)
+        try:
+            with open(path + ".json", 'rb') as fobj:
+                index = json.load(fobj)
+            with open(path + ".raw", 'rb') as fobj:
+                raw = mmap.mmap(fobj.fileno(), 0, access = mmap.ACCESS_READ)
+        except (IOError, OSError, ValueError, mmap.error), e:
+            debug.debug("No decompressed hibernation file in {0}: {1}".format(directory, e))
+            return False
+
+        self.raw = raw
+        self.raw_pages = set()
+        for start, count in index['pages']:
+            self.raw_pages.update(xrange(start, start + count))
+        self.AddressList = [tuple(x) for x in index['address_list']]
+        self.HighestPage = index['highest_page']
+        return True
+
+    def write_raw_image(self, directory, key):
+        """Decompresses every xpress block, using as many processes as scans
+        do, into a sparse raw image and index in the cache directory
+
+        Returns True if it was written.
+        """
+        blocks = sorted(self.PageDict.keys())
+
+        def read_blocks():
+            for offset in blocks:
+                size = self.PageDict[offset][0][1]
+                yield offset, self.base.read(offset + 0x20, size) or '', size
+
+        jobs = scan.scan_jobs()
+        pool = None
+        if jobs > 1 and len(blocks) > 1:
+            pool = multiprocessing.Pool(jobs)
+            decoded = pool.imap(decode_block, read_blocks(), 16)
+        else:
+            decoded = itertools.imap(decode_block, read_blocks())
+
+        path = os.path.join(directory, key)
+        pages = []
+        try:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            with open(path + ".raw.tmp", 'wb') as fobj:
+                for offset, data in decoded:
+                    for page, _size, xpress_page in self.PageDict[offset]:
+                        ## Pages a short block doesn't cover stay unavailable
+                        page_data = data[xpress_page * 0x1000:(xpress_page + 1) * 0x1000]
+                        if len(page_data) == 0x1000:
+                            fobj.seek(page * 0x1000)
+                            fobj.write(page_data)
+                            pages.append(page)
+                fobj.truncate(self.HighestPage * 0x1000 + 0x1000)
+            os.rename(path + ".raw.tmp", path + ".raw")
+
+            ## Record the available pages as (first page, count) runs
+            runs = []
+            for page in sorted(pages):
+                if runs and runs[-1][0] + runs[-1][1] == page:
+                    runs[-1][1] += 1
+                else:
+                    runs.append([page, 1])
+            index = dict(pages = runs, address_list = self.AddressList, highest_page = self.HighestPage)
+            with open(path + ".json.tmp", 'wb') as fobj:
+                json.dump(index, fobj)
+            os.rename(path + ".json.tmp", path + ".json")
+        except (IOError, OSError), e:
+            debug.warning("Unable to decompress the hibernation file into {0}: {1}".format(directory, e))
+            return False
+        finally:
+            if pool:
+                pool.terminate()
+                pool.join()
+
+        return True
+
     def _get_first_table_page(self):
         if self.header != None:
             return self.header.FirstTablePage
@@ -245,6 +377,8 @@ class WindowsHiberFileSpace32(addrspace.BaseAddressSpace):
         return None
 
     def is_valid_address(self, addr):
+        if self.raw is not None:
+            return (addr >> page_shift) in self.raw_pages
         XpressHeaderOffset, _XpressBlockSize, _XpressPage = self.get_addr(addr)
         return XpressHeaderOffset != None
 
@@ -273,6 +407,11 @@ class WindowsHiberFileSpace32(addrspace.BaseAddressSpace):
         ## How much data can we satisfy?
         available = min(PAGE_SIZE - page_offset, len)
 
+        if self.raw is not None:
+            if (addr >> page_shift) not in self.raw_pages:
+                return None
+            return self.raw[addr:addr + available]
+
         ImageXpressHeader, BlockSize, XpressPage = self.get_addr(addr)
         if not ImageXpressHeader:
             return None
@@ -318,6 +457,8 @@ class WindowsHiberFileSpace32(addrspace.BaseAddressSpace):
         return longval
 
     def get_available_pages(self):
+        if self.raw is not None:
+            return [[page * 0x1000, 0x1000] for page in sorted(self.raw_pages)]
         page_list = []
         for _i, xb in enumerate(self.PageDict.keys()):
             for page, _size, _offset in self.PageDict[xb]:
@@ -340,5 +481,7 @@ class WindowsHiberFileSpace32(addrspace.BaseAddressSpace):
             yield i
 
     def close(self):
+        if self.raw is not None:
+            self.raw.close()
         self.base.close()
 
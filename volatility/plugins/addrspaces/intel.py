@@ -125,7 +125,7 @@ class IA32PagedMemory(paged.AbstractWritablePagedMemory):
     def get_four_meg_paddr(self, vaddr, pgd_entry):
         return (pgd_entry & ((ptrs_per_pgd - 1) << 22)) | (vaddr & ~((ptrs_per_pgd - 1) << 22))
 
-    def vtop(self, vaddr):
+    def page_walk(self, vaddr):
         retVal = None
         pgd = self.get_pgd(vaddr)
         if self.entry_present(pgd):
@@ -140,6 +140,9 @@ class IA32PagedMemory(paged.AbstractWritablePagedMemory):
         return retVal
 
     def read_long_phys(self, addr):
+        longval = self.read_table_entry(addr, 4)
+        if longval is not None:
+            return longval
         try:
             string = self.base.read(addr, 4)
         except IOError:
@@ -150,19 +153,16 @@ class IA32PagedMemory(paged.AbstractWritablePagedMemory):
         return longval
 
     def get_available_pages(self):
-        pgd_curr = self.dtb
-        for i in range(0, ptrs_per_pgd):
+        present = self.entry_present
+        for i, entry in enumerate(self.read_entries(self.dtb, ptrs_per_pgd, pointer_size)):
             start = (i * ptrs_per_pgd * ptrs_per_pte * 4)
-            entry = self.read_long_phys(pgd_curr)
-            pgd_curr = pgd_curr + 4
-            if self.entry_present(entry) and self.page_size_flag(entry):
+            if present(entry) and self.page_size_flag(entry):
                 yield (start, 0x400000)
-            elif self.entry_present(entry):
-                pte_curr = entry & ~((1 << page_shift) - 1)
-                for j in range(0, ptrs_per_pte):
-                    pte_entry = self.read_long_phys(pte_curr)
-                    pte_curr = pte_curr + 4
-                    if self.entry_present(pte_entry):
+            elif present(entry):
+                ## Read the whole page table at once
+                ptes = self.read_table(entry & ~((1 << page_shift) - 1), pointer_size)
+                for j, pte_entry in enumerate(ptes):
+                    if present(pte_entry):
                         yield (start + j * 0x1000, 0x1000)
 
 class IA32PagedMemoryPae(IA32PagedMemory):
@@ -228,7 +228,7 @@ class IA32PagedMemoryPae(IA32PagedMemory):
     def get_large_paddr(self, vaddr, pgd_entry):
         return (pgd_entry & 0xFFFFFFFE00000) | (vaddr & ~((ptrs_page - 1) << 21))
 
-    def vtop(self, vaddr):
+    def page_walk(self, vaddr):
         retVal = None
         pdpe = self.get_pdpi(vaddr)
 
@@ -250,6 +250,9 @@ class IA32PagedMemoryPae(IA32PagedMemory):
         if not addr:
             return obj.NoneObject("Unable to read None")
 
+        longlongval = self.read_table_entry(addr, 8)
+        if longlongval is not None:
+            return longlongval
         try:
             string = self.base.read(addr, 8)
         except IOError:
@@ -260,30 +263,23 @@ class IA32PagedMemoryPae(IA32PagedMemory):
         return longlongval
 
     def get_available_pages(self):
-
+        present = self.entry_present
         pdpi_base = self.get_pdptb(self.dtb)
 
-        for i in range(0, ptrs_per_pdpi):
+        for i, pdpe in enumerate(self.read_entries(pdpi_base, ptrs_per_pdpi, entry_size)):
 
             start = (i * ptrs_per_pae_pgd * ptrs_per_pae_pgd * ptrs_per_pae_pte * 8)
-            pdpi_entry = pdpi_base + i * entry_size
-            pdpe = self._read_long_long_phys(pdpi_entry)
 
-            if not self.entry_present(pdpe):
+            if not present(pdpe):
                 continue
 
-            pgd_curr = self.pdba_base(pdpe)
-
-            for j in range(0, ptrs_per_pae_pgd):
+            ## Each page directory and page table is read and unpacked in one go
+            for j, entry in enumerate(self.read_table(self.pdba_base(pdpe), entry_size)):
                 soffset = start + (j * ptrs_per_pae_pgd * ptrs_per_pae_pte * 8)
-                entry = self._read_long_long_phys(pgd_curr)
-                pgd_curr = pgd_curr + 8
-                if self.entry_present(entry) and self.page_size_flag(entry):
+                if present(entry) and self.page_size_flag(entry):
                     yield (soffset, 0x200000)
-                elif self.entry_present(entry):
-                    pte_curr = entry & ~((1 << page_shift) - 1)
-                    for k in range(0, ptrs_per_pae_pte):
-                        pte_entry = self._read_long_long_phys(pte_curr)
-                        pte_curr = pte_curr + 8
-                        if self.entry_present(pte_entry):
+                elif present(entry):
+                    ptes = self.read_table(entry & ~((1 << page_shift) - 1), entry_size)
+                    for k, pte_entry in enumerate(ptes):
+                        if present(pte_entry):
                             yield (soffset + k * 0x1000, 0x1000)
@@ -90,3 +90,11 @@ class LimeAddressSpace(addrspace.AbstractRunBasedMemory):
             addr = firstram + addr
 
         return addrspace.AbstractRunBasedMemory.translate(self, addr)
+
+    def translate_length(self, addr, length):
+        firstram = self.runs[0][0]
+
+        if addr < firstram:
+            return addrspace.AbstractRunBasedMemory.translate_length(self, firstram + addr, min(length, firstram - addr))
+
+        return addrspace.AbstractRunBasedMemory.translate_length(self, addr, length)
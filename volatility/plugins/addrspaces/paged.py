@@ -18,15 +18,76 @@
 #
 
 #import fractions
+import struct
 import volatility.addrspace as addrspace
 import volatility.obj as obj
 
+## How a page table page unpacks, by the size of its entries
+table_formats = {4: '<1024I', 8: '<512Q'}
+
+class PageTableCache(object):
+    """ A bounded cache of page table pages read from a physical address space
+
+    Each page is kept unpacked as a tuple of its entries. The cache is shared
+    by every paged AS stacked over the same base, since process address spaces
+    all walk the same kernel tables.
+    """
+    ## Number of address spaces' run lists to keep
+    run_lists_size = 0x100
+
+    def __init__(self, base, size):
+        self.base = base
+        self.size = size
+        self.pages = {}
+        self.run_lists = {}
+        self.hits = 0
+        self.misses = 0
+
+    def read_table(self, page, entry_size):
+        """Returns the entries of the entry_size byte entry table at the page aligned physical address page, or None if the page can't be read"""
+        key = (page, entry_size)
+        entries = self.pages.get(key)
+        if entries is None:
+            self.misses += 1
+            entries = read_table_page(self.base, page, entry_size)
+            if entries is None:
+                return None
+            ## Evict an arbitrary page when full, like a hardware TLB would
+            if len(self.pages) >= self.size:
+                self.pages.popitem()
+            self.pages[key] = entries
+        else:
+            self.hits += 1
+        return entries
+
+    def read_entry(self, addr, entry_size):
+        """Returns the entry_size byte entry at physical address addr, or None if its page can't be read"""
+        if not isinstance(addr, (int, long)) or addr & (entry_size - 1):
+            return None
+        entries = self.read_table(addr & ~0xfff, entry_size)
+        if entries is None:
+            return None
+        return entries[(addr & 0xfff) // entry_size]
+
+def read_table_page(base, page, entry_size):
+    """Reads the page at physical address page from base in one go and returns its entry_size byte entries, or None if it can't be read"""
+    try:
+        data = base.read(page, 0x1000)
+    except IOError:
+        data = None
+    if not data or len(data) != 0x1000:
+        return None
+    return struct.unpack(table_formats[entry_size], data)
+
 class AbstractPagedMemory(addrspace.AbstractVirtualAddressSpace):
     """ Class to handle all the details of a paged virtual address space
         
     Note: Pages can be of any size
     """
     checkname = "Intel"
+    ## Number of page translations and page table pages to cache, 0 to not cache them
+    tlb_size = 0x4000
+    table_cache_size = 0x400
 
     def __init__(self, base, config, dtb = 0, skip_as_check = False, *args, **kwargs):
         ## We must be stacked on someone else:
@@ -42,6 +103,19 @@ class AbstractPagedMemory(addrspace.AbstractVirtualAddressSpace):
 
         self.as_assert(self.dtb != None, "No valid DTB found")
 
+        ## Nothing is cached when writing is enabled, since a write could
+        ## change the page tables under us
+        self.caching = not config.WRITE
+        self.tlb = {}
+        self.tlb_hits = 0
+        self.tlb_misses = 0
+        self.table_cache = None
+        if self.caching:
+            self.table_cache = getattr(base, 'page_table_cache', None)
+            if self.table_cache is None and self.table_cache_size:
+                self.table_cache = PageTableCache(base, self.table_cache_size)
+                base.page_table_cache = self.table_cache
+
         if not skip_as_check:
             volmag = obj.VolMagic(self)
             if hasattr(volmag, self.checkname):
@@ -83,10 +157,84 @@ class AbstractPagedMemory(addrspace.AbstractVirtualAddressSpace):
         config.add_option("DTB", type = 'int', default = 0,
                           help = "DTB Address")
 
-    def vtop(self, addr):
-        """Abstract function that converts virtual (paged) addresses to physical addresses"""
+    def page_walk(self, addr):
+        """Abstract function that converts virtual (paged) addresses to physical addresses by walking the page tables"""
         pass
 
+    def vtop(self, vaddr):
+        """Converts virtual (paged) addresses to physical addresses, through a TLB of recently walked pages
+
+        Only the page frame is cached, so large pages take one entry per 4k
+        page they are used through.
+        """
+        if not self.caching or not self.tlb_size or not isinstance(vaddr, (int, long)):
+            return self.page_walk(vaddr)
+        vpage = vaddr >> 12
+        try:
+            frame = self.tlb[vpage]
+            self.tlb_hits += 1
+        except KeyError:
+            self.tlb_misses += 1
+            frame = self.page_walk(vaddr & ~0xfff)
+            if len(self.tlb) >= self.tlb_size:
+                self.tlb.popitem()
+            self.tlb[vpage] = frame
+        if frame is None:
+            return None
+        return frame | (vaddr & 0xfff)
+
+    def read_table_entry(self, addr, entry_size):
+        """Returns the entry_size byte page table entry at physical address addr from the page table cache, or None if it isn't available"""
+        if self.table_cache is None:
+            return None
+        return self.table_cache.read_entry(addr, entry_size)
+
+    def read_table(self, addr, entry_size):
+        """Returns all the entry_size byte entries of the page table at physical address addr, reading its page in one go where possible"""
+        page = addr & ~0xfff
+        if self.table_cache is not None:
+            entries = self.table_cache.read_table(page, entry_size)
+        else:
+            entries = read_table_page(self.base, page, entry_size)
+        if entries is None:
+            entries = self.read_each_entry(page, 0x1000 // entry_size, entry_size)
+        return entries
+
+    def read_entries(self, addr, count, entry_size):
+        """Returns count entry_size byte page table entries starting at physical address addr, a table page at a time"""
+        if addr & (entry_size - 1):
+            return self.read_each_entry(addr, count, entry_size)
+        entries = []
+        while len(entries) < count:
+            first = (addr & 0xfff) // entry_size
+            chunk = self.read_table(addr, entry_size)[first:first + count - len(entries)]
+            entries.extend(chunk)
+            addr += len(chunk) * entry_size
+        return entries
+
+    def read_each_entry(self, addr, count, entry_size):
+        """Returns count entry_size byte page table entries starting at physical address addr, read one by one, with 0 (not present) for any that can't be read"""
+        entries = []
+        fmt = table_formats[entry_size][0] + table_formats[entry_size][-1]
+        for i in xrange(count):
+            entry_addr = addr + i * entry_size
+            try:
+                data = self.base.read(entry_addr, entry_size)
+            except IOError:
+                data = None
+            if data and len(data) == entry_size:
+                entries.append(struct.unpack(fmt, data)[0])
+            else:
+                entries.append(0)
+        return entries
+
+    def cache_stats(self):
+        """Returns a dict of hit and miss counts for the TLB and the page table cache"""
+        stats = dict(tlb_hits = self.tlb_hits, tlb_misses = self.tlb_misses, table_hits = 0, table_misses = 0)
+        if self.table_cache is not None:
+            stats.update(table_hits = self.table_cache.hits, table_misses = self.table_cache.misses)
+        return stats
+
     def get_available_pages(self):
         """A generator that returns (addr, size) for each of the virtual addresses present, sorted by offset"""
         pass
@@ -95,7 +243,29 @@ class AbstractPagedMemory(addrspace.AbstractVirtualAddressSpace):
         return self.get_available_pages()
 
     def get_available_addresses(self):
-        """A generator that returns (addr, size) for each valid address block"""
+        """A generator that returns (addr, size) for each valid address block
+
+        The blocks are worked out once per DTB and kept with the page table
+        cache, so every scan over the same tables reuses them.
+        """
+        if self.table_cache is None:
+            for run in self.get_page_runs():
+                yield run
+            return
+
+        key = (self.__class__, self.dtb)
+        run_lists = self.table_cache.run_lists
+        runs = run_lists.get(key)
+        if runs is None:
+            runs = list(self.get_page_runs())
+            if len(run_lists) >= self.table_cache.run_lists_size:
+                run_lists.popitem()
+            run_lists[key] = runs
+        for run in runs:
+            yield run
+
+    def get_page_runs(self):
+        """A generator that returns (addr, size) for each valid address block, joining up the available pages"""
         runLength = None
         currentOffset = None
         for (offset, size) in self.get_available_pages():
@@ -111,7 +281,6 @@ class AbstractPagedMemory(addrspace.AbstractVirtualAddressSpace):
                     currentOffset = offset
         if (runLength != None and currentOffset != None):
             yield (currentOffset, runLength)
-        raise StopIteration
 
     def is_valid_address(self, vaddr):
         """Returns whether a virtual address is valid"""
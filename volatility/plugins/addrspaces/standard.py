@@ -29,6 +29,7 @@ import volatility.addrspace as addrspace
 import volatility.debug as debug #pylint: disable-msg=W0611
 import urllib
 import os
+import mmap
 
 #pylint: disable-msg=C0111
 
@@ -65,6 +66,9 @@ class FileAddressSpace(addrspace.BaseAddressSpace):
     
     3) base == None (we dont operate on anyone else so we need to be
     right at the bottom of the AS stack.)
+
+    Unless writing is enabled, the file is memory mapped and reads are
+    served as slices of the map, without a seek and read per access.
     """
     ## We should be the AS of last resort
     order = 100
@@ -83,6 +87,13 @@ class FileAddressSpace(addrspace.BaseAddressSpace):
         self.fhandle = open(self.fname, self.mode)
         self.fhandle.seek(0, 2)
         self.fsize = self.fhandle.tell()
+        self.fmap = None
+        if not config.WRITE and self.fsize:
+            try:
+                self.fmap = mmap.mmap(self.fhandle.fileno(), 0, access = mmap.ACCESS_READ)
+            except (mmap.error, OverflowError, ValueError), e:
+                ## e.g. an image too big for a 32-bit address space
+                debug.debug("Unable to map {0}: {1}".format(self.fname, e))
 
     # Abstract Classes cannot register options, and since this checks config.WRITE in __init__, we define the option here
     @staticmethod
@@ -96,6 +107,12 @@ class FileAddressSpace(addrspace.BaseAddressSpace):
 
     def read(self, addr, length):
         addr, length = int(addr), int(length)
+        if self.fmap is not None:
+            if addr < 0 or addr >= self.fsize:
+                return None
+            if length < 0:
+                return self.fmap[addr:]
+            return self.fmap[addr:addr + length] or None
         try:
             self.fhandle.seek(addr)
         except (IOError, OverflowError):
@@ -129,6 +146,9 @@ class FileAddressSpace(addrspace.BaseAddressSpace):
         return 0 <= addr < self.fsize
 
     def close(self):
+        if self.fmap is not None:
+            self.fmap.close()
+            self.fmap = None
         self.fhandle.close()
 
     def write(self, addr, data):
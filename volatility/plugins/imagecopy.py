@@ -37,10 +37,21 @@ class ImageCopy(commands.Command):
                                 action = 'store', type = 'str')
 
     def calculate(self):
-        blocksize = self._config.BLOCKSIZE
         addr_space = utils.load_as(self._config, astype = 'physical')
 
-        available_addresses = list(addr_space.get_available_addresses())
+        for block in self.copy_blocks(addr_space):
+            yield block
+
+    def copy_blocks(self, addr_space, available_addresses = None):
+        """Generates the (offset, data) blocks of a raw copy of addr_space
+
+        @param available_addresses: the (start, length) runs to copy, 
+        by default those of addr_space
+        """
+        blocksize = self._config.BLOCKSIZE
+
+        if available_addresses is None:
+            available_addresses = list(addr_space.get_available_addresses())
 
         if not available_addresses:
             debug.error("Cannot find any memory ranges to convert. Make sure to specify --profile")
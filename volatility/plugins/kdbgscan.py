@@ -41,6 +41,9 @@ class MultiStringFinderCheck(scan.ScannerCheck):
             self.maxlen = max(self.maxlen, len(needle))
         if not self.maxlen:
             raise RuntimeError("No needles of any length were found for the " + self.__class__.__name__)
+        self.skip_data = None
+        self.skip_offset = 0
+        self.skip_next = {}
 
     def check(self, offset):
         verify = self.address_space.read(offset, self.maxlen)
@@ -50,13 +53,28 @@ class MultiStringFinderCheck(scan.ScannerCheck):
         return False
 
     def skip(self, data, offset):
+        ## Remember where each needle was found next, so that needles
+        ## which are far away (or not there at all) aren't searched for
+        ## all over again on every skip through the same data
+        if data is not self.skip_data or offset < self.skip_offset:
+            self.skip_data = data
+            self.skip_next = {}
+        self.skip_offset = offset
+
         nextval = len(data)
         for needle in self.needles:
-            dindex = data.find(needle, offset + 1)
-            if dindex > -1:
-                nextval = min(nextval, dindex)
+            dindex = self.skip_next.get(needle, -1)
+            if dindex <= offset:
+                dindex = data.find(needle, offset + 1)
+                if dindex < 0:
+                    dindex = len(data)
+                self.skip_next[needle] = dindex
+            nextval = min(nextval, dindex)
         return nextval - offset
 
+    def anchors(self):
+        return [(needle, 0) for needle in self.needles]
+
 class MultiPrefixFinderCheck(MultiStringFinderCheck):
     """ Checks for multiple strings per page, finishing at the offset """
     def check(self, offset):
@@ -66,6 +84,9 @@ class MultiPrefixFinderCheck(MultiStringFinderCheck):
                 return True
         return False
 
+    def anchors(self):
+        return [(needle, -len(needle)) for needle in self.needles]
+
 class KDBGScanner(scan.BaseScanner):
     checks = [ ]
 
@@ -73,8 +73,8 @@ class WinSyscallsAttribute(obj.ProfileModification):
 class AbstractSyscalls(obj.ProfileModification):
     syscall_module = 'No default'
     def modification(self, profile):
-        module = sys.modules.get(self.syscall_module, None)
-        profile.additional['syscalls'] = module.syscalls
+        module = obj.load_vtype_module(self.syscall_module)
+        profile.additional['syscalls'] = module['syscalls']
 
 class WinXPSyscalls(AbstractSyscalls):
     syscall_module = 'volatility.plugins.overlays.windows.xp_sp2_x86_syscalls'
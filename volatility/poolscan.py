@@ -18,12 +18,120 @@
 # along with Volatility.  If not, see <http://www.gnu.org/licenses/>.
 #
 
+import re
+import itertools
+import operator
 import volatility.scan as scan
-import volatility.constants as constants
 import volatility.utils as utils
 import volatility.obj as obj
 import volatility.registry as registry
 
+#--------------------------------------------------------------------------------
+# A multi-needle string search 
+#--------------------------------------------------------------------------------
+
+class MultiNeedleFinder(object):
+    """Finds a set of needles in a buffer. From regex_threshold needles 
+    up, it makes a single pass with one regular expression precompiled 
+    for the whole set; below that, a str.find() pass per needle.
+
+    The hits are the same as those of utils.iterfind() for each needle, 
+    in ascending offset order (by needle order for hits at the same offset).
+    """
+
+    # Each needle costs the per-needle loop a str.find() pass over the
+    # buffer, while the regex costs about the same for any number of 
+    # needles. Below this many needles the loop is faster. 
+    regex_threshold = 14
+
+    def __init__(self, needles):
+        self.needles = list(needles)
+        self.regex = None
+
+        if (len(self.needles) >= self.regex_threshold and "" not in self.needles
+                and len(set(self.needles)) == len(self.needles)):
+            self.order = dict((needle, i) for i, needle in enumerate(self.needles))
+            self.overlaps = self.find_overlaps(self.needles)
+            self.regex = re.compile(self.trie_pattern(self.needles))
+
+    @staticmethod
+    def find_overlaps(needles):
+        """Maps each needle to the (shift, needle) pairs that can start at 
+        that shift into a hit on it.
+
+        A regex resumes after the end of each match, so these are the hits
+        it can't see. For pool tags, "PnpC" overlaps "Cbrb" at shift 3. 
+        """
+        overlaps = {}
+        for needle in needles:
+            overlaps[needle] = []
+            for shift in range(len(needle)):
+                tail = needle[shift:]
+                for other in needles:
+                    if shift == 0 and other == needle:
+                        continue
+                    if tail.startswith(other) or other.startswith(tail):
+                        overlaps[needle].append((shift, other))
+
+        return overlaps
+
+    @classmethod
+    def trie_pattern(cls, needles):
+        """Builds an alternation with the common prefixes factored out, 
+        e.g. Pnp(?:9|C|D), so each position is tested once per prefix"""
+
+        groups = {}
+        for needle in needles:
+            groups.setdefault(needle[:1], []).append(needle[1:])
+
+        alternatives = []
+        for head in sorted(groups):
+            tails = groups[head]
+            if len(tails) == 1:
+                alternatives.append(re.escape(head + tails[0]))
+            else:
+                alternatives.append(re.escape(head) + "(?:" + cls.trie_pattern(tails) + ")")
+
+        return "|".join(alternatives)
+
+    def finditer(self, data):
+        """Returns an iterator of (needle, offset) for each hit in data"""
+
+        if self.regex is None:
+            return iter(self.find_each(data))
+        return self.find_all(data)
+
+    def find_each(self, data):
+        """Returns the hits of a str.find() pass per needle"""
+
+        hits = []
+        for needle in self.needles:
+            hits.extend(itertools.izip(itertools.repeat(needle), utils.iterfind(data, needle)))
+
+        ## The sort is stable, so ties stay in needle order. It costs less 
+        ## than a heapq.merge() of the per-needle hits, which is pure Python. 
+        hits.sort(key = operator.itemgetter(1))
+        return hits
+
+    def find_all(self, data):
+        """Generate the hits of a single regex pass for all needles"""
+
+        # iterfind() doesn't report overlapping hits of the same needle
+        ends = {}
+
+        for match in self.regex.finditer(data):
+            start = match.start()
+            hits = [(start, self.order[match.group()], match.group())]
+            for shift, other in self.overlaps[match.group()]:
+                if data.startswith(other, start + shift):
+                    hits.append((start + shift, self.order[other], other))
+            hits.sort()
+
+            for offset, _, needle in hits:
+                if offset >= ends.get(needle, 0):
+                    ends[needle] = offset + len(needle)
+                    yield needle, offset
+
 #--------------------------------------------------------------------------------
 # A multi-concurrent pool scanner 
 #--------------------------------------------------------------------------------
@@ -31,43 +139,59 @@ import volatility.registry as registry
 class MultiPoolScanner(object):
     """An optimized scanner for pool tags"""
 
+    # An object that has already scanned an address space for a superset
+    # of our needles. If set, full scans of that address space are replayed 
+    # from its recorded hits instead of reading the image again. It must 
+    # provide replay(address_space, needles) returning a generator of 
+    # (tag, offset) or None if it can't answer for this scan. 
+    prescan = None
+
     def __init__(self, needles = None):
         self.needles = needles
         self.overlap = 20
+        self.finder = None
 
-    def scan(self, address_space, offset = None, maxlen = None):
+    def find_needles(self, address_space, offset, length):
+        """Returns the (tag, offset) hits for all needles in one window, 
+        in ascending offset order"""
 
-        if offset is None:
-            current_offset = 0
-        else:
-            current_offset = offset
+        if self.finder is None:
+            self.finder = MultiNeedleFinder(self.needles)
+
+        data = address_space.zread(offset, length)
+
+        # this scanner yields the matched pool tag as well as
+        # the offset, to save the caller from having to perform 
+        # another .read() just to see which tag was matched
+        return [(needle, addr + offset) for needle, addr in self.finder.finditer(data)]
 
-        for (range_start, range_size) in sorted(address_space.get_available_addresses()):
-            # Jump to the next available point to scan from
-            # self.base_offset jumps up to be at least range_start
-            current_offset = max(range_start, current_offset)
-            range_end = range_start + range_size
+    def scan_windows(self, address_space, offset = None, maxlen = None):
+        """Generate (window offset, hits) for each window of the scan. 
+        The windows are scanned in parallel if SCAN-JOBS is set."""
 
-            # If we have a maximum length, we make sure it's less than the range_end
-            if maxlen is not None:
-                range_end = min(range_end, offset + maxlen)
+        windows = list(scan.scan_windows(address_space, offset, maxlen, self.overlap))
 
-            while (current_offset < range_end):
-                # We've now got range_start <= self.base_offset < range_end
+        jobs = scan.scan_jobs()
+        if jobs > 1 and len(windows) > 1:
+            results = scan.parallel_scan(self.find_needles, address_space, windows, jobs)
+        else:
+            results = (self.find_needles(address_space, start, length) for start, length in windows)
 
-                # Figure out how much data to read
-                l = min(constants.SCAN_BLOCKSIZE + self.overlap, range_end - current_offset)
+        for (start, _), hits in itertools.izip(windows, results):
+            yield start, hits
 
-                data = address_space.zread(current_offset, l)
+    def scan(self, address_space, offset = None, maxlen = None):
 
-                for needle in self.needles:
-                    for addr in utils.iterfind(data, needle):
-                        # this scanner yields the matched pool tag as well as
-                        # the offset, to save the caller from having to perform 
-                        # another .read() just to see which tag was matched
-                        yield data[addr:addr+4], addr + current_offset
+        if self.prescan is not None and not offset and maxlen is None:
+            hits = self.prescan.replay(address_space, self.needles)
+            if hits is not None:
+                for tag, addr in hits:
+                    yield tag, addr
+                return
 
-                current_offset += min(constants.SCAN_BLOCKSIZE, l)
+        for _, hits in self.scan_windows(address_space, offset, maxlen):
+            for tag, addr in hits:
+                yield tag, addr
 
 #--------------------------------------------------------------------------------
 # The main interface / API for concurrent scans 
@@ -303,6 +427,11 @@ class PoolTagCheck(scan.ScannerCheck):
         data = self.address_space.read(offset, len(self.tag))
         return data == self.tag
 
+    def anchors(self):
+        if not self.tag:
+            return []
+        return [(self.tag, 0)]
+
 class CheckPoolType(scan.ScannerCheck):
     """ Check the pool type """
     def __init__(self, address_space, paged = False,
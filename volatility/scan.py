@@ -32,12 +32,96 @@
 @contact:      awalters@4tphi.net
 @organization: Volatility Foundation
 """
+import os
+import multiprocessing
 import volatility.debug as debug
 import volatility.registry as registry
 import volatility.addrspace as addrspace
 import volatility.constants as constants
 import volatility.conf as conf
 
+config = conf.ConfObject()
+
+config.add_option("SCAN-JOBS", default = 1, type = 'int',
+                  cache_invalidator = False,
+                  help = "Number of processes to scan address spaces with")
+
+def scan_jobs():
+    """Returns the number of processes to scan with, 1 to scan serially"""
+    # The workers inherit the scan (and the address space) by forking
+    if not hasattr(os, "fork"):
+        return 1
+    # Daemonic processes (e.g. workers of a pool) can't have children
+    if multiprocessing.current_process().daemon:
+        return 1
+    return max(1, int(config.SCAN_JOBS or 1))
+
+def scan_windows(address_space, offset = None, maxlen = None, overlap = 20):
+    """Generate the (offset, length) windows a scan of address_space reads. 
+
+    Each window is SCAN_BLOCKSIZE bytes plus the overlap into the next 
+    window, so matches straddling two windows are not lost.
+    """
+    current_offset = offset or 0
+
+    for (range_start, range_size) in sorted(address_space.get_available_addresses()):
+        # Jump to the next available point to scan from
+        # self.base_offset jumps up to be at least range_start
+        current_offset = max(range_start, current_offset)
+        range_end = range_start + range_size
+
+        # If we have a maximum length, we make sure it's less than the range_end
+        if maxlen is not None:
+            range_end = min(range_end, (offset or 0) + maxlen)
+
+        while (current_offset < range_end):
+            # We've now got range_start <= self.base_offset < range_end
+
+            # Figure out how much data to read
+            l = min(constants.SCAN_BLOCKSIZE + overlap, range_end - current_offset)
+
+            yield current_offset, l
+
+            current_offset += min(constants.SCAN_BLOCKSIZE, l)
+
+## The (function, address space) being run by the workers of parallel_scan
+_parallel_job = None
+
+def _reopen_files(address_space):
+    """Give a forked worker its own handles on the files under an 
+    address space, so that the workers' seeks don't race each other"""
+    space = address_space
+    while space is not None:
+        if hasattr(space, "fhandle") and hasattr(space, "fname"):
+            space.fhandle = open(space.fname, getattr(space, "mode", "rb"))
+        space = getattr(space, "base", None)
+
+def _parallel_init():
+    _reopen_files(_parallel_job[1])
+
+def _parallel_window(window):
+    func, address_space = _parallel_job
+    offset, length = window
+    return func(address_space, offset, length)
+
+def parallel_scan(func, address_space, windows, jobs):
+    """Run func(address_space, offset, length) for each of the windows in
+    a pool of worker processes and generate the results in window order.
+
+    The results are the same as calling func on each window in turn, so 
+    scanners merge them exactly as they would a serial scan. 
+    """
+    global _parallel_job
+    _parallel_job = (func, address_space)
+    pool = multiprocessing.Pool(jobs, _parallel_init)
+    try:
+        for result in pool.imap(_parallel_window, windows):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+        _parallel_job = None
+
 ########### Following is the new implementation of the scanning
 ########### framework. The old framework was based on PyFlag's
 ########### scanning framework which is probably too complex for this.
@@ -49,6 +133,8 @@ class BaseScanner(object):
         self.buffer = addrspace.BufferAddressSpace(conf.DummyConfig(), data = '\x00' * 1024)
         self.window_size = window_size
         self.constraints = []
+        self.skippers = []
+        self.anchors = []
 
         self.error_count = 0
 
@@ -80,7 +166,6 @@ class BaseScanner(object):
     overlap = 20
     def scan(self, address_space, offset = 0, maxlen = None):
         self.buffer.profile = address_space.profile
-        current_offset = offset
 
         ## Build our constraints from the specified ScannerCheck
         ## classes:
@@ -90,56 +175,98 @@ class BaseScanner(object):
             self.constraints.append(check)
 
         ## Which checks also have skippers?
-        skippers = [ c for c in self.constraints if hasattr(c, "skip") ]
-
-        for (range_start, range_size) in sorted(address_space.get_available_addresses()):
-            # Jump to the next available point to scan from
-            # self.base_offset jumps up to be at least range_start
-            current_offset = max(range_start, current_offset)
-            range_end = range_start + range_size
-
-            # If we have a maximum length, we make sure it's less than the range_end
-            if maxlen:
-                range_end = min(range_end, offset + maxlen)
-
-            while (current_offset < range_end):
-                # We've now got range_start <= self.base_offset < range_end
-
-                # Figure out how much data to read
-                l = min(constants.SCAN_BLOCKSIZE + self.overlap, range_end - current_offset)
-
-                # Populate the buffer with data
-                # We use zread to scan what we can because there are often invalid
-                # pages in the DTB
-                data = address_space.zread(current_offset, l)
-                self.buffer.assign_buffer(data, current_offset)
-
-                ## Run checks throughout this block of data
-                i = 0
-                while i < l:
-                    if self.check_addr(i + current_offset):
-                        ## yield the offset to the start of the memory
-                        ## (after the pool tag)
-                        yield i + current_offset
-
-                    ## Where should we go next? By default we go 1 byte
-                    ## ahead, but if some of the checkers have skippers,
-                    ## we may actually go much farther. Checkers with
-                    ## skippers basically tell us that there is no way
-                    ## they can match anything before the skipped result,
-                    ## so there is no point in trying them on all the data
-                    ## in between. This optimization is useful to really
-                    ## speed things up. FIXME - currently skippers assume
-                    ## that the check must match, therefore we can skip
-                    ## the unmatchable region, but its possible that a
-                    ## scanner needs to match only some checkers.
-                    skip = 1
-                    for s in skippers:
-                        skip = max(skip, s.skip(data, i))
-
-                    i += skip
-
-                current_offset += min(constants.SCAN_BLOCKSIZE, l)
+        self.skippers = [ c for c in self.constraints if hasattr(c, "skip") ]
+
+        ## Can we tell where the checks could match from the data? Every
+        ## check must match unless we allow errors, so the literals of any
+        ## one of them will do.
+        self.anchors = []
+        if not self.error_count:
+            for c in self.constraints:
+                anchors = hasattr(c, "anchors") and c.anchors()
+                if anchors and "" not in [literal for literal, _ in anchors]:
+                    self.anchors = anchors
+                    break
+
+        windows = list(scan_windows(address_space, offset, maxlen or None, self.overlap))
+
+        jobs = scan_jobs()
+        if jobs > 1 and len(windows) > 1:
+            for hits in parallel_scan(self.scan_window_hits, address_space, windows, jobs):
+                for hit in hits:
+                    yield hit
+        else:
+            for current_offset, l in windows:
+                for hit in self.scan_window(address_space, current_offset, l):
+                    yield hit
+
+    def scan_window_hits(self, address_space, current_offset, l):
+        """Returns a list of the hits in one window of the scan"""
+        return list(self.scan_window(address_space, current_offset, l))
+
+    def scan_window(self, address_space, current_offset, l):
+        """Generate the hits in one window of the scan"""
+        # Populate the buffer with data
+        # We use zread to scan what we can because there are often invalid
+        # pages in the DTB
+        data = address_space.zread(current_offset, l)
+        self.buffer.assign_buffer(data, current_offset)
+
+        candidates = self.find_candidates(data, l)
+
+        ## Without skippers every offset is visited, so we can go
+        ## straight from one candidate to the next
+        if candidates is not None and not self.skippers:
+            for i in sorted(candidates):
+                if self.check_addr(i + current_offset):
+                    yield i + current_offset
+            return
+
+        ## Run checks throughout this block of data
+        i = 0
+        while i < l:
+            if (candidates is None or i in candidates) and self.check_addr(i + current_offset):
+                ## yield the offset to the start of the memory
+                ## (after the pool tag)
+                yield i + current_offset
+
+            ## Where should we go next? By default we go 1 byte
+            ## ahead, but if some of the checkers have skippers,
+            ## we may actually go much farther. Checkers with
+            ## skippers basically tell us that there is no way
+            ## they can match anything before the skipped result,
+            ## so there is no point in trying them on all the data
+            ## in between. This optimization is useful to really
+            ## speed things up. FIXME - currently skippers assume
+            ## that the check must match, therefore we can skip
+            ## the unmatchable region, but its possible that a
+            ## scanner needs to match only some checkers.
+            skip = 1
+            for s in self.skippers:
+                skip = max(skip, s.skip(data, i))
+
+            i += skip
+
+    def find_candidates(self, data, l):
+        """ Returns the set of offsets in the first l bytes of data
+        where the checks could all match, based on the anchoring
+        literals of one of the checks, or None if any offset could.
+        """
+        if not self.anchors:
+            return None
+
+        ## A literal found before the offset it anchors may be read
+        ## from outside of the buffer, so check those offsets anyway
+        candidates = set(xrange(min(l, max(0, -min(shift for _, shift in self.anchors)))))
+
+        for literal, shift in self.anchors:
+            offset = data.find(literal)
+            while offset >= 0:
+                if 0 <= offset - shift < l:
+                    candidates.add(offset - shift)
+                offset = data.find(literal, offset + 1)
+
+        return candidates
 
 class DiscontigScanner(BaseScanner):
     def scan(self, address_space, offset = 0, maxlen = None):
@@ -171,3 +298,12 @@ class ScannerCheck(object):
     ## that all checks have a chance of passing.
     #def skip(self, data, offset):
     #    return -1
+
+    ## If the check can only match where a literal string occurs in
+    ## the data, define this method to speed up the scanning further.
+    ## Return a list of (literal, shift) pairs, such that the check
+    ## can only match at an offset if one of the literals occurs at
+    ## offset + shift. The other checks are then only run where it
+    ## could match.
+    #def anchors(self):
+    #    return []
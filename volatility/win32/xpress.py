@@ -31,15 +31,17 @@
 
 #pylint: disable-msg=C0111
 
-from struct import unpack
-from struct import error as StructError
-
-def recombine(outbuf):
-    return "".join(outbuf[k] for k in sorted(outbuf.keys()))
+from struct import unpack_from
 
 def xpress_decode(inputBuffer):
-    outputBuffer = {}
-    outputIndex = 0
+    """Decodes an Xpress compressed buffer, as found in hibernation files.
+
+    The output goes straight into a bytearray, and runs of literals and
+    back references are copied a slice at a time rather than byte by byte.
+    """
+    inputBuffer = bytearray(inputBuffer)
+    inputLength = len(inputBuffer)
+    outputBuffer = bytearray()
     inputIndex = 0
     indicatorBit = 0
     nibbleIndex = 0
@@ -47,14 +49,13 @@ def xpress_decode(inputBuffer):
     # we are decoding the entire input here, so I have changed
     # the check to see if we're at the end of the output buffer
     # with a check to see if we still have any input left.
-    while inputIndex < len(inputBuffer):
+    while inputIndex < inputLength:
         if (indicatorBit == 0):
             # in pseudocode this was indicatorBit = ..., but that makes no
             # sense, so I think this was intended...
-            try:
-                indicator = unpack("<L", inputBuffer[inputIndex:inputIndex + 4])[0]
-            except StructError:
-                return recombine(outputBuffer)
+            if inputIndex + 4 > inputLength:
+                break
+            indicator = unpack_from("<L", inputBuffer, inputIndex)[0]
 
             inputIndex += 4
             indicatorBit = 32
@@ -64,13 +65,13 @@ def xpress_decode(inputBuffer):
         # set in indicator. For example, if indicatorBit has value 4 
         # check whether the 4th bit of the value in indicator is set
         if not (indicator & (1 << indicatorBit)):
-            try:
-                outputBuffer[outputIndex] = inputBuffer[inputIndex]
-            except IndexError:
-                return recombine(outputBuffer)
-
-            inputIndex += 1
-            outputIndex += 1
+            ## Copy this literal and any that directly follow it in one go
+            count = 1 + indicatorBit - (indicator & ((1 << indicatorBit) - 1)).bit_length()
+            outputBuffer += inputBuffer[inputIndex:inputIndex + count]
+            if inputIndex + count > inputLength:
+                break
+            inputIndex += count
+            indicatorBit -= count - 1
         else:
             # Get the length. This appears to use a scheme whereby if
             # the value at the current width is all ones, then we assume
@@ -82,49 +83,50 @@ def xpress_decode(inputBuffer):
             # Thus if a nibble byte is F2, we would first use the low part (2),
             # and then at some later point get the nibble from the high part (F).
 
-            try:
-                length = unpack("<H", inputBuffer[inputIndex:inputIndex + 2])[0]
-            except StructError:
-                return recombine(outputBuffer)
+            if inputIndex + 2 > inputLength:
+                break
+            length = unpack_from("<H", inputBuffer, inputIndex)[0]
 
             inputIndex += 2
-            offset = length / 8
-            length = length % 8
+            offset = length >> 3
+            length = length & 7
             if length == 7:
                 if nibbleIndex == 0:
                     nibbleIndex = inputIndex
-                    length = ord(inputBuffer[inputIndex]) % 16
+                    length = inputBuffer[inputIndex] & 15
                     inputIndex += 1
                 else:
                     # get the high nibble of the last place a nibble sized
                     # length was used thus we don't waste that extra half
                     # byte :p
-                    length = ord(inputBuffer[nibbleIndex]) / 16
+                    length = inputBuffer[nibbleIndex] >> 4
                     nibbleIndex = 0
 
                 if length == 15:
-                    length = ord(inputBuffer[inputIndex])
+                    length = inputBuffer[inputIndex]
                     inputIndex += 1
                     if length == 255:
-                        try:
-                            length = unpack("<H", inputBuffer[inputIndex:inputIndex + 2])[0]
-                        except StructError:
-                            return recombine(outputBuffer)
+                        if inputIndex + 2 > inputLength:
+                            break
+                        length = unpack_from("<H", inputBuffer, inputIndex)[0]
                         inputIndex = inputIndex + 2
                         length = length - (15 + 7)
                     length = length + 15
                 length = length + 7
             length = length + 3
 
-            while length != 0:
-                try:
-                    outputBuffer[outputIndex] = outputBuffer[outputIndex - offset - 1]
-                except KeyError:
-                    return recombine(outputBuffer)
-                outputIndex += 1
-                length -= 1
-
-    return recombine(outputBuffer)
+            start = len(outputBuffer) - offset - 1
+            if start < 0:
+                break
+            ## The match may overlap what it produces, in which case it
+            ## repeats the last offset + 1 bytes
+            if offset + 1 >= length:
+                outputBuffer += outputBuffer[start:start + length]
+            else:
+                pattern = outputBuffer[start:]
+                outputBuffer += (pattern * (length // len(pattern) + 1))[:length]
+
+    return str(outputBuffer)
 
 try:
     import pyxpress #pylint: disable-msg=F0401